@@ -0,0 +1,344 @@
+"""Benchmarks the simulator on the bundled example simulations and on synthetically scaled versions of them.
+
+Each workload is timed separately for complete instruction cycles (Simulation.run_instruction with and without the
+instruction cache, with memoized windows, Simulation.run_cycles, Simulation.iter_run and, if NumPy is installed,
+Simulation.run_instruction_batch), Register.attempt_attachment, Register.displace_strands, SVG generation, and JSON
+and binary loading and saving. Every measurement reports its best time over several repeats, its throughput, and the
+peak memory allocated while it runs, as measured by tracemalloc in a separate run.
+
+Examples:
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --quick --json baseline.json
+    python benchmarks/run_benchmarks.py --compare baseline.json
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+REPOSITORY_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY_DIRECTORY)
+
+from simd_dna.classes import TopStrand  # noqa: E402
+from simd_dna.simulation import Simulation  # noqa: E402
+
+EXAMPLES = ['increment.json', 'graycode.json', 'rule110.json', 'ternary-increment.json', 'increment_tm.json']
+
+
+def load_example(filename):
+    simulation = Simulation()
+    simulation.load_json(os.path.join(REPOSITORY_DIRECTORY, filename))
+    return simulation
+
+
+def scale_cells(simulation, copies):
+    # Repeats the cells and top strands of every register side by side
+    for register in simulation.registers.values():
+        register_domains = register.total_domains
+        top_strands = [TopStrand(top_strand.start_index + i * register_domains, top_strand.strand_name)
+                       for i in range(copies) for top_strand in register.top_strands]
+        register.cells = register.cells * copies
+        register.top_strands = top_strands
+        register._ensure_domain_index()
+
+    return simulation
+
+
+def scale_registers(simulation, copies):
+    # Adds copies of every register to the solution
+    registers = {}
+    for register_name, register in simulation.registers.items():
+        for i in range(copies):
+            registers[register_name + ' ' + str(i + 1)] = register.copy()
+
+    simulation.registers = registers
+    return simulation
+
+
+def load_tm(tape_input, directory):
+    # Converts the bundled binary increment Turing machine with a custom input into a register
+    from simd_dna.tm import convert_tm_to_simd
+
+    with open(os.path.join(REPOSITORY_DIRECTORY, 'increment_tm.yaml')) as file:
+        specification = file.read()
+    filename = os.path.join(directory, 'increment_tm.yaml')
+    with open(filename, 'w') as file:
+        file.write(specification.replace("input: '100111 '", "input: '" + tape_input + "'"))
+
+    simulation = Simulation()
+    convert_tm_to_simd(simulation, filename, 'TM')
+    return simulation
+
+
+def get_workloads(quick, directory):
+    workloads = [(filename[:-len('.json')], lambda filename=filename: load_example(filename))
+                 for filename in EXAMPLES]
+    cell_copies = [8] if quick else [8, 32]
+    register_copies = [100] if quick else [100, 1000]
+    tm_inputs = ['1011011101111 '] if quick else ['1011011101111 ', '10110111011110110111011101 ']
+    for copies in cell_copies:
+        workloads.append(('increment x%d cells' % copies,
+                          lambda copies=copies: scale_cells(load_example('increment.json'), copies)))
+    for copies in register_copies:
+        workloads.append(('increment x%d registers' % copies,
+                          lambda copies=copies: scale_registers(load_example('increment.json'), copies)))
+    for tape_input in tm_inputs:
+        workloads.append(('tm input %d' % len(tape_input.strip()),
+                          lambda tape_input=tape_input: load_tm(tape_input, directory)))
+
+    return workloads
+
+
+def run_cycle(simulation):
+    # Applies every instruction to every register once, returning the registers before each instruction
+    simulation.keep_results = True
+    states = []
+    for inst_num in range(len(simulation.instructions)):
+        for register_name in simulation.registers:
+            states.append((simulation.run_instruction(register_name, inst_num)[1], inst_num))
+
+    return len(simulation.registers) * len(simulation.instructions), states
+
+
+def run_cycles_cached(simulation, cycles=3):
+    # Applies every instruction to every register for several cycles with the instruction cache turned on
+    from simd_dna.cache import InstructionCache
+
+    simulation.instruction_cache = InstructionCache()
+    for _ in range(cycles):
+        run_cycle(simulation)
+
+    return cycles * len(simulation.registers) * len(simulation.instructions)
+
+
+def run_cycles_windowed(simulation, cycles=3, window_size=8):
+    # Applies every instruction to every register for several cycles with memoized windows of cells
+    from simd_dna.windows import WindowMemo
+
+    simulation.window_memo = WindowMemo(window_size)
+    for _ in range(cycles):
+        run_cycle(simulation)
+
+    return cycles * len(simulation.registers) * len(simulation.instructions)
+
+
+def run_cycles_without_output(simulation, cycles=3):
+    # Applies every instruction to every register for several cycles with Simulation.run_cycles, which records nothing
+    for register_name in simulation.registers:
+        simulation.run_cycles(register_name, cycles, detect_repeats=False)
+
+    return cycles * len(simulation.registers) * len(simulation.instructions)
+
+
+def iter_cycles(simulation, cycles=3):
+    # Applies every instruction to every register for several cycles with Simulation.iter_run, which only yields diffs
+    simulation.keep_results = True
+    for _ in range(cycles):
+        for register_name in simulation.registers:
+            for _ in simulation.iter_run(register_name):
+                pass
+
+    return cycles * len(simulation.registers) * len(simulation.instructions)
+
+
+def run_cycle_batch(simulation):
+    simulation.keep_results = True
+    for inst_num in range(len(simulation.instructions)):
+        simulation.run_instruction_batch(inst_num)
+
+    return len(simulation.registers) * len(simulation.instructions)
+
+
+def attempt_attachments(simulation, states):
+    # Attempts to attach every instruction strand at every domain of every recorded register state
+    attempts = 0
+    elapsed = 0.0
+    for state, inst_num in states:
+        register = state.copy()
+        for strand_name in simulation.instructions[inst_num]:
+            start = time.perf_counter()
+            for domain_index in range(register.total_domains):
+                register.attempt_attachment(domain_index, strand_name)
+            elapsed += time.perf_counter() - start
+            attempts += register.total_domains
+
+    return attempts, elapsed
+
+
+def displace_strands(simulation, states):
+    # Displaces strands on every recorded register state after the instruction strands attached
+    calls = 0
+    elapsed = 0.0
+    for state, inst_num in states:
+        register = state.copy()
+        new_strands = []
+        for strand_name in simulation.instructions[inst_num]:
+            for domain_index in range(register.total_domains):
+                new_strands.extend(register.attempt_attachment(domain_index, strand_name) or [])
+
+        start = time.perf_counter()
+        register.displace_strands(new_strands)
+        register.displace_strands()
+        elapsed += time.perf_counter() - start
+        calls += 2
+
+    return calls, elapsed
+
+
+def draw_svg(simulation, directory):
+    from simd_dna.cli import report_results
+    from simd_dna.register_svg import RegisterSVGDrawing
+
+    initial_registers = {register_name: register.copy() for register_name, register in simulation.registers.items()}
+    results = simulation.run_all()
+    start = time.perf_counter()
+    report_results(initial_registers, results, print_results=False, svg_drawing=RegisterSVGDrawing(),
+                   svg_directory=directory)
+    return len(simulation.registers), time.perf_counter() - start
+
+
+def save_json(simulation, filename):
+    simulation.save_json(filename)
+    return os.path.getsize(filename) / 1e6
+
+
+def load_json(filename):
+    Simulation().load_json(filename)
+    return os.path.getsize(filename) / 1e6
+
+
+def save_binary(simulation, filename):
+    simulation.save_binary(filename)
+    return sum(len(register.top_strands) for register in simulation.registers.values())
+
+
+def load_binary(filename):
+    simulation = Simulation()
+    simulation.load_binary(filename)
+    return sum(len(register.top_strands) for register in simulation.registers.values())
+
+
+def get_measurements(loader, directory):
+    # Each measurement is (name, unit, function), where function returns either the number of units processed, or a
+    # tuple of the number of units and the elapsed time if only part of the function is timed
+    filename = os.path.join(directory, 'benchmark.json')
+    binary_filename = os.path.join(directory, 'benchmark.simd')
+    measurements = [
+        ('run_instruction', 'instructions', lambda: _timed(run_cycle, loader())),
+        ('run_instruction_cached', 'instructions', lambda: _timed(run_cycles_cached, loader())),
+        ('run_instruction_windowed', 'instructions', lambda: _timed(run_cycles_windowed, loader())),
+        ('run_cycles', 'instructions', lambda: _timed(run_cycles_without_output, loader())),
+        ('iter_run', 'instructions', lambda: _timed(iter_cycles, loader())),
+        ('attempt_attachment', 'attempts', lambda: attempt_attachments(*_recorded_states(loader))),
+        ('displace_strands', 'calls', lambda: displace_strands(*_recorded_states(loader))),
+        ('save_json', 'MB', lambda: save_json(loader(), filename)),
+        ('load_json', 'MB', lambda: (save_json(loader(), filename), load_json(filename))[1]),
+        ('save_binary', 'strands', lambda: _timed_call(save_binary, loader(), binary_filename)),
+        ('load_binary', 'strands', lambda: (save_binary(loader(), binary_filename),
+                                            _timed_call(load_binary, binary_filename))[1]),
+    ]
+
+    try:
+        import numpy  # noqa: F401
+        measurements.insert(1, ('run_instruction_batch', 'instructions', lambda: _timed(run_cycle_batch, loader())))
+    except ImportError:
+        pass
+
+    try:
+        import svgwrite  # noqa: F401
+        measurements.append(('svg', 'registers', lambda: draw_svg(loader(), directory)))
+    except ImportError:
+        pass
+
+    return measurements
+
+
+def _timed(function, simulation):
+    start = time.perf_counter()
+    result = function(simulation)
+    elapsed = time.perf_counter() - start
+    return result[0] if isinstance(result, tuple) else result, elapsed
+
+
+def _timed_call(function, *args):
+    start = time.perf_counter()
+    units = function(*args)
+    return units, time.perf_counter() - start
+
+
+def _recorded_states(loader):
+    simulation = loader()
+    return simulation, run_cycle(simulation)[1]
+
+
+def measure(function, repeat):
+    # Returns the best time and the throughput of the timed part of function, and the peak memory of one traced run
+    best_time = None
+    units = 0
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        if isinstance(result, tuple):
+            result, elapsed = result
+        units = result
+        if best_time is None or elapsed < best_time:
+            best_time = elapsed
+
+    gc.collect()
+    tracemalloc.start()
+    function()
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'seconds': best_time, 'units': units, 'throughput': units / best_time if best_time > 0 else 0.0,
+            'peak_memory_mb': peak_memory / 1e6}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--quick', action='store_true', help='only run the smaller scaled workloads')
+    parser.add_argument('--repeat', type=int, default=3, help='number of timed runs of each measurement')
+    parser.add_argument('--filter', metavar='TEXT', help='only run workloads or measurements whose name contains TEXT')
+    parser.add_argument('--json', metavar='FILE', help='save the results to a JSON file')
+    parser.add_argument('--compare', metavar='FILE', help='compare the timings with results saved by --json')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare is not None:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+
+    results = {}
+    header = '%-26s %-24s %10s %16s %12s' % ('workload', 'measurement', 'seconds', 'throughput', 'peak MB')
+    if baseline is not None:
+        header += ' %9s' % 'speedup'
+    print(header)
+    with tempfile.TemporaryDirectory() as directory:
+        for workload_name, loader in get_workloads(args.quick, directory):
+            for measurement_name, unit, function in get_measurements(loader, directory):
+                key = workload_name + '/' + measurement_name
+                if args.filter is not None and args.filter not in key:
+                    continue
+
+                result = measure(function, args.repeat)
+                results[key] = result
+                line = '%-26s %-24s %10.4f %10.0f %-5s %12.2f' % (workload_name, measurement_name,
+                                                                 result['seconds'], result['throughput'],
+                                                                 unit + '/s' if unit != 'MB' else 'MB/s',
+                                                                 result['peak_memory_mb'])
+                if baseline is not None and key in baseline and result['seconds'] > 0:
+                    line += ' %8.2fx' % (baseline[key]['seconds'] / result['seconds'])
+                print(line, flush=True)
+
+    if args.json is not None:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=4)
+
+
+if __name__ == '__main__':
+    main()
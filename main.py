@@ -1,13 +1,15 @@
 import sys
+from typing import Optional
 
 from simd_dna import *
+from simd_dna.checkpoint import Checkpointer
 from simd_dna.classes import TopStrand
-import copy
-import json
+from simd_dna.cli import load_simulation, report_diffs, save_simulation
 
 program_loop = True
 svg_drawing = RegisterSVGDrawing()
 local_simulation = Simulation()
+checkpointer: Optional[Checkpointer] = None
 
 
 def add_cell_type():
@@ -74,70 +76,32 @@ all separated by commas: ').split(',')
 
 
 def run_simulation():
-    for register_key in local_simulation.registers.keys():
-        print(register_key)
-        register = local_simulation.registers[register_key]
-        if local_simulation.keep_results:
-            original_register = None
-        else:
-            original_register = copy.deepcopy(register)
-            local_simulation.keep_results = True  # temporarily save results during instruction cycle
-        svg_drawing.initialize(register, register_key, len(local_simulation.instructions))
-
-        for inst_num in range(len(local_simulation.instructions)):
-            label = ("" if svg_drawing.compress_svg_drawings else "Instruction ") + str(inst_num + 1)
-            register, before_register, new_strands, inert_matches = local_simulation.run_instruction(register_key,
-                                                                                                          inst_num)
-
-            print("Instruction", inst_num + 1)
-
-            if (len(new_strands) == 0 and (
-                    inert_matches is None or len(inert_matches) == 0)) and inst_num > 0:
-                print('No changes\n')
-            else:
-                before_register.print(new_strands, inert_matches)
-                print()
-
-            if svg_drawing.draw_inert_instructions or len(new_strands) > 0:
-                svg_drawing.draw_contents(before_register, label, len(new_strands) == 0)
-                svg_drawing.draw_strands(register, new_strands, 3)
-                svg_drawing.draw_strands(register, inert_matches,
-                                         3 if svg_drawing.compress_svg_drawings else 6, True)
-                svg_drawing.increment_vertical_offset()
-
-            if local_simulation.step_by_step_simulation:
-                input('Press Enter to continue')
-
-        print("Final result")
-        register.print()
-        print()
-        label = "F" if svg_drawing.compress_svg_drawings else "Final result"
-        svg_drawing.draw_contents(register, label=label)
-        svg_drawing.save_svg()
-        if original_register is not None:
-            local_simulation.registers[register_key] = original_register
-            local_simulation.keep_results = False
-
-        if local_simulation.step_by_step_simulation:
-            input('Press Enter to continue')
+    # Apply the instructions to one register at a time, printing and drawing the results of each instruction as soon as
+    # it's applied, so that only the changes made by the latest instruction are kept. If a checkpoint file is set, each
+    # register continues from its checkpoint, and the file is deleted once every register has been run.
+    for register_key in list(local_simulation.registers.keys()):
+        register = local_simulation.registers[register_key].copy()
+        inst_nums = range(len(local_simulation.instructions))
+        checkpoint = checkpointer.get_progress(local_simulation, register_key) if checkpointer is not None else None
+        if checkpoint is not None:
+            print('Resuming', register_key, 'after instruction', checkpoint.position)
+            # The checkpoint's register is the one the instructions are applied to, so the diffs are reported
+            # against a copy
+            register = checkpoint.register.copy()
+            inst_nums = range(checkpoint.position, len(local_simulation.instructions))
+
+        report_diffs(register_key, register, local_simulation.iter_run(register_key, checkpointer=checkpointer,
+                                                                       checkpoint=checkpoint),
+                     len(inst_nums), svg_drawing=svg_drawing, step_by_step=local_simulation.step_by_step_simulation,
+                     inst_nums=inst_nums)
+
+    if checkpointer is not None:
+        checkpointer.remove()
 
 
 def save_data():
     filename = input("Enter filename: ")
-    register_copies = copy.deepcopy(local_simulation.registers)
-    for register in register_copies.values():
-        del register.cell_types
-        del register.strand_types
-        del register.total_domains
-
-    with open(filename, 'w') as file:
-        json.dump({
-            'cell_types': local_simulation.cell_types,
-            'strand_types': local_simulation.strand_types,
-            'registers': register_copies,
-            'instructions': local_simulation.instructions
-        }, file, indent=4, cls=ObjectEncoder)
-        file.flush()
+    save_simulation(local_simulation, filename)
 
 
 def toggle_step_by_step_simulation():
@@ -164,31 +128,21 @@ def toggle_draw_inert_instructions():
     svg_drawing.draw_inert_instructions = not svg_drawing.draw_inert_instructions
 
 
+def set_checkpoint_file() -> None:
+    global checkpointer
+    filename = input("Enter checkpoint filename (leave empty to turn off checkpoints): ")
+    checkpointer = Checkpointer(filename) if filename != '' else None
+
+
 def exit_loop():
     global program_loop
     program_loop = False
 
 
-def decode_json_dict(d, cls):
-    decoded_dict = {}
-    for key in d.keys():
-        decoded_dict[key] = cls.decode_json(**d[key])
-
-    return decoded_dict
-
-
 def simd_simulator(args):
     if len(args) > 1:
         print('Loading saved data...')
-        with open(args[1]) as file:
-            data = json.load(file)
-            local_simulation.cell_types = decode_json_dict(data['cell_types'], Cell)
-            local_simulation.strand_types = decode_json_dict(data['strand_types'], Strand)
-            for key in data['registers']:
-                data['registers'][key]['cell_types'] = local_simulation.cell_types
-                data['registers'][key]['strand_types'] = local_simulation.strand_types
-            local_simulation.registers = decode_json_dict(data['registers'], Register)
-            local_simulation.instructions = data['instructions']
+        load_simulation(local_simulation, args[1])
 
     choice_dict = {'1': add_cell_type,
                    '2': add_cells_to_register,
@@ -203,7 +157,8 @@ def simd_simulator(args):
                    '11': toggle_compress_svg_drawings,
                    '12': convert_tm_to_simd_wrapper,
                    '13': toggle_draw_inert_instructions,
-                   '14': exit_loop}
+                   '14': exit_loop,
+                   '15': set_checkpoint_file}
 
     while program_loop:
         choice = input('''Enter one of the following options:
@@ -228,6 +183,9 @@ def simd_simulator(args):
             else 'Draw inert instructions in SVG') +
                         '''
 14 - Exit
+15 - ''' + ('Change checkpoint file (' + checkpointer.filename + ')' if checkpointer is not None
+            else 'Set checkpoint file') +
+                        '''
 
 ''')
 
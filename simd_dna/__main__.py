@@ -0,0 +1,4 @@
+from simd_dna.cli import main
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,320 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+from simd_dna.classes import Register, TopStrand
+
+
+class RegisterBatch:
+    """A group of registers with the same cells, encoded as NumPy arrays so that an instruction can be applied to every
+    register of the group at once. Each register keeps its top strands as insertion stamps in a
+    (registers × strand types × start indices) array, and the number of strands bound to each of its domains in a
+    (registers × domains) array. Instructions are applied in lockstep: every attachment attempt and every round of
+    strand displacement is a single array operation over all registers, and registers whose displacement cascade
+    has settled are masked out of the remaining rounds. The results are identical to those of
+    :func:`simd_dna.simulation.Simulation.run_instruction`, including the order of the top strands.
+
+    Registers that can't be encoded, e.g. because their top strands aren't sorted by start index, are reported by
+    :func:`simd_dna.batch.RegisterBatch.encode` so that the caller can simulate them one at a time instead.
+
+    :param registers: A list of :class:`simd_dna.classes.Register` s that share the same cells, cell types and
+        strand types.
+    :param instruction: The list of instruction strand names that will be applied to the registers.
+    """
+
+    def __init__(self, registers: List[Register], instruction: List[str]) -> None:
+        self.registers = registers
+        self.instruction = instruction
+        layout = registers[0]
+        layout._ensure_domain_index()
+        self.strand_types = layout.strand_types
+        self.total_domains = layout.total_domains
+
+        self.strand_names: List[str] = []
+        self._strand_numbers: Dict[str, int] = {}
+        for strand_name in instruction:
+            self._add_strand_name(strand_name)
+
+        # Each top strand is encoded as strand number * total domains + start index, and the TopStrand instances of
+        # the registers are reused when decoding
+        self._strand_codes: Dict[TopStrand, int] = {}
+        self._top_strands: Dict[int, TopStrand] = {}
+        self._matches: List[np.ndarray] = []
+        self._longest_strand = 0
+        self._stamps = np.zeros((0, 0, 0), dtype=np.int64)
+        self._bound_counts = np.zeros((0, 0), dtype=np.int32)
+        self._next_stamp = 1
+        # The register numbers, start indices and strand number of the instruction strands attached by each event
+        self._new_strands: List[Tuple[np.ndarray, np.ndarray, int]] = []
+
+    def _add_strand_name(self, strand_name: str) -> int:
+        if strand_name not in self._strand_numbers:
+            self._strand_numbers[strand_name] = len(self.strand_names)
+            self.strand_names.append(strand_name)
+
+        return self._strand_numbers[strand_name]
+
+    def _encode_strand(self, top_strand: TopStrand) -> int:
+        # Returns the code of a top strand, or -1 if it can't be encoded
+        strand = self.strand_types.get(top_strand.strand_name)
+        if strand is None or strand.is_complementary or len(strand.domains) == 0 \
+                or not 0 <= top_strand.start_index < self.total_domains:
+            return -1
+
+        code = self._add_strand_name(top_strand.strand_name) * self.total_domains + top_strand.start_index
+        self._top_strands[code] = top_strand
+        return code
+
+    def encode(self) -> List[Register]:
+        """Encodes the registers as arrays, leaving out the registers that can't be simulated in a batch.
+
+        :return: The list of registers that were left out, which should be simulated one at a time
+        """
+        if self.total_domains == 0:
+            return self._leave_out_all()
+        for strand_name in self.instruction:
+            strand = self.strand_types.get(strand_name)
+            if strand is None or len(strand.domains) == 0:
+                return self._leave_out_all()
+
+        total_domains = self.total_domains
+        strand_codes = self._strand_codes
+        encoded_registers = []
+        left_out = []
+        register_codes = []
+        for register in self.registers:
+            known_codes = [strand_codes.get(top_strand) for top_strand in register.top_strands]
+            if None in known_codes:
+                for i, top_strand in enumerate(register.top_strands):
+                    if known_codes[i] is None:
+                        known_codes[i] = strand_codes[top_strand] = self._encode_strand(top_strand)
+
+            codes = np.array(known_codes, dtype=np.int64)
+            # The top strands must be valid, sorted by start index and unique
+            if len(codes) > 0 and (codes.min() < 0 or (np.diff(codes % total_domains) < 0).any()
+                                   or len(np.unique(codes)) < len(codes)):
+                left_out.append(register)
+            else:
+                encoded_registers.append(register)
+                register_codes.append(codes)
+                self._next_stamp = max(self._next_stamp, len(codes) + 1)
+
+        # For every strand type, whether each of its domains complements the bottom strand when the strand starts at
+        # each domain index
+        layout = self.registers[0]
+        bottom_domains = np.array(layout._bottom_domains, dtype=np.int64)
+        for strand_name in self.strand_names:
+            strand_domains = layout._get_strand_domain_ids(strand_name)
+            matches = np.zeros((len(strand_domains), total_domains), dtype=np.bool_)
+            for i, domain_id in enumerate(strand_domains):
+                # Domains past the end of the register never match
+                match_count = max(total_domains - i, 0)
+                matches[i, :match_count] = bottom_domains[i:i + match_count] == domain_id
+            self._matches.append(matches)
+            self._longest_strand = max(self._longest_strand, len(strand_domains))
+
+        self.registers = encoded_registers
+        strand_count = len(self.strand_names)
+        self._stamps = np.zeros((len(encoded_registers), strand_count, total_domains), dtype=np.int64)
+        # Padded on the right so that strands overhanging the end of the register can be added without bounds checks
+        self._bound_counts = np.zeros((len(encoded_registers), total_domains + self._longest_strand), dtype=np.int32)
+        if len(register_codes) > 0:
+            lengths = [len(codes) for codes in register_codes]
+            stamps = np.concatenate([np.arange(1, length + 1) for length in lengths])
+            register_numbers = np.repeat(np.arange(len(register_codes)), lengths)
+            self._stamps.reshape(len(encoded_registers), -1)[register_numbers, np.concatenate(register_codes)] = stamps
+
+        for strand_number in range(strand_count):
+            self._update_bound_counts(strand_number, self._stamps[:, strand_number, :] > 0, 1)
+
+        return left_out
+
+    def _leave_out_all(self) -> List[Register]:
+        left_out = self.registers
+        self.registers = []
+        return left_out
+
+    def _update_bound_counts(self, strand_number: int, start_indices: np.ndarray, change: int) -> None:
+        # Adds change to the bound counts of the domains complemented by the strands of the given type that start at
+        # the given (registers × start indices) positions
+        total_domains = self.total_domains
+        for i, matches in enumerate(self._matches[strand_number]):
+            self._bound_counts[:, i:i + total_domains] += change * (start_indices & matches)
+
+    def _insecure_domains(self, strand_number: int) -> np.ndarray:
+        # Counts, for every register and start index, the domains of a strand of the given type that would be
+        # contested by another strand or orthogonal to the bottom strand
+        matches = self._matches[strand_number]
+        contested = self._bound_counts > 1
+        total_domains = self.total_domains
+        insecure_domains = np.zeros((len(self.registers), total_domains), dtype=np.int32)
+        insecure_domains += len(matches) - matches.sum(axis=0)
+        for i in range(len(matches)):
+            insecure_domains += contested[:, i:i + total_domains] & matches[i]
+
+        return insecure_domains
+
+    def _remove_strands(self, removed: np.ndarray) -> None:
+        for strand_number in range(len(self.strand_names)):
+            strand_removed = removed[:, strand_number, :]
+            if strand_removed.any():
+                self._stamps[:, strand_number, :][strand_removed] = 0
+                self._update_bound_counts(strand_number, strand_removed, -1)
+
+    def _displace_strands(self, active: np.ndarray, excluded: Optional[np.ndarray] = None) -> np.ndarray:
+        # The batch counterpart of Register.displace_strands, applied to the active registers
+        displaced = np.zeros(self._stamps.shape, dtype=np.bool_)
+        for strand_number, strand_name in enumerate(self.strand_names):
+            present = (self._stamps[:, strand_number, :] > 0) & active[:, None]
+            if excluded is not None:
+                present &= ~excluded[:, strand_number, :]
+            if present.any():
+                strand_length = len(self.strand_types[strand_name].domains)
+                displaced[:, strand_number, :] = present & (self._insecure_domains(strand_number) >= strand_length - 1)
+
+        self._remove_strands(displaced)
+        return displaced
+
+    def _remove_complementary(self, strand_name: str,
+                              active: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # The batch counterpart of Register.attempt_attachment for strands complementary to the top strand, returning
+        # the register numbers, start indices and stamps of the removed strands
+        strand_domains = self.strand_types[strand_name].domains
+        removed = np.zeros(self._stamps.shape, dtype=np.bool_)
+        for strand_number, top_strand_name in enumerate(self.strand_names):
+            top_strand_domains = self.strand_types[top_strand_name].domains
+            if self.strand_types[top_strand_name].is_complementary \
+                    or strand_domains[:len(top_strand_domains)] != top_strand_domains:
+                continue
+            present = (self._stamps[:, strand_number, :] > 0) & active[:, None]
+            if present.any():
+                # must have at least one insecure domain
+                removed[:, strand_number, :] = present & (self._insecure_domains(strand_number) >= 1)
+
+        register_numbers, strand_numbers, start_indices = np.nonzero(removed)
+        stamps = self._stamps[register_numbers, strand_numbers, start_indices]
+        self._remove_strands(removed)
+        return register_numbers, start_indices, stamps
+
+    def apply_instruction(self) -> None:
+        """Applies the instruction to every encoded register, following the same rounds of attachment and displacement
+        as :func:`simd_dna.simulation.Simulation.apply_instruction`.
+        """
+        register_count = len(self.registers)
+        # Attachment attempts at start indices where the strand complements fewer than two domains never succeed
+        attachment_domains = {}
+        for strand_name in self.instruction:
+            strand_number = self._strand_numbers[strand_name]
+            matches = self._matches[strand_number]
+            start_domains = []
+            for start_index in np.flatnonzero(matches.sum(axis=0) >= 2).tolist():
+                start_domains.append((start_index, np.flatnonzero(matches[:, start_index]) + start_index))
+            attachment_domains[strand_number] = start_domains
+
+        for _ in range(len(self.instruction)):
+            active = np.ones(register_count, dtype=np.bool_)
+            while active.any():
+                attached = np.zeros(self._stamps.shape, dtype=np.bool_)
+                has_complementary = np.zeros(register_count, dtype=np.bool_)
+                out_of_order = np.zeros(register_count, dtype=np.bool_)
+                last_start = np.full(register_count, -1)
+                events: List[tuple] = []
+                for strand_name in self.instruction:
+                    strand_number = self._strand_numbers[strand_name]
+                    if self.strand_types[strand_name].is_complementary:
+                        removed_strands = self._remove_complementary(strand_name, active)
+                        has_complementary[removed_strands[0]] = True
+                        events.append((strand_number, removed_strands))
+                        continue
+
+                    for start_index, matching_domains in attachment_domains[strand_number]:
+                        has_open_toehold = active & (self._bound_counts[:, matching_domains] == 0).any(axis=1)
+                        if not has_open_toehold.any():
+                            continue
+                        self._stamps[has_open_toehold, strand_number, start_index] = self._next_stamp
+                        self._next_stamp += 1
+                        self._bound_counts[:, matching_domains] += has_open_toehold[:, None]
+                        attached[:, strand_number, start_index] = has_open_toehold
+                        out_of_order |= has_open_toehold & (last_start > start_index)
+                        last_start[has_open_toehold] = start_index
+                        events.append((strand_number, start_index, has_open_toehold))
+
+                has_new_strands = has_complementary | attached.any(axis=(1, 2))
+                # do first round of displacements preserving the new strands
+                self._displace_strands(active & has_new_strands, attached)
+                displaced = self._displace_strands(active)
+                # The displaced strands are listed by start index, and the new strands in order of attachment. Both
+                # lists are equal if they contain the same strands and the new strands attached from left to right.
+                all_displaced = ~has_complementary & ~out_of_order & ~(attached != displaced).any(axis=(1, 2))
+                kept = active & ~all_displaced
+                for event in events:
+                    if len(event) == 2:
+                        strand_number, (register_numbers, start_indices, stamps) = event
+                        order = np.lexsort((stamps, start_indices))
+                        register_numbers = register_numbers[order]
+                        start_indices = start_indices[order]
+                        is_kept = kept[register_numbers]
+                        self._new_strands.append((register_numbers[is_kept], start_indices[is_kept], strand_number))
+                    else:
+                        strand_number, start_index, has_open_toehold = event
+                        register_numbers = np.flatnonzero(has_open_toehold & kept
+                                                          & ~displaced[:, strand_number, start_index])
+                        self._new_strands.append((register_numbers, np.full(len(register_numbers), start_index),
+                                                  strand_number))
+
+                active &= has_new_strands & ~all_displaced
+
+    def decode(self) -> Tuple[List[List[TopStrand]], List[List[TopStrand]]]:
+        """Decodes the top strands of the encoded registers, and the instruction strands that attached to them.
+
+        :return: A tuple containing, for every encoded register, the list of top strands sorted by start index, and
+            the list of applicable instruction strands sorted by start index, as returned by
+            :func:`simd_dna.simulation.Simulation.run_instruction`
+        """
+        register_numbers, strand_numbers, start_indices = np.nonzero(self._stamps)
+        stamps = self._stamps[register_numbers, strand_numbers, start_indices]
+        order = np.lexsort((stamps, start_indices, register_numbers))
+        top_strands = self._group_strands(register_numbers[order], start_indices[order], strand_numbers[order])
+
+        if len(self._new_strands) > 0:
+            register_numbers, start_indices, strand_numbers = (
+                np.concatenate(values) for values in zip(*((register_numbers, start_indices,
+                                                             np.full(len(register_numbers), strand_number))
+                                                            for register_numbers, start_indices, strand_number
+                                                            in self._new_strands)))
+        else:
+            register_numbers = start_indices = strand_numbers = np.zeros(0, dtype=np.int64)
+        order = np.lexsort((np.arange(len(register_numbers)), start_indices, register_numbers))
+        new_strands = self._group_strands(register_numbers[order], start_indices[order], strand_numbers[order])
+        return top_strands, new_strands
+
+    def _group_strands(self, register_numbers: np.ndarray, start_indices: np.ndarray,
+                       strand_numbers: np.ndarray) -> List[List[TopStrand]]:
+        # Splits register-sorted strands into one list of TopStrands per register
+        codes = strand_numbers * self.total_domains + start_indices
+        for code in np.unique(codes).tolist():
+            if code not in self._top_strands:
+                strand_number, start_index = divmod(code, self.total_domains)
+                self._top_strands[code] = TopStrand(start_index, self.strand_names[strand_number])
+
+        table = np.empty(len(self.strand_names) * self.total_domains, dtype=object)
+        table[list(self._top_strands.keys())] = list(self._top_strands.values())
+        strands = table[codes].tolist()
+        boundaries = np.searchsorted(register_numbers, np.arange(len(self.registers) + 1)).tolist()
+        return [strands[boundaries[i]:boundaries[i + 1]] for i in range(len(self.registers))]
+
+
+def group_registers(registers: Dict[str, Register]) -> List[List[str]]:
+    """Groups registers that can be simulated in the same :class:`simd_dna.batch.RegisterBatch`, i.e. registers with
+    the same cells, cell types and strand types.
+
+    :param registers: A dict mapping register names to :class:`simd_dna.classes.Register` instances
+    :return: A list of groups of register names, in order of first appearance
+    """
+    groups: Dict[Tuple[Tuple[str, ...], int, int], List[str]] = {}
+    for register_name, register in registers.items():
+        key = (tuple(register.cells), id(register.cell_types), id(register.strand_types))
+        groups.setdefault(key, []).append(register_name)
+
+    return list(groups.values())
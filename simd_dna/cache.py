@@ -0,0 +1,111 @@
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from simd_dna.classes import MatchTable, Register, TopStrand
+
+
+class InstructionCache:
+    """A least recently used cache of the results of applying instructions to registers, which
+    :class:`simd_dna.simulation.Simulation` consults before simulating an instruction. Results are keyed by the cells
+    and top strands of the register before the instruction and by the instruction strands, so the cache is shared by
+    identical registers in the same solution and by repeated instruction cycles that reach the same register contents.
+
+    :param max_strands: The maximum number of top strands held by the cache, counting the top strands of the register
+        before and after each instruction and the applicable and inert instruction strands it returned. As top strands
+        make up most of the cached data, this bounds the memory used by the cache. When the bound is exceeded, the
+        least recently used results are evicted first.
+
+    :ivar int hits: The number of lookups that found a cached result.
+    :ivar int misses: The number of lookups that didn't find a cached result.
+    :ivar int evictions: The number of results evicted to stay within max_strands.
+    :ivar int total_strands: The number of top strands currently held by the cache.
+    """
+
+    def __init__(self, max_strands: int = 1000000) -> None:
+        self.max_strands = max_strands
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.total_strands = 0
+        # Maps each key to a copy of the register after the instruction, the applicable and inert instruction strands
+        # and the number of top strands held, least recently used first
+        self._results: OrderedDict[Tuple, Tuple[Register, Tuple[TopStrand, ...], Optional[Tuple[TopStrand, ...]],
+                                                int]] = OrderedDict()
+        self._match_table: Optional[MatchTable] = None
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    @staticmethod
+    def get_key(register: Register, instruction: List[str], show_inert_instruction_strands: bool) \
+            -> Tuple[Tuple[str, ...], Tuple[TopStrand, ...], Tuple[str, ...], bool]:
+        """Returns the canonical key of applying an instruction to the current contents of a register. Registers with
+        the same cells and the same top strands, listed in the same order, have equal keys.
+
+        :param register: The :class:`simd_dna.classes.Register` before applying the instruction
+        :param instruction: The list of instruction strand names
+        :param show_inert_instruction_strands: Whether the result includes the inert instruction strands
+        :return: A hashable key
+        """
+        return tuple(register.cells), tuple(register.top_strands), tuple(instruction), show_inert_instruction_strands
+
+    def check_match_table(self, match_table: MatchTable) -> None:
+        """Clears the cache if the cell or strand types changed since the cached results were simulated, which is the
+        case if the simulation compiled a different :class:`simd_dna.classes.MatchTable`
+
+        :param match_table: The current match table of the simulation
+        """
+        if match_table is not self._match_table:
+            self.clear()
+            self._match_table = match_table
+
+    def get(self, key: Tuple) -> Optional[Tuple[Register, Tuple[TopStrand, ...], Optional[Tuple[TopStrand, ...]]]]:
+        """Looks up the result of an instruction, and marks it as the most recently used one.
+
+        :param key: A key returned by :func:`simd_dna.cache.InstructionCache.get_key`
+        :return: A tuple containing a copy of the :class:`simd_dna.classes.Register` after the instruction, the
+            applicable instruction strands and (optionally) the inert instruction strands, or None if the result isn't
+            cached
+        """
+        result = self._results.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._results.move_to_end(key)
+        return result[:3]
+
+    def put(self, key: Tuple, register: Register, new_strands: List[TopStrand],
+            inert_matches: Optional[List[TopStrand]]) -> None:
+        """Caches the result of an instruction, evicting the least recently used results if the cache holds more than
+        max_strands top strands afterwards.
+
+        :param key: The key returned by :func:`simd_dna.cache.InstructionCache.get_key` before the instruction was
+            applied
+        :param register: The :class:`simd_dna.classes.Register` after the instruction. A copy is cached, so the
+            register can be modified afterwards.
+        :param new_strands: The list of applicable instruction strands
+        :param inert_matches: The list of inert instruction strands, or None
+        """
+        if key in self._results:
+            self._results.move_to_end(key)
+            return
+
+        new_strand_tuple = tuple(new_strands)
+        inert_match_tuple = None if inert_matches is None else tuple(inert_matches)
+        size = len(key[1]) + len(register.top_strands) + len(new_strand_tuple) \
+            + (len(inert_match_tuple) if inert_match_tuple is not None else 0)
+        if size > self.max_strands:
+            return
+
+        self._results[key] = (register.copy(), new_strand_tuple, inert_match_tuple, size)
+        self.total_strands += size
+        while self.total_strands > self.max_strands:
+            self.total_strands -= self._results.popitem(last=False)[1][3]
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Removes every cached result. The hit, miss and eviction counters are kept."""
+        self._results.clear()
+        self.total_strands = 0
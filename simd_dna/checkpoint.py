@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass
+from itertools import islice
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+from simd_dna.classes import Register, TopStrand
+
+if TYPE_CHECKING:
+    from simd_dna.simulation import Simulation
+
+_VERSION = 2
+
+
+@dataclass(frozen=True)
+class Checkpoint:
+    """The progress of a run of a register, as saved by a :class:`simd_dna.checkpoint.Checkpointer`.\n
+    Attributes:\n
+    **register:** The :class:`simd_dna.classes.Register` at the saved point of the run\n
+    **cycles:** The number of complete instruction cycles applied by
+    :func:`simd_dna.simulation.Simulation.run_cycles`, or 0 for :func:`simd_dna.simulation.Simulation.iter_run`\n
+    **position:** The number of instructions applied since the last complete cycle, or since the start of the run for
+    :func:`simd_dna.simulation.Simulation.iter_run`\n
+    **seen_states:** The dict mapping the digests of the top strands of the register after earlier cycles to the
+    number of the first cycle after which it had them, which :func:`simd_dna.simulation.Simulation.run_cycles` uses
+    to detect repeats, or None if repeats weren't detected
+    """
+    register: Register
+    cycles: int
+    position: int
+    seen_states: Optional[Dict[bytes, int]] = None
+
+
+class Checkpointer:
+    """Saves the progress of long runs to a checkpoint file, so that a run whose process dies can be resumed from the
+    last checkpoint and produce the same results as an uninterrupted run. It's passed to
+    :func:`simd_dna.simulation.Simulation.run_cycles` or :func:`simd_dna.simulation.Simulation.iter_run`, which
+    continue from the checkpoint of the register if there is one, and save the register contents, the number of cycles
+    and the number of instructions applied whenever interval seconds have passed since the last checkpoint, as well as
+    when the run of the register ends. Checking whether a checkpoint is due only reads the clock, so the engine isn't
+    slowed down between checkpoints.
+
+    The progress of every register run with the checkpointer is kept in the same file, so the registers of a
+    simulation can be run one after the other, and those whose run had ended are not run again when resuming. The
+    file is written to a temporary file in the same directory, flushed to disk and renamed over the previous
+    checkpoint, so that it always holds a complete checkpoint, even if the process dies while writing it. It's a JSON
+    file that also holds a digest of the instructions of the simulation, so that a run isn't resumed with different
+    instructions. The progress of each register is only encoded when that register is saved, so a checkpoint costs as
+    much as encoding the register being run, however many registers were run before it.
+
+    When :func:`simd_dna.simulation.Simulation.run_cycles` detects repeats, the digests of the register contents after
+    each cycle are appended to a log next to the checkpoint file, named after it with a ``.seen`` suffix, instead of
+    being written again with every checkpoint. Each checkpoint records how many digests of the log it covers, so
+    digests appended after the last checkpoint are discarded when resuming.
+
+    :param filename: The name of the checkpoint file, which is loaded if it exists.
+    :param interval: The minimum number of seconds between two checkpoints of a run.
+
+    :ivar int saves: The number of checkpoints written.
+    """
+
+    def __init__(self, filename: str, interval: float = 5.0) -> None:
+        self.filename = filename
+        self.seen_states_filename = filename + '.seen'
+        self.interval = interval
+        self.saves = 0
+        self._instructions: Optional[List[List[str]]] = None
+        self._instructions_digest: Optional[str] = None
+        # The progress of each register encoded as JSON, and the number of digests of each register in the log
+        self._encoded_registers: Dict[str, str] = {}
+        self._seen_state_counts: Dict[str, int] = {}
+        # The digests of each register read from the log, until the register is resumed
+        self._loaded_seen_states: Dict[str, Dict[bytes, int]] = {}
+        self._last_save = time.monotonic()
+
+        if os.path.exists(filename):
+            with open(filename) as file:
+                data = json.load(file)
+            if data.get('version') != _VERSION:
+                raise ValueError('Unsupported checkpoint version: ' + str(data.get('version')))
+
+            self._instructions_digest = data['instructions_digest']
+            for register_name, progress in data['registers'].items():
+                self._encoded_registers[register_name] = json.dumps(progress, separators=(',', ':'))
+                if progress['seen_states'] is not None:
+                    self._seen_state_counts[register_name] = progress['seen_states']
+            self._load_seen_states()
+
+    def is_due(self) -> bool:
+        """Returns whether interval seconds have passed since the last checkpoint.
+
+        :return: True if a checkpoint should be saved, False otherwise
+        """
+        return time.monotonic() - self._last_save >= self.interval
+
+    def get_progress(self, simulation: Simulation, register_name: str) -> Optional[Checkpoint]:
+        """Returns the last checkpoint of a register.
+
+        :param simulation: The :class:`simd_dna.simulation.Simulation` the register belongs to, which must have the
+            instructions the checkpoint was saved with.
+        :param register_name: The name of the register.
+        :return: A new :class:`simd_dna.checkpoint.Checkpoint`, or None if the register has no checkpoint
+        """
+        if self._instructions_digest is not None \
+                and self._instructions_digest != self._get_instructions_digest(simulation.instructions):
+            raise ValueError('The checkpoint was saved with different instructions')
+
+        encoded_progress = self._encoded_registers.get(register_name)
+        if encoded_progress is None:
+            return None
+
+        progress = json.loads(encoded_progress)
+        for cell_name in progress['cells']:
+            if cell_name not in simulation.cell_types:
+                raise ValueError('The checkpoint has an unknown cell type: ' + cell_name)
+        for _, strand_name in progress['top_strands']:
+            if strand_name not in simulation.strand_types:
+                raise ValueError('The checkpoint has an unknown strand type: ' + strand_name)
+
+        register = _decode_register(simulation, progress)
+        seen_states = None
+        if progress['seen_states'] is not None:
+            seen_states = dict(self._loaded_seen_states.get(register_name, {}))
+
+        return Checkpoint(register, progress['cycles'], progress['position'], seen_states)
+
+    def save(self, simulation: Simulation, register_name: str, register: Register, cycles: int, position: int,
+             seen_states: Optional[Dict[bytes, int]] = None) -> None:
+        """Saves the progress of a register to the checkpoint file, together with that of the registers saved before.
+
+        :param simulation: The :class:`simd_dna.simulation.Simulation` whose instructions are being applied.
+        :param register_name: The name of the register.
+        :param register: The :class:`simd_dna.classes.Register` with its current contents.
+        :param cycles: The number of complete instruction cycles applied.
+        :param position: The number of instructions applied since the last complete cycle.
+        :param seen_states: The digests of the contents after earlier cycles used to detect repeats, if any, as in
+            :class:`simd_dna.checkpoint.Checkpoint`. Entries are expected to be added, in order, and never removed.
+            Only the entries added since the last checkpoint are appended to the log.
+        """
+        seen_state_count: Optional[int] = None
+        if seen_states is not None:
+            seen_state_count = self._seen_state_counts.get(register_name, 0)
+            if len(seen_states) > seen_state_count:
+                with open(self.seen_states_filename, 'a') as file:
+                    for digest, cycle in islice(seen_states.items(), seen_state_count, None):
+                        file.write(json.dumps([register_name, cycle, digest.hex()]) + '\n')
+                    file.flush()
+                    os.fsync(file.fileno())
+                seen_state_count = len(seen_states)
+            self._seen_state_counts[register_name] = seen_state_count
+
+        self._encoded_registers[register_name] = json.dumps({
+            'cells': register.cells,
+            'top_strands': _encode_top_strands(register.top_strands),
+            'cycles': cycles,
+            'position': position,
+            'seen_states': seen_state_count
+        }, separators=(',', ':'))
+        self._instructions_digest = self._get_instructions_digest(simulation.instructions)
+
+        # The file is assembled from the encoded progress of each register, so that registers other than this one
+        # aren't encoded again
+        temporary_filename = self.filename + '.tmp'
+        with open(temporary_filename, 'w') as file:
+            file.write('{"version":%d,"instructions_digest":%s,"registers":{' % (_VERSION,
+                                                                                 json.dumps(self._instructions_digest)))
+            file.write(','.join(json.dumps(name) + ':' + encoded_progress
+                                for name, encoded_progress in self._encoded_registers.items()))
+            file.write('}}')
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_filename, self.filename)
+
+        self.saves += 1
+        self._last_save = time.monotonic()
+
+    def remove(self) -> None:
+        """Deletes the checkpoint file and the log of digests, and forgets the progress of every register, once the
+        runs it was kept for have ended, so that the next runs start from the beginning."""
+        for filename in (self.filename, self.seen_states_filename):
+            if os.path.exists(filename):
+                os.remove(filename)
+        self._instructions_digest = None
+        self._encoded_registers = {}
+        self._seen_state_counts = {}
+        self._loaded_seen_states = {}
+
+    def _get_instructions_digest(self, instructions: List[List[str]]) -> str:
+        # The digest is only computed again if the instructions were replaced
+        if instructions is not self._instructions or self._instructions_digest is None:
+            self._instructions = instructions
+            encoded_instructions = json.dumps(instructions, separators=(',', ':')).encode('utf-8')
+            return hashlib.blake2b(encoded_instructions, digest_size=16).hexdigest()
+        return self._instructions_digest
+
+    def _load_seen_states(self) -> None:
+        # Reads the digests covered by the checkpoint from the log, and rewrites the log without the digests appended
+        # after the checkpoint, including any line cut short by the process dying, so that they aren't read again
+        lines = []
+        if os.path.exists(self.seen_states_filename):
+            with open(self.seen_states_filename) as file:
+                for line in file:
+                    if not line.endswith('\n'):
+                        break
+
+                    register_name, cycle, digest = json.loads(line)
+                    seen_states = self._loaded_seen_states.setdefault(register_name, {})
+                    if len(seen_states) < self._seen_state_counts.get(register_name, 0):
+                        seen_states[bytes.fromhex(digest)] = cycle
+                        lines.append(line)
+
+            temporary_filename = self.seen_states_filename + '.tmp'
+            with open(temporary_filename, 'w') as file:
+                file.writelines(lines)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporary_filename, self.seen_states_filename)
+
+        for register_name, seen_state_count in self._seen_state_counts.items():
+            if len(self._loaded_seen_states.get(register_name, {})) != seen_state_count:
+                raise ValueError('The log of repeat detection states is missing entries: ' + self.seen_states_filename)
+
+
+def _encode_top_strands(top_strands: Iterable[TopStrand]) -> List[Tuple[int, str]]:
+    return [(top_strand.start_index, top_strand.strand_name) for top_strand in top_strands]
+
+
+def _decode_register(simulation: Simulation, progress: Dict) -> Register:
+    register = Register(simulation.cell_types, simulation.strand_types)
+    register.cells = progress['cells']
+    register.top_strands = [TopStrand(start_index, strand_name) for start_index, strand_name in progress['top_strands']]
+    register._ensure_domain_index()
+    return register
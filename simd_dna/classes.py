@@ -1,8 +1,12 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Union, Tuple
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Union, Tuple
+from bisect import bisect_right
+from collections import OrderedDict, deque
+from itertools import accumulate, chain, repeat
 import re
+import sys
 from json import JSONEncoder
 
 
@@ -41,17 +45,27 @@ class Strand:
         return self
 
 
-@dataclass
+@dataclass(frozen=True)
 class TopStrand:
-    """This is a representation of a top strand currently attached to a register.\n
+    """This is a representation of a top strand currently attached to a register. Top strands are immutable and
+    hashable, and the strand name is interned, so that registers with many top strands stay small in memory.\n
     Attributes:\n
     **start_index:** The index of the strand's leftmost domain on the register, starting from the register's
     leftmost domain at index 0\n
     **strand_name:** The name of the strand at start_index's location
     """
+    __slots__ = ('start_index', 'strand_name')
     start_index: int
     strand_name: str
 
+    def __post_init__(self) -> None:
+        if type(self.strand_name) is str:
+            object.__setattr__(self, 'strand_name', sys.intern(self.strand_name))
+
+    def __reduce__(self) -> Tuple:
+        # Frozen slotted instances can't have their attributes set by the default pickle and copy protocols
+        return TopStrand, (self.start_index, self.strand_name)
+
     @staticmethod
     def decode_json(start_index: int, strand_name: str, **kwargs) -> TopStrand:
         """Decodes a JSON object and returns an instance of :class:simd_dna.classes.TopStrand
@@ -65,6 +79,22 @@ class TopStrand:
         return TopStrand(start_index, strand_name)
 
 
+def make_top_strands(start_indices: Sequence[int], strand_names: Iterable[str]) -> List[TopStrand]:
+    """Creates top strands in bulk by setting their slots directly, which is several times faster than calling the
+    :class:`simd_dna.classes.TopStrand` constructor for each strand when loading large registers.
+
+    :param start_indices: The start indices of the top strands.
+    :param strand_names: The names of the top strands, in the same order, which must already be interned.
+    :return: A new list of the top strands
+    """
+    top_strands = list(map(object.__new__, repeat(TopStrand, len(start_indices))))
+    # The slots are set through their descriptors in the class dict
+    slots = vars(TopStrand)
+    deque(map(slots['start_index'].__set__, top_strands, start_indices), 0)
+    deque(map(slots['strand_name'].__set__, top_strands, strand_names), 0)
+    return top_strands
+
+
 class Cell:
     """This is a representation of a cell in the SIMD||DNA model. A cell is a unit of data in the register, and is
     further subdivided into domains, which consist of a small number of nucleotides.
@@ -123,6 +153,214 @@ class Cell:
         self.strand_labels.append(label)
 
 
+class _InternTable(Dict[str, int]):
+    # Maps names to consecutive integer identifiers, interning names the first time they're looked up. The optional
+    # compile_entry callback runs before a new name is interned, and can reject it by raising an exception.
+    def __init__(self, compile_entry: Optional[Callable[[str], None]] = None) -> None:
+        super().__init__()
+        self.names: List[str] = []
+        self._compile_entry = compile_entry
+
+    def __missing__(self, name: str) -> int:
+        if self._compile_entry is not None:
+            self._compile_entry(name)
+        identifier = len(self.names)
+        self.names.append(name)
+        self[name] = identifier
+        return identifier
+
+    def __reduce__(self) -> Tuple:
+        # Identifiers are only meaningful within one process, so unpickled tables start empty
+        return _InternTable, ()
+
+
+# Domain labels are interned once per process rather than per table, so that the domain identifiers cached by
+# registers stay valid when the simulation compiles a new table
+_domain_ids = _InternTable()
+
+
+class MatchTable:
+    """This is the compiled form of the cell and strand types of a simulation. Domain labels, strand names and cell
+    names are interned to small integers, so that the simulation compares integers and indexes lists instead of
+    comparing domain label strings, while the string tables are kept for input, output and drawing. The table also
+    holds the domains where each strand type matches each cell type: since the cell and strand types don't change while
+    instructions are applied, checking whether a strand complements the bottom strand of a register becomes a lookup
+    for every cell that the strand spans.
+
+    :param cell_types: A dictionary mapping cell names to :class:`simd_dna.classes.Cell` instances
+    :param strand_types: A dictionary mapping strand names to :class:`simd_dna.classes.Strand` instances
+
+    :ivar Mapping[str, int] strand_ids: A dict mapping strand names to their integer identifiers. Strand types added
+        after compilation are compiled on first lookup.
+    :ivar List[Tuple[int, ...]] strand_domains: The interned domain labels of each strand type, indexed by strand
+        identifier
+    :ivar Mapping[str, int] cell_ids: A dict mapping cell names to their integer identifiers. Cell types added after
+        compilation are compiled on first lookup.
+    :ivar List[Tuple[int, ...]] cell_domains: The interned domain labels of each cell type, indexed by cell identifier
+    """
+
+    # The number of strand type pairs and offsets whose intersections are cached
+    max_cached_intersections = 65536
+
+    def __init__(self, cell_types: Dict[str, Cell], strand_types: Dict[str, Strand]) -> None:
+        self.cell_types = cell_types
+        self.strand_types = strand_types
+        self._fingerprint = self._get_fingerprint()
+        self.strand_ids = _InternTable(self._compile_strand)
+        self.strand_domains: List[Tuple[int, ...]] = []
+        self.cell_ids = _InternTable(self._compile_cell)
+        self.cell_domains: List[Tuple[int, ...]] = []
+        # Indexed by strand identifier, then by cell identifier, a tuple with one entry per offset of the strand's
+        # leftmost domain relative to the cell's leftmost domain, starting from the offset where only the strand's
+        # rightmost domain overlaps the cell. Each entry holds the indices of the strand domains that complement the
+        # cell's domains at that offset.
+        self._cell_matches: List[List[Optional[Tuple[Tuple[int, ...], ...]]]] = []
+        # Maps (top strand identifier, complementary strand identifier) to the result of is_removed_by
+        self._removals: Dict[Tuple[int, int], bool] = {}
+        # Maps (strand identifier, strand identifier, offset) to the result of strands_intersect, least recently used
+        # first
+        self._intersections: OrderedDict[Tuple[int, int, int], bool] = OrderedDict()
+        for cell_name in cell_types.keys():
+            self.cell_ids[cell_name]
+        for strand_name in strand_types.keys():
+            strand_id = self.strand_ids[strand_name]
+            for cell_id in range(len(self.cell_domains)):
+                self._compile_cell_matches(strand_id, cell_id)
+
+    def _compile_strand(self, strand_name: str) -> None:
+        self.strand_domains.append(tuple(_domain_ids[label] for label in self.strand_types[strand_name].domains))
+        self._cell_matches.append([])
+
+    def _compile_cell(self, cell_name: str) -> None:
+        self.cell_domains.append(tuple(_domain_ids[label] for label in self.cell_types[cell_name].domains))
+
+    def _compile_cell_matches(self, strand_id: int, cell_id: int) -> Tuple[Tuple[int, ...], ...]:
+        strand_domains = self.strand_domains[strand_id]
+        cell_domains = self.cell_domains[cell_id]
+        matches = tuple(tuple(i for i in range(max(-offset, 0), min(len(strand_domains), len(cell_domains) - offset))
+                              if cell_domains[offset + i] == strand_domains[i])
+                        for offset in range(1 - len(strand_domains), len(cell_domains)))
+        strand_matches = self._cell_matches[strand_id]
+        if cell_id >= len(strand_matches):
+            strand_matches.extend([None] * (cell_id + 1 - len(strand_matches)))
+        strand_matches[cell_id] = matches
+        return matches
+
+    def __deepcopy__(self, memo: Dict) -> MatchTable:
+        # Compiled entries never change, so copies of a register can share the table
+        return self
+
+    def _get_fingerprint(self) -> Tuple:
+        return (tuple((name, id(cell), len(cell.domains)) for name, cell in self.cell_types.items()),
+                tuple((name, id(strand), len(strand.domains)) for name, strand in self.strand_types.items()))
+
+    def is_current(self) -> bool:
+        """Checks if the table still reflects the cell and strand types it was compiled from. Types that were added,
+        removed or replaced since then make the table out of date.
+
+        :return: True if the table can still be used, False otherwise
+        """
+        return self._fingerprint == self._get_fingerprint()
+
+    @staticmethod
+    def get_domain_id(domain_label: str) -> int:
+        """Returns the integer identifier of a domain label. Identifiers are shared by every table in the process.
+
+        :param domain_label: The domain label
+        :return: The interned identifier of the label
+        """
+        return _domain_ids[domain_label]
+
+    @staticmethod
+    def get_domain_label(domain_id: int) -> str:
+        """Returns the domain label of an identifier returned by :func:`simd_dna.classes.MatchTable.get_domain_id`
+
+        :param domain_id: The interned identifier of the label
+        :return: The domain label
+        """
+        return _domain_ids.names[domain_id]
+
+    def get_strand_domain_ids(self, strand_name: str) -> Tuple[int, ...]:
+        """Returns the interned domain labels of a strand type.
+
+        :param strand_name: The name of the :class:`simd_dna.classes.Strand` type
+        :return: A tuple of domain identifiers, in left to right order
+        """
+        return self.strand_domains[self.strand_ids[strand_name]]
+
+    def is_removed_by(self, top_strand_name: str, strand_name: str) -> bool:
+        """Checks if a strand complementary to the top strand binds to every domain of a top strand, which is required
+        for the top strand to be removed from the register.
+
+        :param top_strand_name: The name of the :class:`simd_dna.classes.Strand` type of the top strand
+        :param strand_name: The name of the :class:`simd_dna.classes.Strand` type complementary to the top strand
+        :return: True if the top strand's domains are the leftmost domains of the complementary strand, False otherwise
+        """
+        key = (self.strand_ids[top_strand_name], self.strand_ids[strand_name])
+        is_removed = self._removals.get(key)
+        if is_removed is None:
+            top_strand_domains = self.strand_domains[key[0]]
+            is_removed = self._removals[key] = self.strand_domains[key[1]][:len(top_strand_domains)] \
+                == top_strand_domains
+
+        return is_removed
+
+    def strands_intersect(self, strand_name_1: str, strand_name_2: str, offset: int) -> bool:
+        """Checks if two strand types have the same domain at the same register position, when the leftmost domain of
+        the second strand is placed offset domains to the right of the leftmost domain of the first strand. Results are
+        cached, up to max_cached_intersections of them, evicting the least recently used result first.
+
+        :param strand_name_1: The name of the first :class:`simd_dna.classes.Strand` type
+        :param strand_name_2: The name of the second :class:`simd_dna.classes.Strand` type
+        :param offset: The position of the second strand relative to the first strand
+        :return: True if the strands intersect, False otherwise
+        """
+        if offset < 0:
+            strand_name_1, strand_name_2, offset = strand_name_2, strand_name_1, -offset
+
+        key = (self.strand_ids[strand_name_1], self.strand_ids[strand_name_2], offset)
+        intersects = self._intersections.get(key)
+        if intersects is not None:
+            self._intersections.move_to_end(key)
+            return intersects
+
+        domains_1 = self.strand_domains[key[0]]
+        domains_2 = self.strand_domains[key[1]]
+        intersects = False
+        for i in range(offset, min(len(domains_1), offset + len(domains_2))):
+            if domains_1[i] == domains_2[i - offset]:
+                intersects = True
+                break
+
+        self._intersections[key] = intersects
+        if len(self._intersections) > self.max_cached_intersections:
+            self._intersections.popitem(last=False)
+
+        return intersects
+
+    def get_cell_matches(self, strand_name: str, cell_name: str, offset: int) -> Tuple[int, ...]:
+        """Returns the indices of the strand domains that complement a cell's domains.
+
+        :param strand_name: The name of the :class:`simd_dna.classes.Strand` type
+        :param cell_name: The name of the :class:`simd_dna.classes.Cell` type
+        :param offset: The position of the strand's leftmost domain relative to the cell's leftmost domain
+        :return: A tuple of increasing strand domain indices
+        """
+        strand_id = self.strand_ids[strand_name]
+        cell_id = self.cell_ids[cell_name]
+        strand_matches = self._cell_matches[strand_id]
+        matches = strand_matches[cell_id] if cell_id < len(strand_matches) else None
+        if matches is None:
+            # Types added after compilation are compiled on first use
+            matches = self._compile_cell_matches(strand_id, cell_id)
+
+        offset += len(self.strand_domains[strand_id]) - 1
+        if 0 <= offset < len(matches):
+            return matches[offset]
+
+        return ()
+
+
 class Register:
     """This is a representation of a register in the SIMD||DNA model. A register, in practice, is a long DNA strand
     attached to a magnetic bead. This long DNA strand is referred to as the \"bottom strand\", and information is
@@ -140,22 +378,55 @@ class Register:
     :ivar List[str] cells: A list of :class:`simd_dna.classes.Cell` type names that represent the cells that compose
         this :class:`simd_dna.classes.Register`
     :ivar List[simd_dna.classes.TopStrand] top_strands: A list of :class:`simd_dna.classes.TopStrand` s present on the
-        register.
+        register, sorted by start index.
     :ivar int total_domains: The total number of domains in the register's bottom strand
     """
 
-    def __init__(self, cell_types: Optional[Dict[str]] = None, strand_types: Optional[Dict[str]] = None) -> None:
+    def __init__(self, cell_types: Optional[Dict[str, Cell]] = None,
+                 strand_types: Optional[Dict[str, Strand]] = None) -> None:
         if cell_types is None:
-            cell_types = []
+            cell_types = {}
 
         if strand_types is None:
-            strand_types = []
+            strand_types = {}
 
         self.cell_types = cell_types
         self.strand_types = strand_types
-        self.cells = []
-        self.top_strands = []
+        self.cells: List[str] = []
+        self.top_strands: List[TopStrand] = []
         self.total_domains = 0
+        # Cumulative domain offset of each cell, and the bottom strand's interned domain labels flattened in register
+        # order. Both are kept in step with self.cells so that domain lookups don't have to walk the cell list.
+        self._cell_offsets: List[int] = []
+        self._bottom_domains: List[int] = []
+        self._indexed_cells = self.cells
+        # Per-domain occupancy index: for every domain index, the top strands bound to it and the top strands with an
+        # orthogonal domain hanging above it, each in the same order as self.top_strands
+        self._bound_strands: List[List[TopStrand]] = []
+        self._orthogonal_strands: List[List[TopStrand]] = []
+        # The top strands of each strand type, in the same order as self.top_strands, so that strands complementary
+        # to the top strand only inspect the strands they can remove
+        self._strands_by_type: Dict[str, List[TopStrand]] = {}
+        # For every top strand, the number of domains where it's the only strand bound to the register. A strand is
+        # displaced if all but at most one of its domains are contested or orthogonal, which happens exactly when this
+        # count is at most 1, so the strands that strand displacement has to consider are kept in a set.
+        self._secure_counts: Dict[TopStrand, int] = {}
+        self._unstable_strands: Set[TopStrand] = set()
+        self._indexed_top_strands: Optional[List[TopStrand]] = None
+        self._indexed_strand_count = 0
+        self._top_strands_sorted = True
+        self._longest_strand = 0
+        # Shared by the simulation, or compiled on first use
+        self._match_table: Optional[MatchTable] = None
+        # Copies made by copy() and snapshot() share these lists until either register is modified
+        self._cells_shared = False
+        self._top_strands_shared = False
+        # Strands attached or removed since the latest snapshot, which restore() uses to only re-index what changed
+        self._changed_strands: Optional[List[TopStrand]] = None
+        self._snapshot_token: Optional[object] = None
+        # Incremented whenever cells are added, strands are attached or removed or the register is restored, so that
+        # copies of the register held elsewhere can tell whether they're still current
+        self._modifications = 0
 
     def add_cell(self, cell_name: str) -> None:
         """Adds a cell to the right of the register.
@@ -165,30 +436,514 @@ class Register:
         if cell_name not in self.cell_types.keys():
             raise ValueError('Cell type does not exist')
 
+        self._ensure_domain_index()
+        self._modifications += 1
+        if self._cells_shared:
+            self.cells = list(self.cells)
+            self._cell_offsets = list(self._cell_offsets)
+            self._bottom_domains = list(self._bottom_domains)
+            self._indexed_cells = self.cells
+            self._cells_shared = False
+
+        index_is_current = self._strand_index_is_current()
+        domains = [_domain_ids[label] for label in self.cell_types[cell_name].domains]
+        previous_total = self.total_domains
         self.cells.append(cell_name)
-        self.total_domains += len(self.cell_types[cell_name].domains)
+        self._cell_offsets.append(self.total_domains)
+        self._bottom_domains.extend(domains)
+        self.total_domains += len(domains)
+
+        if index_is_current and self._top_strands_sorted:
+            # Extend the occupancy index instead of rebuilding it, only indexing the strands that overhang the
+            # previous right end of the register
+            self._bound_strands.extend([] for _ in domains)
+            self._orthogonal_strands.extend([] for _ in domains)
+            overhanging_strands = []
+            for top_strand in reversed(self.top_strands):
+                if top_strand.start_index + self._longest_strand <= previous_total:
+                    break
+                overhanging_strands.append(top_strand)
+
+            for top_strand in reversed(overhanging_strands):
+                self._index_strand(top_strand, previous_total)
+
+    def _ensure_domain_index(self) -> None:
+        # Rebuilds the cell offset table and the flattened bottom strand if self.cells was replaced or modified
+        # without going through add_cell
+        if self.cells is self._indexed_cells and len(self.cells) == len(self._cell_offsets):
+            return
+
+        # The domains of each cell type are only interned once, however many cells of that type the register has
+        cell_domains = {cell_name: [_domain_ids[label] for label in self.cell_types[cell_name].domains]
+                        for cell_name in dict.fromkeys(self.cells)}
+        self._cell_offsets = list(accumulate(map(len, map(cell_domains.__getitem__, self.cells)), initial=0))
+        self._cell_offsets.pop()
+        self._bottom_domains = list(chain.from_iterable(map(cell_domains.__getitem__, self.cells)))
+
+        self._indexed_cells = self.cells
+        self._cells_shared = False
+        self.total_domains = len(self._bottom_domains)
+
+    def _get_match_table(self) -> MatchTable:
+        if self._match_table is None:
+            self._match_table = MatchTable(self.cell_types, self.strand_types)
+
+        return self._match_table
+
+    def _get_strand_domain_ids(self, strand_name: str) -> Tuple[int, ...]:
+        table = self._match_table if self._match_table is not None else self._get_match_table()
+        return table.strand_domains[table.strand_ids[strand_name]]
+
+    def _strand_index_is_current(self) -> bool:
+        return self.top_strands is self._indexed_top_strands \
+            and len(self.top_strands) == self._indexed_strand_count \
+            and len(self._bound_strands) == self.total_domains
+
+    def _ensure_strand_index(self) -> None:
+        # Rebuilds the per-domain occupancy index if self.top_strands was replaced or modified without going through
+        # _add_top_strand or _remove_top_strands
+        self._ensure_domain_index()
+        if self._strand_index_is_current():
+            return
+
+        self._bound_strands = [[] for _ in range(self.total_domains)]
+        self._orthogonal_strands = [[] for _ in range(self.total_domains)]
+        self._strands_by_type = {}
+        self._secure_counts = {}
+        self._unstable_strands = set()
+        self._longest_strand = 0
+        self._top_strands_sorted = True
+        previous_start = None
+        for top_strand in self.top_strands:
+            if previous_start is not None and top_strand.start_index < previous_start:
+                self._top_strands_sorted = False
+            previous_start = top_strand.start_index
+            self._index_strand(top_strand, append=True)
+            strands_of_type = self._strands_by_type.get(top_strand.strand_name)
+            if strands_of_type is None:
+                self._strands_by_type[top_strand.strand_name] = [top_strand]
+            else:
+                strands_of_type.append(top_strand)
+
+        self._indexed_top_strands = self.top_strands
+        self._indexed_strand_count = len(self.top_strands)
+
+    def _index_strand(self, top_strand: TopStrand, first_domain: int = 0, append: bool = False) -> None:
+        # Adds a top strand to the occupancy lists of every register domain it covers, starting from first_domain
+        start_index = top_strand.start_index
+        strand_domains = self._get_strand_domain_ids(top_strand.strand_name)
+        self._longest_strand = max(self._longest_strand, len(strand_domains))
+        for i in range(max(start_index, first_domain, 0), min(start_index + len(strand_domains), self.total_domains)):
+            if self._bottom_domains[i] == strand_domains[i - start_index]:
+                strands_at_domain = self._bound_strands[i]
+                if len(strands_at_domain) == 0:
+                    self._update_secure_count(top_strand, 1)
+                elif len(strands_at_domain) == 1:
+                    self._update_secure_count(strands_at_domain[0], -1)
+            else:
+                strands_at_domain = self._orthogonal_strands[i]
+
+            if append:
+                strands_at_domain.append(top_strand)
+            else:
+                # Keep the same order as self.top_strands: after every strand that starts at or before this one
+                position = len(strands_at_domain)
+                while position > 0 and strands_at_domain[position - 1].start_index > start_index:
+                    position -= 1
+                strands_at_domain.insert(position, top_strand)
+
+        if top_strand not in self._secure_counts:
+            self._update_secure_count(top_strand, 0)
+
+    def _unindex_strand(self, top_strand: TopStrand) -> None:
+        # Removes a top strand from the occupancy lists of every register domain it covers
+        start_index = top_strand.start_index
+        strand_domains = self._get_strand_domain_ids(top_strand.strand_name)
+        for i in range(max(start_index, 0), min(start_index + len(strand_domains), self.total_domains)):
+            for strands_at_domain in (self._bound_strands[i], self._orthogonal_strands[i]):
+                if top_strand in strands_at_domain:
+                    strands_at_domain[:] = [x for x in strands_at_domain if x != top_strand]
+                    if len(strands_at_domain) == 1 and strands_at_domain is self._bound_strands[i]:
+                        self._update_secure_count(strands_at_domain[0], 1)
+
+        self._secure_counts.pop(top_strand, None)
+        self._unstable_strands.discard(top_strand)
+
+    def _update_secure_count(self, top_strand: TopStrand, change: int) -> None:
+        # Changes the number of domains where a top strand is the only bound strand, and whether it's unstable
+        count = self._secure_counts.get(top_strand, 0) + change
+        self._secure_counts[top_strand] = count
+        if count <= 1:
+            self._unstable_strands.add(top_strand)
+        else:
+            self._unstable_strands.discard(top_strand)
+
+    def _bisect_top_strands(self, start_index: int, after_equal: bool = True,
+                            top_strands: Optional[List[TopStrand]] = None) -> int:
+        # Binary search over the sorted top strands, or another list of top strands sorted by start index, returning
+        # the position of the first strand that starts after start_index, or at or after start_index if after_equal is
+        # False
+        if top_strands is None:
+            top_strands = self.top_strands
+        low = 0
+        high = len(top_strands)
+        while low < high:
+            middle = (low + high) // 2
+            middle_start = top_strands[middle].start_index
+            if middle_start < start_index or (after_equal and middle_start == start_index):
+                low = middle + 1
+            else:
+                high = middle
+
+        return low
+
+    def _contains_strand(self, top_strand: TopStrand) -> bool:
+        # Checks if a strand equal to top_strand is in the sorted top strands
+        position = self._bisect_top_strands(top_strand.start_index, after_equal=False)
+        while position < len(self.top_strands) and self.top_strands[position].start_index == top_strand.start_index:
+            if self.top_strands[position] == top_strand:
+                return True
+            position += 1
+
+        return False
+
+    def _get_strand_position(self, top_strand: TopStrand) -> int:
+        # Returns the position of a top strand in the sorted top strands
+        position = self._bisect_top_strands(top_strand.start_index, after_equal=False)
+        while self.top_strands[position] is not top_strand:
+            position += 1
+
+        return position
+
+    def _add_top_strand(self, top_strand: TopStrand) -> None:
+        # Inserts a new top strand, keeping self.top_strands sorted by start index and the occupancy index up to date
+        self._ensure_strand_index()
+        self._modifications += 1
+        if self._changed_strands is not None:
+            self._changed_strands.append(top_strand)
+        if self._top_strands_shared:
+            self.top_strands = list(self.top_strands)
+            self._indexed_top_strands = self.top_strands
+            self._top_strands_shared = False
+
+        if not self._top_strands_sorted:
+            self.top_strands.append(top_strand)
+            self.top_strands.sort(key=lambda x: x.start_index)
+            self._indexed_top_strands = None
+            return
+
+        self.top_strands.insert(self._bisect_top_strands(top_strand.start_index), top_strand)
+        self._index_strand(top_strand)
+        strands_of_type = self._strands_by_type.get(top_strand.strand_name)
+        if strands_of_type is None:
+            self._strands_by_type[top_strand.strand_name] = [top_strand]
+        else:
+            strands_of_type.insert(self._bisect_top_strands(top_strand.start_index, top_strands=strands_of_type),
+                                   top_strand)
+        self._indexed_strand_count += 1
+
+    def _remove_top_strands(self, removed_strands: List[TopStrand]) -> None:
+        # Removes top strands from the register, keeping the occupancy index up to date
+        self._ensure_strand_index()
+        self._modifications += 1
+        if self._changed_strands is not None:
+            self._changed_strands.extend(removed_strands)
+
+        removed_strand_set = set(removed_strands)
+        if not self._top_strands_sorted or len(removed_strand_set) * 8 > len(self.top_strands):
+            self.top_strands = [x for x in self.top_strands if x not in removed_strand_set]
+        else:
+            # Few strands removed from a sorted list: find each one by binary search instead of filtering the list
+            if self._top_strands_shared:
+                self.top_strands = list(self.top_strands)
+            positions = []
+            for top_strand in removed_strand_set:
+                position = self._bisect_top_strands(top_strand.start_index, after_equal=False)
+                while position < len(self.top_strands) \
+                        and self.top_strands[position].start_index == top_strand.start_index:
+                    if self.top_strands[position] == top_strand:
+                        positions.append(position)
+                    position += 1
+
+            for position in sorted(positions, reverse=True):
+                del self.top_strands[position]
+
+        self._top_strands_shared = False
+        removed_strands_by_type: Dict[str, List[TopStrand]] = {}
+        for top_strand in removed_strand_set:
+            self._unindex_strand(top_strand)
+            removed_strands_by_type.setdefault(top_strand.strand_name, []).append(top_strand)
+        for strand_name, strands_of_type in removed_strands_by_type.items():
+            self._remove_strands_of_type(strand_name, strands_of_type)
+
+        self._indexed_top_strands = self.top_strands
+        self._indexed_strand_count = len(self.top_strands)
+
+    def _remove_strands_of_type(self, strand_name: str, removed_strands: List[TopStrand]) -> None:
+        # Removes distinct top strands of the same type from the strand type index
+        strands_of_type = self._strands_by_type.get(strand_name)
+        if strands_of_type is None:
+            return
+
+        if not self._top_strands_sorted or len(removed_strands) * 8 > len(strands_of_type):
+            removed_strand_set = set(removed_strands)
+            strands_of_type[:] = [x for x in strands_of_type if x not in removed_strand_set]
+        else:
+            positions = []
+            for top_strand in removed_strands:
+                position = self._bisect_top_strands(top_strand.start_index, False, strands_of_type)
+                while position < len(strands_of_type) \
+                        and strands_of_type[position].start_index == top_strand.start_index:
+                    if strands_of_type[position] == top_strand:
+                        positions.append(position)
+                    position += 1
+
+            for position in sorted(positions, reverse=True):
+                del strands_of_type[position]
+
+        if len(strands_of_type) == 0:
+            del self._strands_by_type[strand_name]
+
+    def copy(self) -> Register:
+        """Returns a copy of the register that shares the cell and strand types with this register. The list of cells
+        and the list of top strands are shared as well, and are only copied once either register attaches or removes
+        strands or adds cells, so a copy costs O(1) no matter how long the register is. Modifying the cells or
+        top_strands lists in place affects both registers.
+
+        :return: A :class:`simd_dna.classes.Register` with the same contents
+        """
+        self._ensure_domain_index()
+        register = Register(self.cell_types, self.strand_types)
+        register.cells = self.cells
+        register.top_strands = self.top_strands
+        register.total_domains = self.total_domains
+        register._cell_offsets = self._cell_offsets
+        register._bottom_domains = self._bottom_domains
+        register._indexed_cells = self.cells
+        register._top_strands_sorted = self._top_strands_sorted and self._strand_index_is_current()
+        register._match_table = self._match_table
+        register._cells_shared = self._cells_shared = True
+        register._top_strands_shared = self._top_strands_shared = True
+        return register
+
+    def snapshot(self) -> Register:
+        """Returns a copy of the register, as in :func:`simd_dna.classes.Register.copy`, and starts keeping track of
+        the strands attached to or removed from this register. Restoring the snapshot with
+        :func:`simd_dna.classes.Register.restore` then only costs as much as the changes made since the snapshot.
+
+        :return: A :class:`simd_dna.classes.Register` with the same contents
+        """
+        self._ensure_strand_index()
+        snapshot = self.copy()
+        self._changed_strands = []
+        self._snapshot_token = snapshot._snapshot_token = object()
+        return snapshot
+
+    def restore(self, snapshot: Register) -> None:
+        """Restores the cells and top strands of the register to those of a snapshot or copy. If the snapshot is the
+        latest one taken from this register, only the domains covered by strands attached or removed since then are
+        re-indexed; otherwise, the register is re-indexed the next time it's queried.
+
+        :param snapshot: A :class:`simd_dna.classes.Register` returned by :func:`simd_dna.classes.Register.snapshot`
+            or :func:`simd_dna.classes.Register.copy`
+        """
+        changed_strands = self._changed_strands
+        if self._snapshot_token is None or snapshot._snapshot_token is not self._snapshot_token:
+            changed_strands = None
+        index_is_current = self._strand_index_is_current() and self._top_strands_sorted and snapshot._top_strands_sorted
+        self._changed_strands = None
+        self._snapshot_token = None
+        self._modifications += 1
+
+        snapshot._ensure_domain_index()
+        if snapshot.cells is not self.cells:
+            self.cells = snapshot.cells
+            self.total_domains = snapshot.total_domains
+            self._cell_offsets = snapshot._cell_offsets
+            self._bottom_domains = snapshot._bottom_domains
+            self._indexed_cells = self.cells
+            self._cells_shared = snapshot._cells_shared = True
+            index_is_current = False
+
+        self.top_strands = snapshot.top_strands
+        self._top_strands_shared = snapshot._top_strands_shared = True
+        if changed_strands is None or not index_is_current:
+            self._indexed_top_strands = None
+            return
+
+        affected_domains: Set[int] = set()
+        for top_strand in changed_strands:
+            start_index = top_strand.start_index
+            affected_domains.update(range(max(start_index, 0),
+                                          min(start_index + len(self._get_strand_domain_ids(top_strand.strand_name)),
+                                              self.total_domains)))
+
+        # Rebuild the occupancy lists of the affected domains from the restored strands, which are sorted by start index
+        for domain_index in affected_domains:
+            domain_id = self._bottom_domains[domain_index]
+            bound_strands = []
+            orthogonal_strands = []
+            position = self._bisect_top_strands(domain_index - self._longest_strand + 1, after_equal=False)
+            while position < len(self.top_strands) and self.top_strands[position].start_index <= domain_index:
+                top_strand = self.top_strands[position]
+                strand_domains = self._get_strand_domain_ids(top_strand.strand_name)
+                offset = domain_index - top_strand.start_index
+                if offset < len(strand_domains):
+                    if strand_domains[offset] == domain_id:
+                        bound_strands.append(top_strand)
+                    else:
+                        orthogonal_strands.append(top_strand)
+                position += 1
+
+            previous_bound_strands = self._bound_strands[domain_index]
+            if len(previous_bound_strands) == 1:
+                self._update_secure_count(previous_bound_strands[0], -1)
+            if len(bound_strands) == 1:
+                self._update_secure_count(bound_strands[0], 1)
+            self._bound_strands[domain_index] = bound_strands
+            self._orthogonal_strands[domain_index] = orthogonal_strands
+
+        # Only the changed strands can have been attached or removed by restoring
+        for top_strand in changed_strands:
+            if self._contains_strand(top_strand):
+                if top_strand not in self._secure_counts:
+                    self._update_secure_count(top_strand, 0)
+            else:
+                self._secure_counts.pop(top_strand, None)
+                self._unstable_strands.discard(top_strand)
+
+        # Rebuild the strand type index at the start indices of the changed strands
+        changed_start_indices: Dict[str, Set[int]] = {}
+        for top_strand in changed_strands:
+            changed_start_indices.setdefault(top_strand.strand_name, set()).add(top_strand.start_index)
+        for strand_name, start_indices in changed_start_indices.items():
+            strands_of_type = [x for x in self._strands_by_type.get(strand_name, ())
+                               if x.start_index not in start_indices]
+            for start_index in start_indices:
+                position = self._bisect_top_strands(start_index, after_equal=False)
+                while position < len(self.top_strands) and self.top_strands[position].start_index == start_index:
+                    if self.top_strands[position].strand_name == strand_name:
+                        strands_of_type.append(self.top_strands[position])
+                    position += 1
+
+            if len(strands_of_type) > 0:
+                strands_of_type.sort(key=lambda x: x.start_index)
+                self._strands_by_type[strand_name] = strands_of_type
+            else:
+                self._strands_by_type.pop(strand_name, None)
+
+        self._indexed_top_strands = self.top_strands
+        self._indexed_strand_count = len(self.top_strands)
+
+    def get_bottom_domain(self, domain_index: int) -> Optional[str]:
+        """Returns the label of the bottom strand domain at the given domain index.
+
+        :param domain_index: The integer index of the domain in the register.
+        :return: The domain label, or None if the domain index is outside the register
+        """
+        self._ensure_domain_index()
+        if 0 <= domain_index < len(self._bottom_domains):
+            return _domain_ids.names[self._bottom_domains[domain_index]]
+
+        return None
+
+    def get_matching_domain_indices(self, domain_index: int, strand_type: str) -> List[int]:
+        """Returns the indices of the register domains that a strand would complement if its leftmost domain was placed
+        at domain_index.
 
-    def get_cell_at_domain_index(self, domain_index: int) -> Tuple[Optional[str], int]:
-        """Returns the name of the cell type at the given domain index, starting from index 0, as well as the numerical
+        :param domain_index: The integer index of the register domain underneath the strand's leftmost domain.
+        :param strand_type: The name of the :class:`simd_dna.classes.Strand`
+        :return: A list of increasing domain indices
+        """
+        self._ensure_domain_index()
+        table = self._get_match_table()
+        strand_id = table.strand_ids[strand_type]
+        strand_length = len(table.strand_domains[strand_id])
+        if domain_index >= self.total_domains or domain_index + strand_length <= 0:
+            return []
+
+        strand_matches = table._cell_matches[strand_id]
+        cell_ids = table.cell_ids
+        cell_index = max(bisect_right(self._cell_offsets, domain_index) - 1, 0)
+        matching_domains = []
+        while cell_index < len(self.cells) and self._cell_offsets[cell_index] < domain_index + strand_length:
+            cell_id = cell_ids[self.cells[cell_index]]
+            offset = domain_index - self._cell_offsets[cell_index]
+            matches = strand_matches[cell_id] if cell_id < len(strand_matches) else None
+            if matches is None:
+                matches = table._compile_cell_matches(strand_id, cell_id)
+            offset += strand_length - 1
+            if 0 <= offset < len(matches):
+                for i in matches[offset]:
+                    matching_domains.append(domain_index + i)
+            cell_index += 1
+
+        return matching_domains
+
+    def get_open_domain_indices(self) -> List[int]:
+        """Returns the indices of the domains that have no top strand bound to them, in increasing order. These are
+        the domains where instruction strands can find an open toehold.
+
+        :return: A list of integer domain indices
+        """
+        self._ensure_strand_index()
+        return [i for i, strands_at_domain in enumerate(self._bound_strands) if len(strands_at_domain) == 0]
+
+    def get_cell_at_domain_index(self, domain_index: int) -> Tuple[Optional[Cell], int]:
+        """Returns the cell type at the given domain index, starting from index 0, as well as the numerical
         offset relative to the beginning of the enclosing cell, starting at 0. For example, if a register has cells
         of type A, B, C in that order, where each cell type has 3 domains, then domains 0-2 will return A, 3-5 will
         return B, and 6-8 will return C. The domain at index 3 is the 0th domain in cell B, so an offset of 0 will be
         returned.
 
         :param domain_index: The integer index of the domain in the register.
-        :return: A tuple containing a string that represents the cell type name (or None if the domain index exceeds
-            the total domain length of the register), and the integer offset of that domain relative to the start index
-            of its enclosing cell (0 if the domain index exceeds the total domain length.)
+        :return: A tuple containing the :class:`simd_dna.classes.Cell` type of the enclosing cell (or None if the domain
+            index exceeds the total domain length of the register), and the integer offset of that domain relative to
+            the start index of its enclosing cell (0 if the domain index exceeds the total domain length.)
         """
 
-        total_domains = 0
-        for cell_name in self.cells:
-            cell = self.cell_types[cell_name]
-            if total_domains <= domain_index < total_domains + len(cell.domains):
-                return cell, domain_index - total_domains
-            total_domains += len(cell.domains)
+        self._ensure_domain_index()
+        if domain_index < 0 or domain_index >= self.total_domains:
+            return None, 0
+
+        cell_index = bisect_right(self._cell_offsets, domain_index) - 1
+        cell = self.cell_types[self.cells[cell_index]]
+        return cell, domain_index - self._cell_offsets[cell_index]
+
+    def get_cell_labels(self) -> List[Optional[str]]:
+        """Returns the string label of each cell in the register, which is the first strand label of the cell type
+        whose strand pattern is present on the cell. See :class:`simd_dna.classes.Cell` for a detailed description of
+        strand labels.
+
+        :return: A list with the string label of each cell, in order, or None for the cells that don't match any of
+            their strand labels
+        """
+        self._ensure_strand_index()
+        cell_labels = []
+        for cell_name, cell_offset in zip(self.cells, self._cell_offsets):
+            cell_label = None
+            for label in self.cell_types[cell_name].strand_labels:
+                is_match = True
+                for offset, strand_name in label['strands']:
+                    domain_index = cell_offset + offset
+                    if domain_index < 0:
+                        continue  # todo: handle negative indices
+
+                    if domain_index >= self.total_domains \
+                            or not any(top_strand.start_index == domain_index and top_strand.strand_name == strand_name
+                                       for strands_at_domain in (self._bound_strands[domain_index],
+                                                                 self._orthogonal_strands[domain_index])
+                                       for top_strand in strands_at_domain):
+                        is_match = False
+                        break
 
-        return None, 0
+                if is_match:
+                    cell_label = label['label']
+                    break
+
+            cell_labels.append(cell_label)
+
+        return cell_labels
 
     def get_top_strands_at_domain_index(self, domain_index: int,
                                         include_orthogonal: bool = False,
@@ -207,27 +962,33 @@ class Register:
         """
 
         top_strands = []
-        cell, offset = self.get_cell_at_domain_index(domain_index)
-        if cell is None:
+        self._ensure_domain_index()
+        if domain_index < 0 or domain_index >= self.total_domains:
             return top_strands
-        domain_label = cell.domains[offset]
+
+        if strand_set is None or strand_set is self.top_strands:
+            # Read the occupancy index instead of scanning every top strand on the register
+            self._ensure_strand_index()
+            if include_orthogonal:
+                return list(self._bound_strands[domain_index]), list(self._orthogonal_strands[domain_index])
+            else:
+                return list(self._bound_strands[domain_index])
 
         if include_orthogonal:
             orthogonal_top_strands = []
 
-        if strand_set is None:
-            strand_set = self.top_strands
-
         # For every DNA top strand in strand_set, check if domain_index is within its index range
         # from start_index to start_index + number of strand domains
         # If it's within range, check if the domains of the bottom and top strand match, and add the strand to
         # top_strands if so
         # If include_orthogonal is set to true, add the strand to orthogonal_top_strands if the domains don't match
+        domain_id = self._bottom_domains[domain_index]
+        table = self._get_match_table()
         for top_strand in strand_set:
             start_index = top_strand.start_index
-            strand = self.strand_types[top_strand.strand_name]
-            if start_index <= domain_index < start_index + len(strand.domains):
-                if domain_label == strand.domains[domain_index - start_index]:
+            strand_domains = table.strand_domains[table.strand_ids[top_strand.strand_name]]
+            if start_index <= domain_index < start_index + len(strand_domains):
+                if domain_id == strand_domains[domain_index - start_index]:
                     top_strands.append(top_strand)
                 elif include_orthogonal:
                     orthogonal_top_strands.append(top_strand)
@@ -260,12 +1021,9 @@ class Register:
             raise ValueError('Strand type does not exist')
 
         # Allow negative indexing
+        self._ensure_domain_index()
         if domain_index < 0:
-            total_domains = 0
-            for cell_name in self.cells:
-                total_domains += len(self.cell_types[cell_name].domains)
-
-            domain_index += total_domains
+            domain_index += self.total_domains
         strand = self.strand_types[strand_type]
 
         if strand.is_complementary:
@@ -275,39 +1033,43 @@ class Register:
 
             displaced_strands = []
             displacing_strands = []
-            for top_strand in self.top_strands:
-                top_strand_domains = self.strand_types[top_strand.strand_name].domains
-                is_match = True
-                for i in range(len(top_strand_domains)):
-                    if strand.domains[i] != top_strand_domains[i]:
-                        is_match = False
+            self._ensure_strand_index()
+            table = self._get_match_table()
+            # Only the top strands whose types strand_type binds to need to be inspected, which the strand type index
+            # lists in the same order as self.top_strands
+            matching_strands = []
+            matching_types = 0
+            for top_strand_name, strands_of_type in self._strands_by_type.items():
+                if table.is_removed_by(top_strand_name, strand_type):
+                    matching_strands.extend(strands_of_type)
+                    matching_types += 1
+            if matching_types > 1:
+                if self._top_strands_sorted:
+                    matching_strands.sort(key=self._get_strand_position)
+                else:
+                    matching_strand_set = set(matching_strands)
+                    matching_strands = [x for x in self.top_strands if x in matching_strand_set]
+
+            for top_strand in matching_strands:
+                strand_start = top_strand.start_index
+                strand_end = strand_start + len(table.get_strand_domain_ids(top_strand.strand_name))
+                for i in range(strand_start, strand_end):
+                    # must have at least one insecure domain
+                    if i < 0 or i >= self.total_domains or len(self._bound_strands[i]) > 1 \
+                            or top_strand not in self._bound_strands[i]:
+                        displaced_strands.append(top_strand)
+                        displacing_strands.append(TopStrand(strand_start, strand_type))
                         break
 
-                if is_match:
-                    strand_start = top_strand.start_index
-                    strand_end = strand_start + len(top_strand_domains)
-                    for i in range(strand_start, strand_end):
-                        top_strands_at_domain = self.get_top_strands_at_domain_index(i)
-                        # must have at least one insecure domain
-                        if len(top_strands_at_domain) > 1 or top_strand not in top_strands_at_domain:
-                            displaced_strands.append(top_strand)
-                            displacing_strands.append(TopStrand(strand_start, strand_type))
-                            break
-
             if len(displaced_strands) > 0:
-                self.top_strands = [x for x in self.top_strands if x not in displaced_strands]
+                self._remove_top_strands(displaced_strands)
                 return displacing_strands
             elif unattached_matches is not None:
                 # If the caller provides an unattached_matches list and the strand doesn't successfully bind at
                 # domain_index, check if strand_type matches at least one domain. If so, it's considered inert and
                 # is added to the list if not already present.
 
-                matchings = 0
-                for i in range(len(strand.domains)):
-                    cell, offset = self.get_cell_at_domain_index(domain_index + i)
-                    if cell is not None and cell.domains[offset] == strand.domains[i]:
-                        matchings += 1
-
+                matchings = len(self.get_matching_domain_indices(domain_index, strand_type))
                 if matchings >= 1:
                     new_strand = TopStrand(domain_index, strand_type)
                     if new_strand not in unattached_matches:
@@ -320,28 +1082,21 @@ class Register:
             # present, but the caller provides an unattached_matches list and there are at least two domain matches,
             # the strand is considered inert and is added to the list if not already present.
 
+            self._ensure_strand_index()
+            matching_domains = self.get_matching_domain_indices(domain_index, strand_type)
             has_open_toehold = False
-            for i in range(len(strand.domains)):
-                top_strands = self.get_top_strands_at_domain_index(domain_index + i)
-                if len(top_strands) == 0:
-                    cell, offset = self.get_cell_at_domain_index(domain_index + i)
-                    if cell is not None and cell.domains[offset] == strand.domains[i]:
-                        has_open_toehold = True
-                        break
+            for i in matching_domains:
+                if len(self._bound_strands[i]) == 0:
+                    has_open_toehold = True
+                    break
 
             if has_open_toehold or unattached_matches is not None:
                 # must have at least two matching domains to attach
-                matchings = 0
-                for i in range(len(strand.domains)):
-                    cell, offset = self.get_cell_at_domain_index(domain_index + i)
-                    if cell is not None and cell.domains[offset] == strand.domains[i]:
-                        matchings += 1
-
+                matchings = len(matching_domains)
                 if matchings >= 2:
                     new_top_strand = TopStrand(domain_index, strand_type)
                     if has_open_toehold:
-                        self.top_strands.append(new_top_strand)
-                        self.top_strands.sort(key=lambda x: x.start_index)
+                        self._add_top_strand(new_top_strand)
                         return [new_top_strand]
                     else:
                         if new_top_strand not in unattached_matches:
@@ -351,6 +1106,37 @@ class Register:
 
         return None
 
+    def get_inert_strand(self, domain_index: int, strand_type: str) -> Optional[TopStrand]:
+        """Checks if a copy of strand_type placed at domain_index is inert, which is the case if it complements the
+        domains underneath, but can't attach because no open toeholds are available. A strand complementary to the
+        top strand is inert wherever it matches at least one domain. This gives the same result as the
+        unattached_matches parameter of :func:`simd_dna.classes.Register.attempt_attachment`, and should only be
+        called after attempt_attachment failed to attach the strand at the same position.
+
+        :param domain_index: The integer index of the register domain where the leftmost domain of strand_type is placed
+        :param strand_type: The name of the :class:`simd_dna.classes.Strand` to check
+        :return: A :class:`simd_dna.classes.TopStrand` instance of the inert strand, or None if it isn't inert
+        """
+        if strand_type not in self.strand_types.keys():
+            raise ValueError('Strand type does not exist')
+
+        self._ensure_domain_index()
+        if domain_index < 0:
+            domain_index += self.total_domains
+
+        matching_domains = self.get_matching_domain_indices(domain_index, strand_type)
+        if self.strand_types[strand_type].is_complementary:
+            return TopStrand(domain_index, strand_type) if len(matching_domains) >= 1 else None
+
+        if len(matching_domains) < 2:
+            return None
+        self._ensure_strand_index()
+        for i in matching_domains:
+            if len(self._bound_strands[i]) == 0:
+                return None
+
+        return TopStrand(domain_index, strand_type)
+
     def displace_strands(self, excluded_strands: Optional[List[TopStrand]] = None) -> List[TopStrand]:
         """Simulates DNA strand displacement on the register, initiated by the new strands introduced by
         :func:`simd_dna.classes.Register.attempt_attachment`. By first attaching all possible new strands before
@@ -362,26 +1148,31 @@ class Register:
         if excluded_strands is None:
             excluded_strands = []
 
-        displaced_strands = []
-        filtered_top_strands = [x for x in self.top_strands if x not in excluded_strands]
-
-        for top_strand in filtered_top_strands:
-            strand_start = top_strand.start_index
-            strand = self.strand_types[top_strand.strand_name]
-            strand_end = strand_start + len(strand.domains)
-            insecure_domains = 0
-            # count the number of domains in this strand that are contested by other strands, or orthogonal
-            for i in range(strand_start, strand_end):
-                top_strands_at_domain = self.get_top_strands_at_domain_index(i)
-                if len(top_strands_at_domain) > 1 or top_strand not in top_strands_at_domain:
-                    insecure_domains += 1
-
-            # if the strand is bound to the register by 0 or 1 uncontested domains, it is displaced
-            if insecure_domains >= strand_end - strand_start - 1:
-                displaced_strands.append(top_strand)
+        # A strand is displaced if it's bound to the register by 0 or 1 uncontested domains, i.e. if all its other
+        # domains are contested by other strands, or orthogonal. The occupancy index keeps track of these strands as
+        # strands attach and detach, so only they have to be inspected.
+        self._ensure_strand_index()
+        excluded_strand_set = set(excluded_strands)
+        unstable_strands = [x for x in self._unstable_strands if x not in excluded_strand_set]
+        if not self._top_strands_sorted:
+            unstable_strand_set = set(unstable_strands)
+            displaced_strands = [x for x in self.top_strands if x in unstable_strand_set]
+        else:
+            # List the displaced strands in the same order as self.top_strands, including any duplicates
+            positions = []
+            for top_strand in unstable_strands:
+                position = self._bisect_top_strands(top_strand.start_index, after_equal=False)
+                while position < len(self.top_strands) \
+                        and self.top_strands[position].start_index == top_strand.start_index:
+                    if self.top_strands[position] == top_strand:
+                        positions.append(position)
+                    position += 1
+
+            positions.sort()
+            displaced_strands = [self.top_strands[position] for position in positions]
 
         if len(displaced_strands) > 0:
-            self.top_strands = [x for x in self.top_strands if x not in displaced_strands]
+            self._remove_top_strands(displaced_strands)
 
         return displaced_strands
 
@@ -546,33 +1337,36 @@ class Register:
     def sanitize_inert_strands(self, inert_strands: List[TopStrand],
                                new_strands: List[TopStrand]) -> List[TopStrand]:
         """Removes inert strands that overlap with other inert strands or newly attached strands. Two strands are said
-        to overlap if the have complementary domains in common on the register. This is done to reduce the cluttering
-        in the visual representation of the register, in case the user chooses to print the register on the console or
-        display its contents through an SVG representation.
+        to overlap if they have the same domain at the same position on the register. This is done to reduce the
+        cluttering in the visual representation of the register, in case the user chooses to print the register on the
+        console or display its contents through an SVG representation.
 
         :param inert_strands: A list of inert :class:`simd_dna.classes.TopStrand` s after applying an instruction
         :param new_strands: A list of newly attached :class:`simd_dna.classes.TopStrand` s after applying an instruction
         :return: A list of inert :class:`simd_dna.classes.TopStrand` s after overlapping strands are removed
         """
+        # Two strands intersect if they have the same domain at the same register position, so instead of comparing
+        # every pair of strands, keep the (position, domain) pairs covered by the new strands and the strands kept so
+        # far. Later inert strands take precedence over earlier ones, as they're visited from right to left.
+        occupied_domains = set()
+        for new_strand in new_strands:
+            occupied_domains.update(self._get_positioned_domains(new_strand))
+
         sanitized_strands = []
         for strand in reversed(inert_strands):
-            add_strand = True
-            for new_strand in new_strands:
-                if self.strands_intersect(strand, new_strand):
-                    add_strand = False
-                    break
-
-            if add_strand:
-                for other_strand in sanitized_strands:
-                    if self.strands_intersect(strand, other_strand):
-                        add_strand = False
-                        break
-
-            if add_strand:
-                sanitized_strands.insert(0, strand)
+            strand_domains = self._get_positioned_domains(strand)
+            if occupied_domains.isdisjoint(strand_domains):
+                occupied_domains.update(strand_domains)
+                sanitized_strands.append(strand)
 
+        sanitized_strands.reverse()
         return sanitized_strands
 
+    def _get_positioned_domains(self, top_strand: TopStrand) -> List[Tuple[int, int]]:
+        # Returns the register position and interned label of every domain of a top strand
+        strand_domains = self._get_strand_domain_ids(top_strand.strand_name)
+        return list(zip(range(top_strand.start_index, top_strand.start_index + len(strand_domains)), strand_domains))
+
     def strands_intersect(self, strand_1: TopStrand, strand_2: TopStrand) -> bool:
         """Checks if two strands occupy the same domain location(s), where their domain segments at that location are
         complementary to the bottom strand. The two strands compete over that domain(s) if so.
@@ -581,21 +1375,8 @@ class Register:
         :param strand_2: The second :class:`simd_dna.classes.TopStrand` to compare
         :return: True if the strands intersect, False otherwise
         """
-        if strand_1.start_index > strand_2.start_index:
-            temp = strand_2
-            strand_2 = strand_1
-            strand_1 = temp
-
-        start_1 = strand_1.start_index
-        start_2 = strand_2.start_index
-        domains_1 = self.strand_types[strand_1.strand_name].domains
-        domains_2 = self.strand_types[strand_2.strand_name].domains
-        diff = start_2 - start_1
-        for i in range(diff, len(domains_1)):
-            if domains_1[i] == domains_2[i - diff]:
-                return True
-
-        return False
+        return self._get_match_table().strands_intersect(strand_1.strand_name, strand_2.strand_name,
+                                                         strand_2.start_index - strand_1.start_index)
 
     @staticmethod
     def decode_json(cell_types: List[Cell], strand_types: List[Strand], cells, **kwargs) -> Register:
@@ -626,9 +1407,7 @@ class Register:
             self.top_strands.append(TopStrand.decode_json(**top_strand))
 
         self.top_strands.sort(key=lambda x: x.start_index)
-
-        for cell in self.cells:
-            self.total_domains += len(self.cell_types[cell].domains)
+        self._ensure_domain_index()
 
         return self
 
@@ -638,4 +1417,8 @@ class ObjectEncoder(JSONEncoder):
     A JSONEncoder subclass that allows the json.dump() function to get the dictionary encoding of an object
     """
     def default(self, o):
-        return o.__dict__
+        if not hasattr(o, '__dict__'):
+            return {key: getattr(o, key) for key in o.__slots__}
+
+        # Private attributes hold derived lookup tables, which are rebuilt on load and shouldn't be serialized
+        return {key: value for key, value in o.__dict__.items() if not key.startswith('_')}
@@ -0,0 +1,457 @@
+import argparse
+import os
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from simd_dna.classes import Register, TopStrand
+from simd_dna.simulation import InstructionDiff, Simulation
+from simd_dna.windows import ShardPool
+
+if TYPE_CHECKING:
+    from simd_dna.checkpoint import Checkpointer
+    from simd_dna.register_svg import RegisterSVGDrawing
+
+
+class UsageError(ValueError):
+    """Raised by the commands of the command line interface when their arguments or input files are invalid, which
+    :func:`simd_dna.cli.main` reports as a usage error. Errors raised while simulating propagate as they are."""
+
+
+def report_results(initial_registers: Dict[str, Register],
+                   results: Dict[str, List[Tuple[Register, Register, List[TopStrand], Optional[List[TopStrand]]]]],
+                   print_results: bool = True,
+                   svg_drawing: Optional['RegisterSVGDrawing'] = None,
+                   svg_directory: Optional[str] = None,
+                   svg_suffix: str = '',
+                   step_by_step: bool = False) -> None:
+    """Prints the results of :func:`simd_dna.simulation.Simulation.run_all` on the terminal and draws them in SVG
+    files, one register at a time.
+
+    :param initial_registers: A dict mapping register names to copies of the registers before the instructions were
+        applied.
+    :param results: The dict returned by :func:`simd_dna.simulation.Simulation.run_all`
+    :param print_results: If set to True, the register contents are printed on the terminal after each instruction.
+    :param svg_drawing: A :class:`simd_dna.register_svg.RegisterSVGDrawing` that draws the results of each register
+        in an SVG file named after the register. If None, no SVG files are written.
+    :param svg_directory: The directory the SVG files are written to. If None, the current directory is used.
+    :param svg_suffix: A string appended to the register names to form the SVG file names.
+    :param step_by_step: If set to True, the user needs to press Enter after each instruction.
+    """
+    for register_key in initial_registers:
+        _report_register(register_key, initial_registers[register_key], results[register_key],
+                         len(results[register_key]), print_results, svg_drawing, svg_directory, svg_suffix,
+                         step_by_step)
+
+
+def report_diffs(register_name: str,
+                 register: Register,
+                 diffs: Iterable[InstructionDiff],
+                 num_instructions: int,
+                 print_results: bool = True,
+                 svg_drawing: Optional['RegisterSVGDrawing'] = None,
+                 svg_directory: Optional[str] = None,
+                 svg_suffix: str = '',
+                 step_by_step: bool = False,
+                 inst_nums: Optional[Iterable[int]] = None) -> None:
+    """Prints the diffs yielded by :func:`simd_dna.simulation.Simulation.iter_run` on the terminal and draws them in
+    an SVG file as they're yielded, in the same way as :func:`simd_dna.cli.report_results`. The register contents
+    before and after each instruction are rebuilt from the diffs, so only the latest ones are kept.
+
+    :param register_name: The name of the register, which the SVG file is named after.
+    :param register: A copy of the register before the first instruction, which is brought up to date with each diff.
+    :param diffs: The iterator returned by :func:`simd_dna.simulation.Simulation.iter_run`
+    :param num_instructions: The number of instructions the iterator applies.
+    :param print_results: If set to True, the register contents are printed on the terminal after each instruction.
+    :param svg_drawing: A :class:`simd_dna.register_svg.RegisterSVGDrawing` that draws the results in an SVG file named
+        after the register. If None, no SVG file is written.
+    :param svg_directory: The directory the SVG file is written to. If None, the current directory is used.
+    :param svg_suffix: A string appended to the register name to form the SVG file name.
+    :param step_by_step: If set to True, the user needs to press Enter after each instruction.
+    :param inst_nums: The numbers, starting from 0, of the instructions the iterator applies, which are printed and
+        drawn as their labels. If None, the instructions are numbered from 0.
+    """
+    def get_results() -> Iterator[Tuple[Register, Register, List[TopStrand], Optional[List[TopStrand]]]]:
+        for diff in diffs:
+            before_register = register.copy()
+            diff.apply(register)
+            yield (register, before_register, list(diff.new_strands),
+                   None if diff.inert_matches is None else list(diff.inert_matches))
+
+    _report_register(register_name, register, get_results(), num_instructions, print_results, svg_drawing,
+                     svg_directory, svg_suffix, step_by_step, inst_nums)
+
+
+def _report_register(register_key: str, register: Register,
+                     register_results: Iterable[Tuple[Register, Register, List[TopStrand], Optional[List[TopStrand]]]],
+                     num_instructions: int, print_results: bool, svg_drawing: Optional['RegisterSVGDrawing'],
+                     svg_directory: Optional[str], svg_suffix: str, step_by_step: bool,
+                     inst_nums: Optional[Iterable[int]] = None) -> None:
+    # Prints and draws the results of each instruction applied to a register, as they're iterated over, numbering the
+    # instructions with inst_nums if given, or from 0 otherwise
+    if print_results:
+        print(register_key)
+    if svg_drawing is not None:
+        svg_drawing.initialize(register, os.path.join(svg_directory or '', register_key + svg_suffix),
+                               num_instructions)
+
+    if inst_nums is None:
+        inst_nums = range(num_instructions)
+    for inst_num, (register, before_register, new_strands, inert_matches) in zip(inst_nums, register_results):
+        if print_results:
+            print("Instruction", inst_num + 1)
+
+            if (len(new_strands) == 0 and (
+                    inert_matches is None or len(inert_matches) == 0)) and inst_num > 0:
+                print('No changes\n')
+            else:
+                before_register.print(new_strands, inert_matches)
+                print()
+
+        if svg_drawing is not None and (svg_drawing.draw_inert_instructions or len(new_strands) > 0):
+            label = ("" if svg_drawing.compress_svg_drawings else "Instruction ") + str(inst_num + 1)
+            svg_drawing.draw_contents(before_register, label, len(new_strands) == 0)
+            svg_drawing.draw_strands(register, new_strands, 3)
+            svg_drawing.draw_strands(register, inert_matches,
+                                     3 if svg_drawing.compress_svg_drawings else 6, True)
+            svg_drawing.increment_vertical_offset()
+
+        if step_by_step:
+            input('Press Enter to continue')
+
+    if print_results:
+        print("Final result")
+        register.print()
+        print()
+    if svg_drawing is not None:
+        label = "F" if svg_drawing.compress_svg_drawings else "Final result"
+        svg_drawing.draw_contents(register, label=label)
+        svg_drawing.save_svg()
+
+    if step_by_step:
+        input('Press Enter to continue')
+
+
+def load_simulation(simulation: Simulation, filename: str) -> None:
+    """Loads a simulation saved by :func:`simd_dna.simulation.Simulation.save_binary` if the file name ends with
+    ``.simd``, or by :func:`simd_dna.simulation.Simulation.save_json` otherwise.
+
+    :param simulation: The :class:`simd_dna.simulation.Simulation` to load the file into.
+    :param filename: The name of the file to load.
+    """
+    if filename.endswith('.simd'):
+        simulation.load_binary(filename)
+    else:
+        simulation.load_json(filename)
+
+
+def save_simulation(simulation: Simulation, filename: str) -> None:
+    """Saves a simulation with :func:`simd_dna.simulation.Simulation.save_binary` if the file name ends with
+    ``.simd``, or with :func:`simd_dna.simulation.Simulation.save_json` otherwise.
+
+    :param simulation: The :class:`simd_dna.simulation.Simulation` to save.
+    :param filename: The name of the file to save to.
+    """
+    if filename.endswith('.simd'):
+        simulation.save_binary(filename)
+    else:
+        simulation.save_json(filename)
+
+
+def parse_instruction_ranges(ranges: str, num_instructions: int) -> List[int]:
+    """Parses a comma-separated list of instruction numbers and ranges of instruction numbers, such as ``1-3,5``,
+    where instructions are numbered from 1 as in the simulator's output.
+
+    :param ranges: The string to parse.
+    :param num_instructions: The number of instructions in the simulation.
+    :return: A list of integer instruction indices, starting from 0, in the order given
+    """
+    indices: List[int] = []
+    for part in ranges.split(','):
+        bounds = part.strip().split('-')
+        if len(bounds) > 2 or not all(bound.strip().isdigit() for bound in bounds):
+            raise UsageError('Invalid instruction range: ' + part)
+
+        first = int(bounds[0])
+        last = int(bounds[-1])
+        if first < 1 or last > num_instructions or first > last:
+            raise UsageError('Instruction range out of bounds: ' + part)
+        indices.extend(range(first - 1, last))
+
+    return indices
+
+
+def run(args: argparse.Namespace) -> None:
+    """Runs the ``run`` command of the command line interface.
+
+    :param args: The parsed command line arguments.
+    """
+    simulation = Simulation(keep_results=True, show_inert_instruction_strands=args.show_inert,
+                            cache_size=args.cache, window_size=args.window_size)
+    try:
+        load_simulation(simulation, args.file)
+    except ValueError as error:
+        raise UsageError(str(error)) from error
+
+    register_names = args.registers if args.registers is not None else list(simulation.registers.keys())
+    for register_name in register_names:
+        if register_name not in simulation.registers:
+            raise UsageError('No such register exists: ' + register_name)
+
+    instructions = simulation.instructions
+    if args.instructions is not None:
+        simulation.instructions = [instructions[i] for i in parse_instruction_ranges(args.instructions,
+                                                                                      len(instructions))]
+
+    svg_drawing = None
+    if args.svg is not None:
+        from simd_dna.register_svg import RegisterSVGDrawing
+        os.makedirs(args.svg, exist_ok=True)
+        svg_drawing = RegisterSVGDrawing(args.compress_svg, args.draw_inert)
+
+    if args.trace is not None and (args.until_halt or args.until_repeat):
+        raise UsageError('--trace cannot be combined with --until-halt or --until-repeat')
+
+    checkpointer = None
+    if args.checkpoint is not None:
+        if args.trace is not None:
+            raise UsageError('--checkpoint cannot be combined with --trace')
+        from simd_dna.checkpoint import Checkpointer
+        try:
+            checkpointer = Checkpointer(args.checkpoint, args.checkpoint_interval)
+        except ValueError as error:
+            raise UsageError(str(error)) from error
+
+    shard_pool = None
+    if args.shards is not None:
+        shard_pool = ShardPool(simulation, args.shards)
+        simulation.shard_pool = shard_pool
+
+    try:
+        if args.until_halt or args.until_repeat or checkpointer is not None:
+            run_until(simulation, register_names, args, svg_drawing, checkpointer)
+            cycles = 0
+        elif args.trace is not None:
+            run_traced(simulation, register_names, args, svg_drawing)
+            cycles = 0
+        else:
+            cycles = args.cycles
+
+        for cycle in range(cycles):
+            initial_registers = {register_name: simulation.registers[register_name].copy()
+                                 for register_name in register_names}
+            results = simulation.run_all(args.parallel, register_names)
+            if args.print_results or svg_drawing is not None:
+                if args.print_results and args.cycles > 1:
+                    print('Cycle', cycle + 1)
+                report_results(initial_registers, results, args.print_results, svg_drawing, args.svg,
+                               '' if args.cycles == 1 else '_cycle' + str(cycle + 1))
+    finally:
+        if shard_pool is not None:
+            shard_pool.close()
+
+    cache = simulation.instruction_cache
+    if cache is not None and args.cache_stats:
+        print('Instruction cache: %d hits, %d misses, %d evictions' % (cache.hits, cache.misses, cache.evictions))
+    window_memo = simulation.window_memo
+    if window_memo is not None and args.cache_stats:
+        print('Window memo: %d hits, %d misses, %d fallbacks' % (window_memo.hits, window_memo.misses,
+                                                                 window_memo.fallbacks))
+    if shard_pool is not None and args.cache_stats:
+        print('Shards: %d instructions sharded, %d fallbacks, %d loads' % (shard_pool.sharded, shard_pool.fallbacks,
+                                                                          shard_pool.loads))
+
+    simulation.instructions = instructions
+    if args.output is not None:
+        save_simulation(simulation, args.output)
+
+
+def run_until(simulation: Simulation, register_names: List[str], args: argparse.Namespace,
+              svg_drawing: Optional['RegisterSVGDrawing'] = None, checkpointer: Optional['Checkpointer'] = None) \
+        -> None:
+    """Runs the ``run`` command with ``--until-halt``, ``--until-repeat`` or ``--checkpoint``, applying up to
+    ``--cycles`` instruction cycles to each register with :func:`simd_dna.simulation.Simulation.run_cycles`. Only the
+    number of cycles applied and the final register contents are reported. The checkpoint file is deleted once every
+    register has been run.
+
+    :param simulation: The :class:`simd_dna.simulation.Simulation` to run, with keep_results set to True.
+    :param register_names: The names of the registers to simulate.
+    :param args: The parsed command line arguments.
+    :param svg_drawing: A :class:`simd_dna.register_svg.RegisterSVGDrawing` that draws the final contents of each
+        register in an SVG file named after the register. If None, no SVG files are written.
+    :param checkpointer: The :class:`simd_dna.checkpoint.Checkpointer` that saves the progress of the runs, or None.
+    """
+    from simd_dna.tm import is_tm_halted
+
+    for register_name in register_names:
+        result = simulation.run_cycles(register_name, args.cycles, is_tm_halted if args.until_halt else None,
+                                       args.until_repeat, checkpointer)
+        if result.reason == 'stop_when':
+            print('%s: halted after %d cycles' % (register_name, result.cycles))
+        elif result.reason == 'max_cycles':
+            print('%s: stopped after %d cycles' % (register_name, result.cycles))
+        elif result.first_cycle is not None:
+            print('%s: repeats every %d cycles from cycle %d, stopped after %d cycles'
+                  % (register_name, result.cycles - result.first_cycle, result.first_cycle, result.cycles))
+
+        if args.print_results:
+            result.register.print()
+            print()
+        if svg_drawing is not None:
+            svg_drawing.initialize(result.register, os.path.join(args.svg, register_name), 0)
+            svg_drawing.draw_contents(result.register, label='F' if svg_drawing.compress_svg_drawings
+                                      else 'Final result')
+            svg_drawing.save_svg()
+
+    if checkpointer is not None:
+        checkpointer.remove()
+
+
+def run_traced(simulation: Simulation, register_names: List[str], args: argparse.Namespace,
+               svg_drawing: Optional['RegisterSVGDrawing'] = None) -> None:
+    """Runs the ``run`` command with ``--trace``, applying ``--cycles`` instruction cycles to one register at a time
+    with :func:`simd_dna.simulation.Simulation.iter_run`, and writing the changes made by each instruction to a trace
+    file named after the register in the ``--trace`` directory as they're made. The results are printed and drawn as
+    they're made too, if requested.
+
+    :param simulation: The :class:`simd_dna.simulation.Simulation` to run, with keep_results set to True.
+    :param register_names: The names of the registers to simulate.
+    :param args: The parsed command line arguments.
+    :param svg_drawing: A :class:`simd_dna.register_svg.RegisterSVGDrawing` that draws the results of each register
+        in an SVG file named after the register. If None, no SVG files are written.
+    """
+    from simd_dna.trace import TraceWriter
+
+    os.makedirs(args.trace, exist_ok=True)
+    inst_nums = list(range(len(simulation.instructions))) * args.cycles
+    for register_name in register_names:
+        filename = os.path.join(args.trace, register_name + '.trace')
+        initial_register = simulation.registers[register_name].copy()
+        with TraceWriter(filename, simulation, register_name) as writer:
+            diffs = writer.record(simulation.iter_run(register_name, inst_nums))
+            if args.print_results or svg_drawing is not None:
+                report_diffs(register_name, initial_register, diffs, len(inst_nums), args.print_results, svg_drawing,
+                             args.svg)
+            else:
+                for _ in diffs:
+                    pass
+        print('%s: %d instructions traced in %s (%d bytes)' % (register_name, writer.instructions, filename,
+                                                                os.path.getsize(filename)))
+
+
+def replay(args: argparse.Namespace) -> None:
+    """Runs the ``replay`` command of the command line interface, which shows the results of the given instructions of
+    a trace file written by ``run --trace``, followed by the register contents after the last one, by seeking to them
+    with a :class:`simd_dna.trace.Replay` instead of simulating the run again.
+
+    :param args: The parsed command line arguments.
+    """
+    from simd_dna.trace import Replay, TraceReader
+
+    svg_drawing = None
+    if args.svg is not None:
+        from simd_dna.register_svg import RegisterSVGDrawing
+        os.makedirs(args.svg, exist_ok=True)
+        svg_drawing = RegisterSVGDrawing(args.compress_svg, args.draw_inert)
+
+    try:
+        reader = TraceReader(args.file)
+    except ValueError as error:
+        raise UsageError(str(error)) from error
+
+    with reader:
+        initial_register = reader.get_initial_register()
+        trace_replay = Replay(initial_register, reader, args.checkpoint_interval)
+        positions = list(range(len(reader))) if args.instructions is None \
+            else parse_instruction_ranges(args.instructions, len(reader))
+        results = (trace_replay.get_instruction_results(position) for position in positions)
+        _report_register(reader.register_name, initial_register, results, len(positions),
+                         args.print_results or svg_drawing is None, svg_drawing, args.svg, '', False, positions)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """The entry point of ``python -m simd_dna``, which runs saved simulations without going through the interactive
+    menu of main.py. Nothing is printed or drawn unless requested, so that batch jobs only pay for the output they
+    need.
+
+    :param argv: The command line arguments, excluding the program name. If None, sys.argv is used.
+    """
+    parser = argparse.ArgumentParser(prog='python -m simd_dna',
+                                     description='Runs SIMD||DNA simulations without the interactive menu.')
+    subparsers = parser.add_subparsers(dest='command', metavar='command')
+    subparsers.required = True
+
+    run_parser = subparsers.add_parser('run', help='apply the instructions of a saved simulation to its registers',
+                                       description='Loads a simulation saved in a JSON file and applies its '
+                                                   'instructions to its registers.')
+    run_parser.add_argument('file', help='JSON file, or binary file ending with .simd, saved by the simulator')
+    run_parser.add_argument('--registers', nargs='+', metavar='NAME',
+                            help='names of the registers to simulate (default: all registers)')
+    run_parser.add_argument('--instructions', metavar='RANGES',
+                            help='instructions to apply, numbered from 1, as comma-separated numbers or ranges, '
+                                 'e.g. 1-3,5 (default: all instructions)')
+    run_parser.add_argument('--cycles', type=int, default=1, metavar='N',
+                            help='number of times the instructions are applied (default: 1)')
+    run_parser.add_argument('--until-halt', action='store_true',
+                            help='stop applying instruction cycles to a register once its Turing machine has halted, '
+                                 'with --cycles as the maximum, and only report the final result')
+    run_parser.add_argument('--until-repeat', action='store_true',
+                            help='stop applying instruction cycles to a register once it repeats its contents after an '
+                                 'earlier cycle, with --cycles as the maximum, and only report the final result')
+    run_parser.add_argument('--parallel', type=int, metavar='N',
+                            help='number of worker processes to distribute the registers across')
+    run_parser.add_argument('--cache', type=int, default=0, metavar='N',
+                            help='cache instruction results holding up to N top strands, so that instructions applied '
+                                 'to register contents seen before are not simulated again (default: 0, no cache)')
+    run_parser.add_argument('--cache-stats', action='store_true',
+                            help='print the number of instruction cache hits, misses and evictions, the number of '
+                                 'memoized window hits, misses and fallbacks, and the number of sharded instructions')
+    run_parser.add_argument('--window-size', type=int, default=0, metavar='N',
+                            help='memoize the effect of instructions on windows of N cells, which speeds up long '
+                                 'registers made of repeated patterns (default: 0, no windows)')
+    run_parser.add_argument('--shards', type=int, metavar='N',
+                            help='split long registers into N shards of cells that are simulated in parallel worker '
+                                 'processes')
+    run_parser.add_argument('--print', action='store_true', dest='print_results',
+                            help='print the register contents after each instruction')
+    run_parser.add_argument('--svg', metavar='DIRECTORY', help='draw the results of each register in an SVG file')
+    run_parser.add_argument('--compress-svg', action='store_true', help='compress the SVG drawings')
+    run_parser.add_argument('--draw-inert', action='store_true',
+                            help='draw instructions that do not affect a register in the SVG drawings')
+    run_parser.add_argument('--show-inert', action='store_true',
+                            help='keep track of inert instruction strands and show them in the output')
+    run_parser.add_argument('--trace', metavar='DIRECTORY',
+                            help='write the changes made by each instruction to each register to a compact trace file '
+                                 'named after the register in the given directory, while the instructions are applied')
+    run_parser.add_argument('--checkpoint', metavar='FILE',
+                            help='save the progress of the run to a checkpoint file every few seconds, and resume '
+                                 'from it if it exists, only reporting the final results as with --until-halt')
+    run_parser.add_argument('--checkpoint-interval', type=float, default=5.0, metavar='SECONDS',
+                            help='number of seconds between checkpoints (default: 5)')
+    run_parser.add_argument('--output', metavar='FILE',
+                            help='save the simulation with the resulting registers to a JSON file, or to a binary '
+                                 'file if FILE ends with .simd')
+    run_parser.set_defaults(function=run)
+
+    replay_parser = subparsers.add_parser('replay', help='show the results of instructions recorded in a trace file',
+                                          description='Reads a trace file written by run --trace and shows the '
+                                                      'results of the given instructions without simulating them '
+                                                      'again.')
+    replay_parser.add_argument('file', help='trace file written by run --trace')
+    replay_parser.add_argument('--instructions', metavar='RANGES',
+                               help='instructions of the traced run to show, numbered from 1, as comma-separated '
+                                    'numbers or ranges, e.g. 1000-1003 (default: all instructions)')
+    replay_parser.add_argument('--checkpoint-interval', type=int, default=256, metavar='N',
+                               help='number of instructions between the copies of the register kept while seeking; '
+                                    'shorter intervals seek faster and use more memory (default: 256)')
+    replay_parser.add_argument('--print', action='store_true', dest='print_results',
+                               help='print the register contents, which is the default unless --svg is given')
+    replay_parser.add_argument('--svg', metavar='DIRECTORY', help='draw the results in an SVG file')
+    replay_parser.add_argument('--compress-svg', action='store_true', help='compress the SVG drawings')
+    replay_parser.add_argument('--draw-inert', action='store_true',
+                               help='draw instructions that do not affect the register in the SVG drawing')
+    replay_parser.set_defaults(function=replay)
+
+    args = parser.parse_args(argv)
+    try:
+        args.function(args)
+    except UsageError as error:
+        parser.error(str(error))
@@ -117,7 +117,7 @@ class RegisterSVGDrawing:
                            stroke=svgwrite.rgb(0, 0, 0)))
 
     def draw_strands(self, register: Register,
-                     strand_set: List[TopStrand],
+                     strand_set: Optional[List[TopStrand]],
                      layer: int,
                      is_unattached_set: bool = False) -> None:
         if strand_set is None:
@@ -326,35 +326,14 @@ class RegisterSVGDrawing:
 
     def _draw_cell_strand_labels(self, register: Register) -> None:
         previous_domains = 0
-        for cell_name in register.cells:
+        for cell_name, cell_label in zip(register.cells, register.get_cell_labels()):
             cell = register.cell_types[cell_name]
-            labels = register.cell_types[cell_name].strand_labels
-            is_match = [True for _ in labels]
-            for i in range(len(labels)):
-                label = labels[i]
-                for strand in label['strands']:
-                    if previous_domains + strand[0] < 0:
-                        continue  # todo: handle negative indices
-
-                    top_strands, orthogonal_top_strands \
-                        = register.get_top_strands_at_domain_index(previous_domains + strand[0], True)
-                    top_strands = list(filter(lambda d: d.start_index == previous_domains + strand[0],
-                                              top_strands))
-                    top_strands = [d.strand_name for d in top_strands]
-                    orthogonal_top_strands = list(filter(lambda d: d.start_index == previous_domains + strand[0],
-                                                         orthogonal_top_strands))
-                    orthogonal_top_strands = [d.strand_name for d in orthogonal_top_strands]
-                    if strand[1] not in top_strands and strand[1] not in orthogonal_top_strands:
-                        is_match[i] = False
-                        break
-
-            labels = [label['label'] for (label, match) in zip(labels, is_match) if match]
-            if len(labels) > 0:
+            if cell_label is not None:
                 left = previous_domains * self._domain_length
                 right = left + len(cell.domains) * self._domain_length
                 x = ((left + right) / 2) + self._current_size_parameters['left_offset']
                 x = str(x) + "mm"
-                self._dwg.add(self._dwg.text(labels[0], x=[x],
+                self._dwg.add(self._dwg.text(cell_label, x=[x],
                                              y=[str(float((self._vertical_offset +
                                                            self._current_size_parameters[
                                                                'cell_label_height_offset']))) + "mm"],
@@ -1,5 +1,87 @@
-import copy
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from operator import attrgetter
+from typing import Callable, Iterable, Iterator, Sequence, Type
+import hashlib
+import json
+import struct
+import sys
+import zlib
+
+from simd_dna.cache import InstructionCache
+from simd_dna.checkpoint import Checkpoint, Checkpointer
 from simd_dna.classes import *
+from simd_dna.windows import ShardPool, WindowMemo
+
+# The simulation of a worker process started by Simulation.run_all or a ShardPool, set by _initialize_worker
+_worker_simulation: 'Simulation'
+
+# A binary file starts with the magic bytes, the format version and whether the rest of the file is compressed,
+# followed by the length of a JSON header and the header itself, which holds the cell types, strand types and
+# instructions, the tables of cell and strand names, and the name, number of cells and number of top strands of each
+# register. The header is followed by the packed arrays of each register: the cell name indices, the top strand start
+# indices and the top strand name indices, all little-endian.
+_BINARY_MAGIC = b'SIMDBIN'
+_BINARY_VERSION = 1
+_BINARY_HEADER_LENGTH = struct.Struct('<I')
+_INDEX_TYPECODE = 'I' if array('I').itemsize == 4 else 'L'
+_START_INDEX_TYPECODE = 'q'
+
+
+@dataclass(frozen=True)
+class CycleResult:
+    """The outcome of :func:`simd_dna.simulation.Simulation.run_cycles`.\n
+    Attributes:\n
+    **register:** The :class:`simd_dna.classes.Register` after the last cycle\n
+    **cycles:** The number of instruction cycles that were applied\n
+    **reason:** Why the cycles stopped: 'stop_when' if the stop_when predicate returned True, 'fixed_point' if a cycle
+    left the register unchanged, 'repeated_state' if the register returned to the contents it had after an earlier
+    cycle, or 'max_cycles' if max_cycles cycles were applied\n
+    **first_cycle:** If the cycles stopped at a fixed point or a repeated state, the number of cycles after which the
+    register first had its final contents. The register then repeats every cycles - first_cycle cycles. Otherwise None.
+    """
+    register: Register
+    cycles: int
+    reason: str
+    first_cycle: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class InstructionDiff:
+    """The changes made to a register by one instruction, as yielded by
+    :func:`simd_dna.simulation.Simulation.iter_run`. If the top strands that start at some domain changed order, for
+    instance because a strand was displaced and attached again, every strand that starts there is listed both as lost
+    and as attached, so that :func:`simd_dna.simulation.InstructionDiff.apply` reproduces the order of the top
+    strands.\n
+    Attributes:\n
+    **inst_num:** The integer index of the instruction\n
+    **attached:** The top strands the register gained, sorted by start index\n
+    **displaced:** The top strands the register lost, other than those in removed, sorted by start index\n
+    **removed:** The top strands the register lost whose type is removed by a strand of the instruction that's
+    complementary to the top strand, sorted by start index\n
+    **new_strands:** The applicable instruction strands, as returned by
+    :func:`simd_dna.simulation.Simulation.run_instruction`\n
+    **inert_matches:** The inert instruction strands, or None if show_inert_instruction_strands is set to False
+    """
+    inst_num: int
+    attached: Tuple[TopStrand, ...]
+    displaced: Tuple[TopStrand, ...]
+    removed: Tuple[TopStrand, ...]
+    new_strands: Tuple[TopStrand, ...]
+    inert_matches: Optional[Tuple[TopStrand, ...]] = None
+
+    def apply(self, register: Register) -> None:
+        """Applies the changes to a register with the contents the register had before the instruction, such as a copy
+        taken at that point, which then has the contents the register had after the instruction.
+
+        :param register: The :class:`simd_dna.classes.Register` to modify in place
+        """
+        lost_strands = self.displaced + self.removed
+        if len(lost_strands) > 0:
+            register._remove_top_strands(list(lost_strands))
+        for top_strand in self.attached:
+            register._add_top_strand(top_strand)
 
 
 class Simulation:
@@ -12,6 +94,13 @@ class Simulation:
         testing out new instructions.
     :param show_inert_instruction_strands: If set to True, inert instruction strands will be printed on the terminal,
         alongside the applicable instructions. Otherwise, only applicable instruction strands are shown.
+    :param cache_size: If greater than 0, the results of applying instructions are kept in an
+        :class:`simd_dna.cache.InstructionCache` holding at most this many top strands, and applying an instruction to
+        register contents it was already applied to returns the cached result instead of simulating it again.
+    :param window_size: If greater than 0, registers longer than this many cells are simulated in windows of this many
+        cells, whose results are memoized by a :class:`simd_dna.windows.WindowMemo`, and the full engine is only used
+        when a window's result depends on its neighbors. Unless inert instruction strands are shown, the registers are
+        then simulated one at a time instead of in NumPy batches.
 
     :ivar Mapping[str, Strand] strand_types: A dict of possible strand types in the simulation, mapping the strand name
         to the :class:`simd_dna.classes.Strand` instance.
@@ -22,18 +111,29 @@ class Simulation:
     :ivar List[List[str]] instructions: A list of instructions to be applied. Each instruction is a list of strings,
         which are the names of strand types present in that instruction. The instructions are applied in the order of
         their indices, starting from 0.
+    :ivar Optional[InstructionCache] instruction_cache: The cache of instruction results, or None if caching is off.
+    :ivar Optional[WindowMemo] window_memo: The memoized window results, or None if registers aren't simulated in
+        windows.
+    :ivar Optional[ShardPool] shard_pool: The :class:`simd_dna.windows.ShardPool` that long registers are split across
+        while it's used as a context manager, or None.
     """
 
     def __init__(self, step_by_step_simulation: bool = False,
                  keep_results: bool = False,
-                 show_inert_instruction_strands: bool = False) -> None:
-        self.strand_types = {}
-        self.cell_types = {}
-        self.registers = {}
-        self.instructions = []
+                 show_inert_instruction_strands: bool = False,
+                 cache_size: int = 0,
+                 window_size: int = 0) -> None:
+        self.strand_types: Dict[str, Strand] = {}
+        self.cell_types: Dict[str, Cell] = {}
+        self.registers: Dict[str, Register] = {}
+        self.instructions: List[List[str]] = []
         self.step_by_step_simulation = step_by_step_simulation
         self.keep_results = keep_results
         self.show_inert_instruction_strands = show_inert_instruction_strands
+        self.instruction_cache = InstructionCache(cache_size) if cache_size > 0 else None
+        self.window_memo = WindowMemo(window_size) if window_size > 0 else None
+        self.shard_pool: Optional[ShardPool] = None
+        self._match_table: Optional[MatchTable] = None
 
     def add_cell_type(self, name: str, domains: List[str]) -> None:
         """Adds a new :class:`simd_dna.classes.Cell` type to the simulation.
@@ -45,6 +145,7 @@ class Simulation:
             raise ValueError('Another cell type already has that name')
         else:
             self.cell_types[name] = Cell(domains)
+            self._match_table = None
 
     def add_cells_to_register(self, register_name: str,
                               cell_name: str,
@@ -67,6 +168,7 @@ class Simulation:
             self.registers[register_name] = Register(self.cell_types, self.strand_types)
 
         current_register = self.registers[register_name]
+        current_register._match_table = self.compile_match_table()
         cell_size = len(self.cell_types[cell_name].domains)
         for _ in range(copies):
             current_register.add_cell(cell_name)
@@ -85,6 +187,7 @@ class Simulation:
         :param color: A string hexadecimal color code representing the color of this strand when drawn in SVG.
         """
         self.strand_types[name] = Strand(domains, is_complementary, color)
+        self._match_table = None
 
     def add_instruction(self, instruction_strands: List[str]) -> None:
         """Adds a new instruction to the simulation.
@@ -107,9 +210,150 @@ class Simulation:
             raise ValueError('No such cell exists')
         self.cell_types[cell_name].add_strand_label(coordinate_strand_pairs, string_label)
 
+    def load_json(self, filename: str) -> None:
+        """Loads the cell types, strand types, registers and instructions saved by
+        :func:`simd_dna.simulation.Simulation.save_json`, replacing those of the simulation.
+
+        :param filename: The name of the JSON file to load.
+        """
+        with open(filename) as file:
+            data = json.load(file)
+
+        self.cell_types = decode_json_dict(data['cell_types'], Cell)
+        self.strand_types = decode_json_dict(data['strand_types'], Strand)
+        for key in data['registers']:
+            data['registers'][key]['cell_types'] = self.cell_types
+            data['registers'][key]['strand_types'] = self.strand_types
+        self.registers = decode_json_dict(data['registers'], Register)
+        self.instructions = data['instructions']
+        self._match_table = None
+
+    def save_json(self, filename: str) -> None:
+        """Saves the cell types, strand types, registers and instructions of the simulation in a JSON file.
+
+        :param filename: The name of the JSON file to save to.
+        """
+        registers = {}
+        for register_name, register in self.registers.items():
+            registers[register_name] = {'cells': register.cells, 'top_strands': register.top_strands}
+
+        with open(filename, 'w') as file:
+            json.dump({
+                'cell_types': self.cell_types,
+                'strand_types': self.strand_types,
+                'registers': registers,
+                'instructions': self.instructions
+            }, file, indent=4, cls=ObjectEncoder)
+            file.flush()
+
+    def load_binary(self, filename: str) -> None:
+        """Loads the cell types, strand types, registers and instructions saved by
+        :func:`simd_dna.simulation.Simulation.save_binary`, replacing those of the simulation.
+
+        :param filename: The name of the binary file to load.
+        """
+        with open(filename, 'rb') as file:
+            data = file.read()
+
+        offset = len(_BINARY_MAGIC)
+        if len(data) < offset + 2 or data[:offset] != _BINARY_MAGIC:
+            raise ValueError('Not a binary simulation file: ' + filename)
+        if data[offset] != _BINARY_VERSION:
+            raise ValueError('Unsupported binary simulation file version: ' + str(data[offset]))
+        data = zlib.decompress(data[offset + 2:]) if data[offset + 1] else data[offset + 2:]
+
+        header_length = _BINARY_HEADER_LENGTH.unpack_from(data)[0]
+        offset = _BINARY_HEADER_LENGTH.size
+        header = json.loads(data[offset:offset + header_length].decode('utf-8'))
+        offset += header_length
+
+        self.cell_types = decode_json_dict(header['cell_types'], Cell)
+        self.strand_types = decode_json_dict(header['strand_types'], Strand)
+        self.instructions = header['instructions']
+        cell_names = header['cell_names']
+        strand_names = [sys.intern(strand_name) for strand_name in header['strand_names']]
+
+        self.registers = {}
+        for register_name, num_cells, num_top_strands in header['registers']:
+            cells, offset = _read_array(data, offset, _INDEX_TYPECODE, num_cells)
+            start_indices, offset = _read_array(data, offset, _START_INDEX_TYPECODE, num_top_strands)
+            strand_indices, offset = _read_array(data, offset, _INDEX_TYPECODE, num_top_strands)
+
+            register = Register(self.cell_types, self.strand_types)
+            register.cells = list(map(cell_names.__getitem__, cells))
+            register.top_strands = make_top_strands(start_indices, map(strand_names.__getitem__, strand_indices))
+            register._ensure_domain_index()
+            self.registers[register_name] = register
+
+        self._match_table = None
+
+    def save_binary(self, filename: str, compress: bool = True) -> None:
+        """Saves the cell types, strand types, registers and instructions of the simulation in a binary file, which
+        holds the same data as :func:`simd_dna.simulation.Simulation.save_json`, but stores cells and top strands as
+        packed arrays of integers that index tables of cell and strand names, so that large registers are saved and
+        loaded much faster and take less space.
+
+        :param filename: The name of the binary file to save to.
+        :param compress: Whether the file is compressed with zlib.
+        """
+        # Names that aren't cell or strand types are added to the tables as well, so that any register is saved as is
+        cell_ids = {cell_name: i for i, cell_name in enumerate(self.cell_types.keys())}
+        strand_ids = {strand_name: i for i, strand_name in enumerate(self.strand_types.keys())}
+        register_headers = []
+        arrays = []
+        for register_name, register in self.registers.items():
+            for cell_name in register.cells:
+                if cell_name not in cell_ids:
+                    cell_ids[cell_name] = len(cell_ids)
+            for top_strand in register.top_strands:
+                if top_strand.strand_name not in strand_ids:
+                    strand_ids[top_strand.strand_name] = len(strand_ids)
+
+            register_headers.append([register_name, len(register.cells), len(register.top_strands)])
+            arrays.append(array(_INDEX_TYPECODE, map(cell_ids.__getitem__, register.cells)))
+            arrays.append(array(_START_INDEX_TYPECODE, map(attrgetter('start_index'), register.top_strands)))
+            arrays.append(array(_INDEX_TYPECODE, map(strand_ids.__getitem__,
+                                                     map(attrgetter('strand_name'), register.top_strands))))
+
+        header = json.dumps({
+            'cell_types': self.cell_types,
+            'strand_types': self.strand_types,
+            'instructions': self.instructions,
+            'cell_names': list(cell_ids.keys()),
+            'strand_names': list(strand_ids.keys()),
+            'registers': register_headers
+        }, cls=ObjectEncoder).encode('utf-8')
+
+        chunks = [_BINARY_HEADER_LENGTH.pack(len(header)), header]
+        for packed_array in arrays:
+            if sys.byteorder == 'big':
+                packed_array.byteswap()
+            chunks.append(packed_array.tobytes())
+        data = b''.join(chunks)
+
+        with open(filename, 'wb') as file:
+            file.write(_BINARY_MAGIC + bytes([_BINARY_VERSION, compress]))
+            file.write(zlib.compress(data, 1) if compress else data)
+            file.flush()
+
+    def compile_match_table(self) -> MatchTable:
+        """Interns the domain labels, strand names and cell names of the simulation to integers, and precomputes, for
+        every combination of strand type, cell type and offset, the strand domains that complement the cell's domains.
+        The table is shared by all registers in the simulation and is compiled again if cell or strand types were added
+        or replaced since the last compilation.
+
+        :return: The compiled :class:`simd_dna.classes.MatchTable`
+        """
+        if self._match_table is None or self._match_table.cell_types is not self.cell_types \
+                or self._match_table.strand_types is not self.strand_types or not self._match_table.is_current():
+            self._match_table = MatchTable(self.cell_types, self.strand_types)
+
+        return self._match_table
+
     def run_instruction(self, register_name: str,
                         inst_num: int) -> Tuple[Register, Register, List[TopStrand], Optional[List[TopStrand]]]:
-        """Applies an instruction to a register.
+        """Applies an instruction to a register. If the simulation has an instruction cache and the instruction was
+        already applied to the same register contents, the cached result is returned instead.
 
         :param register_name: The name of the affected :class:`simd_dna.classes.Register`
         :param inst_num: The integer index of the applicable instruction.
@@ -124,51 +368,749 @@ class Simulation:
         if inst_num < 0 or inst_num >= len(self.instructions):
             raise ValueError('Invalid instruction index')
 
+        cache_key = None
+        if self.instruction_cache is not None:
+            cache_key = self._get_cache_key(self.instruction_cache, self.registers[register_name], inst_num)
+            cached_result = self.instruction_cache.get(cache_key)
+            if cached_result is not None:
+                return self._use_cached_result(register_name, cached_result)
+
+        return self._run_uncached_instruction(register_name, inst_num, cache_key)
+
+    def _run_uncached_instruction(self, register_name: str, inst_num: int, cache_key: Optional[Tuple]) \
+            -> Tuple[Register, Register, List[TopStrand], Optional[List[TopStrand]]]:
+        # Simulates the instruction as described in run_instruction, and caches the result under cache_key if given
         register = self.registers[register_name]
-        # If keep_results is False, a copy of the register is made so that the original remains unaffected
+        before_register = register.snapshot()
+        try:
+            new_strands, inert_matches = self.apply_instruction(register, inst_num)
+        finally:
+            # If keep_results is False, the instruction is applied to a copy of the register so that the original
+            # remains unaffected
+            if not self.keep_results:
+                original_register = register
+                register = original_register.copy()
+                original_register.restore(before_register)
+
+        if cache_key is not None and self.instruction_cache is not None:
+            self.instruction_cache.put(cache_key, register, new_strands, inert_matches)
+        return register, before_register, new_strands, inert_matches
+
+    def _get_cache_key(self, instruction_cache: InstructionCache, register: Register, inst_num: int) -> Tuple:
+        instruction_cache.check_match_table(self.compile_match_table())
+        return InstructionCache.get_key(register, self.instructions[inst_num], self.show_inert_instruction_strands)
+
+    def _use_cached_result(self, register_name: str,
+                           cached_result: Tuple[Register, Tuple[TopStrand, ...], Optional[Tuple[TopStrand, ...]]]) \
+            -> Tuple[Register, Register, List[TopStrand], Optional[List[TopStrand]]]:
+        # Replaces the register contents with a cached result, as run_instruction would have
+        cached_register, new_strands, inert_matches = cached_result
+        register = self.registers[register_name]
+        before_register = register.copy()
         if not self.keep_results:
-            register = copy.deepcopy(register)
-        before_register = copy.deepcopy(register)
-        total_domains = 0
-        for cell_name in register.cells:
-            total_domains += len(self.cell_types[cell_name].domains)
+            register = register.copy()
+        register.restore(cached_register)
+        return register, before_register, list(new_strands), None if inert_matches is None else list(inert_matches)
+
+    def run_instruction_batch(self, inst_num: int, register_names: Optional[List[str]] = None) \
+            -> Dict[str, Tuple[Register, Register, List[TopStrand], Optional[List[TopStrand]]]]:
+        """Applies an instruction to several registers at once. Registers with the same cells are encoded as NumPy
+        arrays and simulated together by a :class:`simd_dna.batch.RegisterBatch`, so the cost of each attachment
+        attempt and round of displacement is shared by all of them. The results are the same as calling
+        :func:`simd_dna.simulation.Simulation.run_instruction` on each register. If NumPy isn't installed,
+        show_inert_instruction_strands is set to True, or registers are simulated in windows or shards, the registers
+        are simulated one at a time instead. Registers whose results are in the instruction cache aren't simulated.
+
+        :param inst_num: The integer index of the applicable instruction.
+        :param register_names: The names of the affected registers. If None, the instruction is applied to every
+            register in the simulation.
+        :return: A dict mapping each register name to the tuple that
+            :func:`simd_dna.simulation.Simulation.run_instruction` would have returned for that register, in the
+            order of register_names
+        """
+        if register_names is None:
+            register_names = list(self.registers.keys())
+        for register_name in register_names:
+            if register_name not in self.registers.keys():
+                raise ValueError('No such register exists')
+
+        if inst_num < 0 or inst_num >= len(self.instructions):
+            raise ValueError('Invalid instruction index')
+
+        try:
+            from simd_dna.batch import RegisterBatch, group_registers
+            numpy_is_installed = True
+        except ImportError:
+            numpy_is_installed = False
+
+        results: Dict[str, Tuple[Register, Register, List[TopStrand], Optional[List[TopStrand]]]] = {}
+        cache_keys: Dict[str, Tuple] = {}
+        # Registers with the same contents as an earlier register of this batch that wasn't cached yet, which can use
+        # its result once it's cached
+        duplicate_keys: Dict[str, Tuple] = {}
+        if self.instruction_cache is not None:
+            pending_keys = set()
+            for register_name in register_names:
+                cache_key = self._get_cache_key(self.instruction_cache, self.registers[register_name], inst_num)
+                if cache_key in pending_keys:
+                    duplicate_keys[register_name] = cache_key
+                    continue
+
+                cached_result = self.instruction_cache.get(cache_key)
+                if cached_result is not None:
+                    results[register_name] = self._use_cached_result(register_name, cached_result)
+                else:
+                    cache_keys[register_name] = cache_key
+                    pending_keys.add(cache_key)
+
+        if numpy_is_installed and not self.show_inert_instruction_strands and self.window_memo is None \
+                and self.shard_pool is None:
+            instruction = self.instructions[inst_num]
+            match_table = self.compile_match_table()
+            batched_names = [register_name for register_name in register_names
+                             if register_name not in results and register_name not in duplicate_keys]
+            for register_name in batched_names:
+                self.registers[register_name]._match_table = match_table
+            for group in group_registers({name: self.registers[name] for name in batched_names}):
+                batch = RegisterBatch([self.registers[name] for name in group], instruction)
+                left_out = batch.encode()
+                if len(batch.registers) == 0 or batch.total_domains == 0:
+                    continue
+
+                batch.apply_instruction()
+                names_by_register = {id(self.registers[name]): name for name in group}
+                for register, top_strands, new_strands in zip(batch.registers, *batch.decode()):
+                    register_name = names_by_register[id(register)]
+                    before_register = register.copy()
+                    if self.keep_results:
+                        register.top_strands = top_strands
+                        register._top_strands_shared = False
+                    else:
+                        register = self._copy_register(register, top_strands)
+                    results[register_name] = (register, before_register, new_strands, None)
+                    if register_name in cache_keys and self.instruction_cache is not None:
+                        self.instruction_cache.put(cache_keys[register_name], register, new_strands, None)
+
+        for register_name in register_names:
+            if register_name not in results and register_name not in duplicate_keys:
+                results[register_name] = self._run_uncached_instruction(register_name, inst_num,
+                                                                        cache_keys.get(register_name))
+
+        for register_name, cache_key in duplicate_keys.items():
+            cached_result = None if self.instruction_cache is None else self.instruction_cache.get(cache_key)
+            if cached_result is not None:
+                results[register_name] = self._use_cached_result(register_name, cached_result)
+            else:
+                results[register_name] = self._run_uncached_instruction(register_name, inst_num, cache_key)
+
+        return {register_name: results[register_name] for register_name in register_names}
+
+    def run_all(self, parallel: Optional[int] = None, register_names: Optional[List[str]] = None) \
+            -> Dict[str, List[Tuple[Register, Register, List[TopStrand], Optional[List[TopStrand]]]]]:
+        """Applies every instruction, in order, to each register, where each instruction is applied to the results of
+        the previous one. If keep_results is set to True, the registers in the simulation are replaced by the results
+        of the last instruction.
+
+        The registers can be distributed across a pool of worker processes, which only receive the cell types, strand
+        types and instructions once, and the cells and top strands of the registers they simulate. Each worker
+        simulates its registers with :func:`simd_dna.simulation.Simulation.run_instruction_batch`. When running in
+        parallel on platforms that spawn new processes, such as Windows and macOS, the calling script must be guarded
+        by ``if __name__ == '__main__':``.
+
+        :param parallel: The number of worker processes. If None or 1, the registers are simulated in this process.
+        :param register_names: The names of the affected registers. If None, every register in the simulation is
+            affected.
+        :return: A dict mapping each register name to a list with one entry per instruction, containing the tuple
+            returned by :func:`simd_dna.simulation.Simulation.run_instruction` for that instruction. Unlike in
+            run_instruction, the registers in each tuple aren't modified by later instructions.
+        """
+        if register_names is None:
+            register_names = list(self.registers.keys())
+        for register_name in register_names:
+            if register_name not in self.registers.keys():
+                raise ValueError('No such register exists')
+
+        if parallel is None or parallel <= 1 or len(register_names) <= 1:
+            return self._run_all_serial(register_names)
+
+        # Split the registers into one contiguous chunk per worker
+        chunk_size = -(-len(register_names) // parallel)
+        chunks = [register_names[i:i + chunk_size] for i in range(0, len(register_names), chunk_size)]
+        payloads = [[(self.registers[register_name].cells,
+                      [(top_strand.start_index, top_strand.strand_name)
+                       for top_strand in self.registers[register_name].top_strands])
+                     for register_name in chunk]
+                    for chunk in chunks]
+
+        with ProcessPoolExecutor(max_workers=len(chunks), initializer=_initialize_worker,
+                                 initargs=(self.cell_types, self.strand_types, self.instructions,
+                                           self.show_inert_instruction_strands)) as executor:
+            chunk_results = list(executor.map(_run_worker_registers, payloads))
+
+        results: Dict[str, List[Tuple[Register, Register, List[TopStrand], Optional[List[TopStrand]]]]] = {}
+        decoded_strands: Dict[Tuple[int, str], TopStrand] = {}
+        for chunk, chunk_result in zip(chunks, chunk_results):
+            for register_name, register_results in zip(chunk, chunk_result):
+                register = self.registers[register_name]
+                before_register = register.copy()
+                results[register_name] = []
+                top_strands = register.top_strands
+                for strand_changes, new_strands, inert_matches in register_results:
+                    top_strands = _apply_strand_changes(top_strands, strand_changes, decoded_strands)
+                    after_register = self._copy_register(register, top_strands)
+                    results[register_name].append((after_register, before_register,
+                                                   _decode_top_strands(new_strands, decoded_strands),
+                                                   None if inert_matches is None
+                                                   else _decode_top_strands(inert_matches, decoded_strands)))
+                    before_register = after_register.copy()
+
+                if self.keep_results and len(register_results) > 0:
+                    register.top_strands = results[register_name][-1][0].top_strands
+                    register._top_strands_shared = True
+
+        return {register_name: results[register_name] for register_name in register_names}
+
+    def _run_all_serial(self, register_names: List[str]) \
+            -> Dict[str, List[Tuple[Register, Register, List[TopStrand], Optional[List[TopStrand]]]]]:
+        initial_registers = {register_name: self.registers[register_name].copy() for register_name in register_names}
+        keep_results = self.keep_results
+        self.keep_results = True  # temporarily save results during instruction cycle
+        results: Dict[str, List[Tuple[Register, Register, List[TopStrand], Optional[List[TopStrand]]]]] = \
+            {register_name: [] for register_name in register_names}
+        try:
+            for inst_num in range(len(self.instructions)):
+                for register_name, (register, before_register, new_strands, inert_matches) \
+                        in self.run_instruction_batch(inst_num, register_names).items():
+                    # The register is modified by the next instruction, so keep a copy of its current contents
+                    results[register_name].append((register.copy(), before_register, new_strands, inert_matches))
+        finally:
+            self.keep_results = keep_results
+            if not keep_results:
+                self.registers.update(initial_registers)
+
+        return results
+
+    def run_cycles(self, register_name: str, max_cycles: int,
+                   stop_when: Optional[Callable[[List[Optional[str]]], bool]] = None,
+                   detect_repeats: bool = True,
+                   checkpointer: Optional[Checkpointer] = None) -> CycleResult:
+        """Applies every instruction, in order, to a register over and over, until a stopping condition is met. Unlike
+        :func:`simd_dna.simulation.Simulation.run_all`, nothing is recorded or returned for individual instructions,
+        and inert instruction strands aren't tracked, so long runs of Turing machines and cellular automata only pay
+        for the simulation itself. If keep_results is set to True, the register in the simulation is replaced by the
+        result.
+
+        Before the first cycle and after each cycle, the run stops if stop_when returns True for the cell labels of the
+        register, as returned by :func:`simd_dna.classes.Register.get_cell_labels`. If detect_repeats is set to True,
+        it also stops as soon as the register has the same top strands as after an earlier cycle, as every later cycle
+        would then repeat earlier ones. For this purpose, a 128-bit BLAKE2 digest of the top strands after each cycle
+        is kept in a dict, so repeat detection only takes a few dozen bytes per cycle, however long the register is.
+
+        If a :class:`simd_dna.checkpoint.Checkpointer` is given, the run continues from the checkpoint of the register,
+        if there is one, and the progress of the run is saved to the checkpoint file while it runs and once it stops.
+        Resuming a run that had already stopped returns the same result without applying any instruction.
+
+        :param register_name: The name of the affected :class:`simd_dna.classes.Register`
+        :param max_cycles: The maximum number of instruction cycles to apply.
+        :param stop_when: A function that takes the list of cell labels and returns True if the run should stop, such
+            as :func:`simd_dna.tm.is_tm_halted`. If None, the run only stops on a repeated register or after
+            max_cycles cycles.
+        :param detect_repeats: Whether the run stops when the register repeats its contents.
+        :param checkpointer: The :class:`simd_dna.checkpoint.Checkpointer` that saves the progress of the run, or None.
+        :return: A :class:`simd_dna.simulation.CycleResult` with the final register and the reason the run stopped
+        """
+        if register_name not in self.registers.keys():
+            raise ValueError('No such register exists')
+
+        register = self.registers[register_name]
+        # The cells don't change, so the digest of the top strands identifies the register contents
+        seen_states: Dict[bytes, int] = {}
+        cycles = 0
+        position = 0
+        checkpoint = checkpointer.get_progress(self, register_name) if checkpointer is not None else None
+        if checkpoint is not None:
+            if detect_repeats and checkpoint.seen_states is None:
+                raise ValueError('The checkpoint was saved without detecting repeats')
+
+            register = checkpoint.register
+            if self.keep_results:
+                self.registers[register_name] = register
+            if detect_repeats and checkpoint.seen_states is not None:
+                seen_states = checkpoint.seen_states
+            cycles = checkpoint.cycles
+            position = checkpoint.position
+        elif not self.keep_results:
+            register = register.copy()
+
+        show_inert_instruction_strands = self.show_inert_instruction_strands
+        self.show_inert_instruction_strands = False
+        try:
+            while True:
+                if position == 0:
+                    result = None
+                    if stop_when is not None and stop_when(register.get_cell_labels()):
+                        result = CycleResult(register, cycles, 'stop_when')
+                    elif detect_repeats:
+                        first_cycle = seen_states.setdefault(_get_state_digest(register.top_strands), cycles)
+                        if first_cycle != cycles:
+                            result = CycleResult(register, cycles,
+                                                 'fixed_point' if first_cycle == cycles - 1 else 'repeated_state',
+                                                 first_cycle)
+                    if result is None and cycles >= max_cycles:
+                        result = CycleResult(register, cycles, 'max_cycles')
+
+                    if result is not None:
+                        if checkpointer is not None:
+                            checkpointer.save(self, register_name, register, cycles, 0,
+                                              seen_states if detect_repeats else None)
+                        return result
+
+                for inst_num in range(position, len(self.instructions)):
+                    self.apply_instruction(register, inst_num)
+                    if checkpointer is not None and checkpointer.is_due():
+                        checkpointer.save(self, register_name, register, cycles, inst_num + 1,
+                                          seen_states if detect_repeats else None)
+                cycles += 1
+                position = 0
+        finally:
+            self.show_inert_instruction_strands = show_inert_instruction_strands
+
+    def iter_run(self, register_name: str, inst_nums: Optional[Iterable[int]] = None,
+                 checkpointer: Optional[Checkpointer] = None, checkpoint: Optional[Checkpoint] = None) \
+            -> Iterator[InstructionDiff]:
+        """Applies instructions, in order, to a register, and yields the changes made by each instruction as soon as
+        it's applied. Unlike :func:`simd_dna.simulation.Simulation.run_all`, no copies of the register are kept, and
+        each diff only costs as much as the changes it describes, so long programs, such as those generated by
+        :func:`simd_dna.tm.generate_tm_instructions`, only take as much memory as the caller keeps. The contents before
+        and after each instruction can be rebuilt from a copy of the register taken beforehand::
+
+            register = simulation.registers['A'].copy()
+            for diff in simulation.iter_run('A'):
+                before_register = register.copy()
+                diff.apply(register)
 
+        If keep_results is set to True, the register in the simulation is modified as the instructions are applied.
+        Otherwise, they're applied to a copy of the register. The instruction cache isn't used.
+
+        If a :class:`simd_dna.checkpoint.Checkpointer` is given, the run continues from the checkpoint of the register,
+        if there is one, skipping the instructions applied before it, and the progress of the run is saved to the
+        checkpoint file while it runs and once it ends. An instruction only counts as applied once the caller has
+        asked for the next diff, so that a resumed run doesn't skip a diff that the interrupted run hadn't handled.
+
+        :param register_name: The name of the affected :class:`simd_dna.classes.Register`
+        :param inst_nums: The integer indices of the instructions to apply, in order. If None, every instruction is
+            applied once.
+        :param checkpointer: The :class:`simd_dna.checkpoint.Checkpointer` that saves the progress of the run, or None.
+        :param checkpoint: The :class:`simd_dna.checkpoint.Checkpoint` of the register returned by
+            :func:`simd_dna.checkpoint.Checkpointer.get_progress`, if the caller already loaded it, so that it isn't
+            loaded again. Its register becomes the one the instructions are applied to. If None, the checkpoint is
+            loaded from the checkpointer.
+        :return: An iterator of :class:`simd_dna.simulation.InstructionDiff`, one per instruction
+        """
+        if register_name not in self.registers.keys():
+            raise ValueError('No such register exists')
+
+        if inst_nums is None:
+            inst_nums = range(len(self.instructions))
+        else:
+            inst_nums = list(inst_nums)
+            for inst_num in inst_nums:
+                if inst_num < 0 or inst_num >= len(self.instructions):
+                    raise ValueError('Invalid instruction index')
+
+        register = self.registers[register_name]
+        position = 0
+        if checkpoint is None and checkpointer is not None:
+            checkpoint = checkpointer.get_progress(self, register_name)
+        if checkpoint is not None:
+            if checkpoint.cycles != 0 or checkpoint.position > len(inst_nums):
+                raise ValueError('The checkpoint was saved by a different run')
+
+            register = checkpoint.register
+            if self.keep_results:
+                self.registers[register_name] = register
+            position = checkpoint.position
+        elif not self.keep_results:
+            register = register.copy()
+        return self._iter_run(register, inst_nums, position, register_name, checkpointer)
+
+    def _iter_run(self, register: Register, inst_nums: Sequence[int], position: int, register_name: str,
+                  checkpointer: Optional[Checkpointer]) -> Iterator[InstructionDiff]:
+        for inst_num in inst_nums[position:]:
+            before_register = register.snapshot()
+            new_strands, inert_matches = self.apply_instruction(register, inst_num)
+            attached_strands, lost_strands = _get_strand_diff(before_register, register)
+
+            # Strands complementary to the top strand remove every top strand they can, so the lost strands of the
+            # types they remove are put down to them
+            match_table = self.compile_match_table()
+            complementary_strands = [strand_name for strand_name in self.instructions[inst_num]
+                                     if self.strand_types[strand_name].is_complementary]
+            removed_strands = tuple(x for x in lost_strands
+                                    if any(match_table.is_removed_by(x.strand_name, strand_name)
+                                           for strand_name in complementary_strands))
+            displaced_strands = tuple(lost_strands) if len(removed_strands) == 0 \
+                else tuple(x for x in lost_strands if x not in removed_strands)
+            yield InstructionDiff(inst_num, tuple(attached_strands), displaced_strands, removed_strands,
+                                  tuple(new_strands), None if inert_matches is None else tuple(inert_matches))
+
+            position += 1
+            if checkpointer is not None and checkpointer.is_due():
+                checkpointer.save(self, register_name, register, 0, position)
+
+        if checkpointer is not None:
+            checkpointer.save(self, register_name, register, 0, position)
+
+    @staticmethod
+    def _copy_register(register: Register, top_strands: List[TopStrand]) -> Register:
+        # Returns a copy of the register with different top strands, which may be shared with other registers
+        register = register.copy()
+        register.top_strands = top_strands
+        return register
+
+    def apply_instruction(self, register: Register,
+                          inst_num: int) -> Tuple[List[TopStrand], Optional[List[TopStrand]]]:
+        """Applies an instruction to a register in place. Unlike
+        :func:`simd_dna.simulation.Simulation.run_instruction`, the register doesn't need to belong to the simulation,
+        and no copies are made.
+
+        :param register: The :class:`simd_dna.classes.Register` to apply the instruction to
+        :param inst_num: The integer index of the applicable instruction.
+        :return: A tuple containing the list of applicable instruction strands, and (optionally) the list of inert
+            instruction strands, as in :func:`simd_dna.simulation.Simulation.run_instruction`
+        """
+        register._match_table = self.compile_match_table()
+        if self.shard_pool is not None and not self.show_inert_instruction_strands:
+            new_strands = self.shard_pool.apply_instruction(register, inst_num)
+            if new_strands is not None:
+                return new_strands, None
+        if self.window_memo is not None and not self.show_inert_instruction_strands:
+            new_strands = self.window_memo.apply_instruction(self, register, inst_num)
+            if new_strands is not None:
+                return new_strands, None
+
+        return self._simulate_instruction(register, inst_num)
+
+    def _simulate_instruction(self, register: Register, inst_num: int,
+                              round_callback: Optional[Callable[[List[TopStrand], List[TopStrand], List[TopStrand]],
+                                                                bool]] = None) \
+            -> Tuple[List[TopStrand], Optional[List[TopStrand]]]:
+        # Applies the instruction with the full engine. If round_callback is given, it's called after every round of
+        # attachments with the strands attached, displaced while preserving the new strands, and displaced afterwards,
+        # and the instruction is cut short if it returns False.
         if self.show_inert_instruction_strands:
-            inert_matches = []
+            inert_matches = _InertStrandLog()
         else:
             inert_matches = None
 
         inst = self.instructions[inst_num]
         new_strands = []
+        # For each instruction strand, the domains whose occupancy changed since the strand was last applied, so that
+        # only the positions near those domains are attempted again. None means the strand hasn't been applied yet.
+        changed_domains: Dict[str, Optional[Set[int]]] = {strand_name: None for strand_name in inst}
+        stopped = False
         for _ in range(len(inst)):  # Repeat in case some strands should take effect after another
-            displacement_occurred = True
+            displacement_occurred = not stopped
             while displacement_occurred:  # Repeat in case of toehold exchanges/cascades
                 new_attachments = []
                 for strand_name in inst:
-                    for i in range(total_domains):
-                        new_attachment = register.attempt_attachment(i, strand_name, inert_matches)
-                        if new_attachment is not None:
-                            new_attachments.extend(new_attachment)
+                    new_attachments.extend(self._apply_instruction_strand(register, strand_name, changed_domains,
+                                                                          inert_matches))
 
                 # do first round of displacements preserving the new strands
+                preserving_displaced_strands = []
                 if len(new_attachments) > 0:
-                    register.displace_strands(new_attachments)
+                    preserving_displaced_strands = register.displace_strands(new_attachments)
+                    self._mark_changed_domains(register, preserving_displaced_strands, changed_domains)
                 else:
                     displacement_occurred = False
 
                 displaced_strands = register.displace_strands()
+                self._mark_changed_domains(register, displaced_strands, changed_domains)
                 if displaced_strands == new_attachments:  # all new strands did not stably bind
                     displacement_occurred = False
                 else:
+                    displaced_set = set(displaced_strands)
                     new_strands.extend(
-                        [strand for strand in new_attachments if strand not in displaced_strands])
+                        [strand for strand in new_attachments if strand not in displaced_set])
 
                 if inert_matches is not None:
                     inert_matches.extend(displaced_strands)
+                if round_callback is not None \
+                        and not round_callback(new_attachments, preserving_displaced_strands, displaced_strands):
+                    stopped = True
+                    displacement_occurred = False
 
         new_strands.sort(key=lambda x: x.start_index)
+        inert_strands = None
         if inert_matches is not None:
-            inert_matches = [strand for strand in inert_matches if strand not in new_strands]
-            inert_matches = register.sanitize_inert_strands(inert_matches, new_strands)
+            new_strand_set = set(new_strands)
+            inert_strands = [strand for strand in inert_matches.get_strands() if strand not in new_strand_set]
+            inert_strands = register.sanitize_inert_strands(inert_strands, new_strands)
 
-        return register, before_register, new_strands, inert_matches
+        return new_strands, inert_strands
+
+    def _apply_instruction_strand(self, register: Register,
+                                  strand_name: str,
+                                  changed_domains: Dict[str, Optional[Set[int]]],
+                                  inert_matches: Optional['_InertStrandLog']) -> List[TopStrand]:
+        # Attempts to attach an instruction strand at every register position where the outcome could differ from the
+        # last time the strand was applied, going from left to right. A position can only change outcome if one of the
+        # domains underneath it changed occupancy since then. The first time the strand is applied, only the positions
+        # with an open toehold are attempted. If inert strands are tracked, they are looked for at every position where
+        # the strand didn't attach the first time, and afterwards only at the positions that were attempted again, as
+        # an inert strand at a position that doesn't change outcome was already logged.
+        #
+        # A strand complementary to the top strand removes every top strand it can at its first attempt, so later
+        # positions can only be inert. Whether they are doesn't depend on the top strands, so after the first time the
+        # strand is applied, only the first position, which is skipped if it removed any strands, can still be new.
+        new_attachments: List[TopStrand] = []
+        total_domains = register.total_domains
+        if total_domains == 0:
+            return new_attachments
+        if strand_name not in register.strand_types.keys():
+            raise ValueError('Strand type does not exist')
+
+        strand = register.strand_types[strand_name]
+        dirty_domains = changed_domains[strand_name]
+        changed_domains[strand_name] = set()
+        if dirty_domains is not None and len(dirty_domains) == 0:
+            return new_attachments
+
+        if strand.is_complementary:
+            # Strands complementary to the top strand remove every matching top strand at once, regardless of position
+            new_attachment = register.attempt_attachment(0, strand_name)
+            if new_attachment is not None:
+                new_attachments.extend(new_attachment)
+            if inert_matches is not None:
+                for i in range(1 if new_attachment is not None else 0, total_domains if dirty_domains is None else 1):
+                    inert_matches.add(register.get_inert_strand(i, strand_name))
+
+            self._mark_changed_domains(register, new_attachments, changed_domains)
+            return new_attachments
+        elif dirty_domains is None:
+            position_set = set()
+            strand_domains = register._get_strand_domain_ids(strand_name)
+            for domain_index in register.get_open_domain_indices():
+                domain_id = register._bottom_domains[domain_index]
+                for i in range(len(strand_domains)):
+                    if strand_domains[i] == domain_id and domain_index - i >= 0:
+                        position_set.add(domain_index - i)
+            positions: Sequence[int] = sorted(position_set)
+        else:
+            position_set = set()
+            for domain_index in dirty_domains:
+                position_set.update(range(max(domain_index - len(strand.domains) + 1, 0),
+                                          min(domain_index + 1, total_domains)))
+            positions = sorted(position_set)
+
+        # The first time the strand is applied, the positions without an open toehold can't gain one from the strand's
+        # own attachments, so they only need to be checked for inert strands
+        attempted_positions = None
+        if dirty_domains is None and inert_matches is not None:
+            attempted_positions = set(positions)
+            positions = range(total_domains)
+
+        for i in positions:
+            new_attachment = None
+            if attempted_positions is None or i in attempted_positions:
+                new_attachment = register.attempt_attachment(i, strand_name)
+            if new_attachment is not None:
+                new_attachments.extend(new_attachment)
+            elif inert_matches is not None:
+                inert_matches.add(register.get_inert_strand(i, strand_name))
+
+        self._mark_changed_domains(register, new_attachments, changed_domains)
+        return new_attachments
+
+    @staticmethod
+    def _mark_changed_domains(register: Register,
+                              top_strands: List[TopStrand],
+                              changed_domains: Dict[str, Optional[Set[int]]]) -> None:
+        # Records the domains covered by top_strands as changed for every instruction strand that was already applied
+        for top_strand in top_strands:
+            start_index = top_strand.start_index
+            domains = range(start_index, start_index + len(register._get_strand_domain_ids(top_strand.strand_name)))
+            for dirty_domains in changed_domains.values():
+                if dirty_domains is not None:
+                    dirty_domains.update(domains)
+
+
+class _InertStrandLog:
+    # Collects inert instruction strands in the same order as the unattached_matches list of
+    # Register.attempt_attachment, which sorts the whole list by start index after each new inert strand, while the
+    # displaced strands are appended unsorted. Since repeated stable sorts are equivalent to a single one, the list is
+    # only sorted once, up to the last inert strand, when it is read.
+    def __init__(self) -> None:
+        self._strands: List[TopStrand] = []
+        self._strand_set: Set[TopStrand] = set()
+        self._sorted_length = 0
+
+    def add(self, top_strand: Optional[TopStrand]) -> None:
+        if top_strand is not None and top_strand not in self._strand_set:
+            self._strands.append(top_strand)
+            self._strand_set.add(top_strand)
+            self._sorted_length = len(self._strands)
+
+    def extend(self, top_strands: List[TopStrand]) -> None:
+        self._strands.extend(top_strands)
+        self._strand_set.update(top_strands)
+
+    def get_strands(self) -> List[TopStrand]:
+        return sorted(self._strands[:self._sorted_length], key=lambda x: x.start_index) + \
+            self._strands[self._sorted_length:]
+
+
+def decode_json_dict(d: Dict[str, Dict], cls: Type[Union[Cell, Strand, Register]]) -> Dict:
+    """Decodes a dict of objects saved as JSON, such as the cell types, strand types or registers of a simulation.
+
+    :param d: A dict mapping names to the JSON dicts of the objects.
+    :param cls: The class of the objects, whose decode_json method is called with each JSON dict.
+    :return: A dict mapping the same names to the decoded objects
+    """
+    decoded_dict = {}
+    for key in d.keys():
+        decoded_dict[key] = cls.decode_json(**d[key])
+
+    return decoded_dict
+
+
+def _get_state_digest(top_strands: List[TopStrand]) -> bytes:
+    # Hashes the start indices, as little-endian integers, and the names of the top strands of a register, which
+    # identify the contents of registers with the same cells
+    digest = hashlib.blake2b(digest_size=16)
+    start_indices = array(_START_INDEX_TYPECODE, map(attrgetter('start_index'), top_strands))
+    if sys.byteorder == 'big':
+        start_indices.byteswap()
+    digest.update(start_indices.tobytes())
+    digest.update('\0'.join(map(attrgetter('strand_name'), top_strands)).encode('utf-8'))
+    return digest.digest()
+
+
+def _read_array(data: bytes, offset: int, typecode: str, length: int) -> Tuple[array, int]:
+    # Reads a little-endian array of integers from a binary simulation file, returning it and the offset after it
+    packed_array = array(typecode)
+    end = offset + length * packed_array.itemsize
+    packed_array.frombytes(data[offset:end])
+    if sys.byteorder == 'big':
+        packed_array.byteswap()
+    return packed_array, end
+
+
+def _initialize_worker(cell_types: Dict[str, Cell], strand_types: Dict[str, Strand], instructions: List[List[str]],
+                       show_inert_instruction_strands: bool) -> None:
+    global _worker_simulation
+    _worker_simulation = Simulation(keep_results=True, show_inert_instruction_strands=show_inert_instruction_strands)
+    _worker_simulation.cell_types = cell_types
+    _worker_simulation.strand_types = strand_types
+    _worker_simulation.instructions = instructions
+
+
+def _run_worker_registers(registers: List[Tuple[List[str], List[Tuple[int, str]]]]) \
+        -> List[List[Tuple[Tuple, List[Tuple[int, str]], Optional[List[Tuple[int, str]]]]]]:
+    # Applies every instruction to the registers sent to a worker process, returning the top strands, new strands and
+    # inert strands after each instruction
+    simulation = _worker_simulation
+    simulation.registers = {}
+    for register_number, (cells, top_strands) in enumerate(registers):
+        register = Register(simulation.cell_types, simulation.strand_types)
+        register.cells = cells
+        register.top_strands = _decode_top_strands(top_strands)
+        register._ensure_domain_index()
+        simulation.registers[str(register_number)] = register
+
+    results: List[List[Tuple[Tuple, List[Tuple[int, str]], Optional[List[Tuple[int, str]]]]]] = \
+        [[] for _ in registers]
+    for inst_num in range(len(simulation.instructions)):
+        for register_name, (register, before_register, new_strands, inert_matches) \
+                in simulation.run_instruction_batch(inst_num).items():
+            results[int(register_name)].append((_get_strand_changes(before_register.top_strands,
+                                                                    register.top_strands),
+                                                _encode_top_strands(new_strands),
+                                                None if inert_matches is None else _encode_top_strands(inert_matches)))
+
+    return results
+
+
+def _get_strand_changes(before_strands: List[TopStrand], after_strands: List[TopStrand]) -> Tuple:
+    # Describes the top strands after an instruction by the positions of the strands removed from before_strands, and
+    # the strands inserted at each position of after_strands, or by the whole list if the strands were reordered
+    after_set = set(after_strands)
+    removed = [i for i, top_strand in enumerate(before_strands) if top_strand not in after_set]
+    before_set = set(before_strands)
+    inserted = [(i, top_strand.start_index, top_strand.strand_name) for i, top_strand in enumerate(after_strands)
+                if top_strand not in before_set]
+    if _apply_strand_changes(before_strands, (removed, inserted), {}) != after_strands:
+        return None, _encode_top_strands(after_strands)
+
+    return removed, inserted
+
+
+def _get_strand_diff(before_register: Register, register: Register) -> Tuple[List[TopStrand], List[TopStrand]]:
+    # Returns the top strands that the register gained and lost since before_register, its latest snapshot, sorted by
+    # start index. Only the start indices of the strands attached or removed since the snapshot are compared. Where the
+    # strands that start at the same index changed order, all of them are listed as gained and lost.
+    if not before_register._top_strands_sorted or not register._top_strands_sorted:
+        return list(register.top_strands), list(before_register.top_strands)
+
+    changed_strands = register._changed_strands
+    if changed_strands is None or register._snapshot_token is not before_register._snapshot_token:
+        changed_strands = before_register.top_strands + register.top_strands
+
+    gained_strands: List[TopStrand] = []
+    lost_strands: List[TopStrand] = []
+    for start_index in sorted({x.start_index for x in changed_strands}):
+        old_strands = before_register.top_strands[
+            register._bisect_top_strands(start_index, False, before_register.top_strands):
+            register._bisect_top_strands(start_index, True, before_register.top_strands)]
+        new_strands = register.top_strands[register._bisect_top_strands(start_index, False):
+                                           register._bisect_top_strands(start_index)]
+        kept_strands = [x for x in old_strands if x in new_strands]
+        start_gained_strands = [x for x in new_strands if x not in old_strands]
+        if kept_strands + start_gained_strands != new_strands:
+            kept_strands = []
+            start_gained_strands = new_strands
+        lost_strands.extend(x for x in old_strands if x not in kept_strands)
+        gained_strands.extend(start_gained_strands)
+
+    return gained_strands, lost_strands
+
+
+def _apply_strand_changes(before_strands: List[TopStrand], strand_changes: Tuple,
+                          decoded_strands: Dict[Tuple[int, str], TopStrand]) -> List[TopStrand]:
+    # The inverse of _get_strand_changes
+    removed, inserted = strand_changes
+    if removed is None:
+        return _decode_top_strands(inserted, decoded_strands)
+
+    after_strands = before_strands
+    if len(removed) > 0:
+        removed = set(removed)
+        after_strands = [top_strand for i, top_strand in enumerate(before_strands) if i not in removed]
+    if len(inserted) > 0:
+        after_strands = list(after_strands)
+        for i, start_index, strand_name in inserted:
+            after_strands.insert(i, decoded_strands.get((start_index, strand_name)) or
+                                 decoded_strands.setdefault((start_index, strand_name),
+                                                            TopStrand(start_index, strand_name)))
+
+    return after_strands
+
+
+def _encode_top_strands(top_strands: List[TopStrand]) -> List[Tuple[int, str]]:
+    return [(top_strand.start_index, top_strand.strand_name) for top_strand in top_strands]
+
+
+def _decode_top_strands(top_strands: List[Tuple[int, str]],
+                        decoded_strands: Optional[Dict[Tuple[int, str], TopStrand]] = None) -> List[TopStrand]:
+    # decoded_strands caches the TopStrand instances, which are immutable and can be shared by several registers
+    if decoded_strands is None:
+        return [TopStrand(start_index, strand_name) for start_index, strand_name in top_strands]
+
+    decoded = []
+    for top_strand in top_strands:
+        if top_strand not in decoded_strands:
+            decoded_strands[top_strand] = TopStrand(*top_strand)
+        decoded.append(decoded_strands[top_strand])
+
+    return decoded
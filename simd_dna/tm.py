@@ -1,4 +1,4 @@
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 from simd_dna.simulation import *
 from simd_dna.functions import convert_rgb_to_hex
@@ -9,8 +9,10 @@ import re
 import ruamel.yaml as yaml
 
 
-def convert_tm_to_simd(simulation: Simulation) -> None:
-    filename = input('Enter the YAML file name: ')
+def convert_tm_to_simd(simulation: Simulation, filename: Optional[str] = None,
+                       register_name: Optional[str] = None) -> None:
+    if filename is None:
+        filename = input('Enter the YAML file name: ')
     with open(filename, 'r') as file:
         data = yaml.safe_load(file)
         if 'input' not in data.keys():
@@ -51,7 +53,8 @@ def convert_tm_to_simd(simulation: Simulation) -> None:
             print('Sorry, the TM conversion algorithm only supports the blank, 0, and 1 alphabet symbols.')
             return
 
-        register_name = input('What name would you like to give the register? ')
+        if register_name is None:
+            register_name = input('What name would you like to give the register? ')
         generate_tm_to_simd_data_from_transitions(transition_data, data, register_name, simulation)
 
 
@@ -206,6 +209,19 @@ def create_tm_cell_labels(transition_data, blank_symbol, simulation):
         simulation.cell_types['Tape cell'].strand_labels.append(final_label)
 
 
+def is_tm_halted(cell_labels: List[Optional[str]]) -> bool:
+    """Checks if a Turing machine converted by :func:`simd_dna.tm.convert_tm_to_simd` has halted, given the cell labels
+    of its register after an instruction cycle. The cell under the head is labelled with the current state and symbol
+    by :func:`simd_dna.tm.create_tm_cell_labels` as long as the state has a transition for the symbol, so the machine
+    has halted once every cell is only labelled with its symbol. Can be used as the stop_when predicate of
+    :func:`simd_dna.simulation.Simulation.run_cycles`.
+
+    :param cell_labels: The list returned by :func:`simd_dna.classes.Register.get_cell_labels`
+    :return: True if every cell is labelled with a tape symbol, False otherwise
+    """
+    return all(label is not None and not label.startswith('(') for label in cell_labels)
+
+
 def encode_register_data(register_name: str, transition_data, tm_data: Dict, simulation: Simulation) -> None:
     simulation.registers[register_name] = Register(simulation.cell_types, simulation.strand_types)
     if len(tm_data['input']) > 0:
@@ -0,0 +1,554 @@
+import json
+import os
+import struct
+import zlib
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union, cast
+
+from simd_dna.classes import Cell, ObjectEncoder, Register, Strand, TopStrand
+from simd_dna.simulation import InstructionDiff, Simulation, decode_json_dict
+
+# A trace file starts with the magic bytes, the format version and whether its chunks are compressed, followed by
+# chunks made of a one byte tag, the length of the payload and the payload: the header (H), the register before the
+# first instruction (R), blocks of instruction records (B) and finally the index of the blocks (I). The index is
+# followed by its offset in the file and the trailer magic bytes, so that it can be found from the end of the file.
+_MAGIC = b'SIMDTRC'
+_TRAILER_MAGIC = b'SIMDIDX'
+_VERSION = 1
+_CHUNK_HEADER = struct.Struct('<cI')
+_TRAILER = struct.Struct('<Q7s')
+
+
+class TraceWriter:
+    """Writes the changes made to a register by each instruction to a trace file while the instructions are applied,
+    so that long runs can be archived and read back with a :class:`simd_dna.trace.TraceReader`. The register is stored
+    once, as it was when the writer was created, followed by one record per instruction with the strands attached,
+    displaced and removed, and the applicable and inert instruction strands, as in a
+    :class:`simd_dna.simulation.InstructionDiff`. Strand names are stored as numbers, and start indices as differences
+    between consecutive strands, in variable-length integers.
+
+    Records are written in blocks of block_size instructions, each of which is compressed on its own and written to
+    the file as soon as it's full, so a run only keeps one block in memory. When the writer is closed, an index of the
+    blocks and of the records in each block is written at the end of the file, which lets the reader look up any
+    instruction without reading the ones before it. A trace whose writer wasn't closed, for instance because the run
+    was interrupted, can still be read up to its last complete block. The writer can be used as a context manager::
+
+        with TraceWriter('tape.trace', simulation, 'Tape') as writer:
+            for diff in writer.record(simulation.iter_run('Tape', list(range(len(simulation.instructions))) * 1000)):
+                pass
+
+    :param filename: The name of the trace file to write.
+    :param simulation: The :class:`simd_dna.simulation.Simulation` whose cell types, strand types and instructions are
+        stored in the trace.
+    :param register_name: The name of the traced register.
+    :param compress: Whether each chunk of the file is compressed with zlib.
+    :param block_size: The number of instructions in each block, which are compressed and read together.
+
+    :ivar int instructions: The number of instructions written.
+    """
+
+    def __init__(self, filename: str, simulation: Simulation, register_name: str, compress: bool = True,
+                 block_size: int = 256) -> None:
+        if register_name not in simulation.registers.keys():
+            raise ValueError('No such register exists')
+
+        self.compress = compress
+        self.block_size = block_size
+        self.instructions = 0
+        self._strand_ids = {strand_name: i for i, strand_name in enumerate(simulation.strand_types.keys())}
+        self._block = bytearray()
+        self._record_offsets: List[int] = []
+        # The file offset and record offsets of each block written so far
+        self._blocks: List[Tuple[int, List[int]]] = []
+
+        register = simulation.registers[register_name]
+        cell_ids = {cell_name: i for i, cell_name in enumerate(simulation.cell_types.keys())}
+        header = json.dumps({
+            'register_name': register_name,
+            'cell_types': simulation.cell_types,
+            'strand_types': simulation.strand_types,
+            'instructions': simulation.instructions,
+            'cell_names': list(cell_ids.keys()),
+            'strand_names': list(self._strand_ids.keys())
+        }, cls=ObjectEncoder).encode('utf-8')
+        initial_register = bytearray()
+        _write_varint(initial_register, len(register.cells))
+        for cell_name in register.cells:
+            _write_varint(initial_register, cell_ids[cell_name])
+        _write_strands(initial_register, register.top_strands, self._strand_ids)
+
+        self._file = open(filename, 'wb')
+        self._file.write(_MAGIC + bytes([_VERSION, compress]))
+        self._write_chunk(b'H', header)
+        self._write_chunk(b'R', initial_register)
+        self._file.flush()
+
+    def __enter__(self) -> 'TraceWriter':
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    def write(self, diff: InstructionDiff) -> None:
+        """Appends the changes made by an instruction to the trace.
+
+        :param diff: The :class:`simd_dna.simulation.InstructionDiff` of the instruction
+        """
+        block = self._block
+        self._record_offsets.append(len(block))
+        _write_varint(block, diff.inst_num)
+        for top_strands in (diff.attached, diff.displaced, diff.removed, diff.new_strands):
+            _write_strands(block, top_strands, self._strand_ids)
+        if diff.inert_matches is None:
+            block.append(0)
+        else:
+            block.append(1)
+            _write_strands(block, diff.inert_matches, self._strand_ids)
+
+        self.instructions += 1
+        if len(self._record_offsets) >= self.block_size:
+            self._write_block()
+
+    def record(self, diffs: Iterable[InstructionDiff]) -> Iterator[InstructionDiff]:
+        """Writes each diff to the trace as it's yielded, such as by :func:`simd_dna.simulation.Simulation.iter_run`,
+        and yields it again, so that the diffs can be printed or drawn at the same time.
+
+        :param diffs: An iterable of :class:`simd_dna.simulation.InstructionDiff`
+        :return: An iterator of the same diffs
+        """
+        for diff in diffs:
+            self.write(diff)
+            yield diff
+
+    def close(self) -> None:
+        """Writes the last block and the index, and closes the file."""
+        if self._file.closed:
+            return
+
+        self._write_block()
+        index = bytearray()
+        _write_varint(index, len(self._blocks))
+        previous_offset = 0
+        for offset, record_offsets in self._blocks:
+            _write_varint(index, offset - previous_offset)
+            previous_offset = offset
+            _write_varint(index, len(record_offsets))
+            previous_record_offset = 0
+            for record_offset in record_offsets:
+                _write_varint(index, record_offset - previous_record_offset)
+                previous_record_offset = record_offset
+
+        index_offset = self._file.tell()
+        self._write_chunk(b'I', index)
+        self._file.write(_TRAILER.pack(index_offset, _TRAILER_MAGIC))
+        self._file.close()
+
+    def _write_block(self) -> None:
+        # Writes the records of the current block, if any, and flushes them to the file
+        if len(self._record_offsets) == 0:
+            return
+
+        self._blocks.append((self._file.tell(), self._record_offsets))
+        self._write_chunk(b'B', self._block)
+        self._file.flush()
+        self._block = bytearray()
+        self._record_offsets = []
+
+    def _write_chunk(self, tag: bytes, payload: Union[bytes, bytearray]) -> None:
+        if self.compress:
+            payload = zlib.compress(bytes(payload))
+        self._file.write(_CHUNK_HEADER.pack(tag, len(payload)))
+        self._file.write(payload)
+
+
+class TraceReader:
+    """Reads a trace file written by a :class:`simd_dna.trace.TraceWriter`. The records of the instructions are read
+    lazily, one block at a time, and can be iterated over or looked up by their position in the trace. The reader can
+    be used as a context manager.
+
+    :param filename: The name of the trace file to read.
+
+    :ivar Simulation simulation: A :class:`simd_dna.simulation.Simulation` with the cell types, strand types and
+        instructions stored in the trace, whose only register is the traced register before the first instruction.
+    :ivar str register_name: The name of the traced register.
+    :ivar bool complete: Whether the trace was closed by its writer. If not, only its complete blocks are read.
+    """
+
+    def __init__(self, filename: str) -> None:
+        self._file = open(filename, 'rb')
+        try:
+            prefix = self._file.read(len(_MAGIC) + 2)
+            if len(prefix) < len(_MAGIC) + 2 or prefix[:len(_MAGIC)] != _MAGIC:
+                raise ValueError('Not a trace file: ' + filename)
+            if prefix[len(_MAGIC)] != _VERSION:
+                raise ValueError('Unsupported trace file version: ' + str(prefix[len(_MAGIC)]))
+            self._compressed = bool(prefix[len(_MAGIC) + 1])
+
+            tag, header = self._read_chunk()
+            if tag != b'H':
+                raise ValueError('Trace file has no header: ' + filename)
+            header = json.loads(header.decode('utf-8'))
+            self.register_name = header['register_name']
+            self._strand_names = header['strand_names']
+            # TopStrand instances are immutable, so the decoded ones are shared between records
+            self._decoded_strands: Dict[Tuple[int, int], TopStrand] = {}
+
+            self.simulation = Simulation()
+            self.simulation.cell_types = decode_json_dict(header['cell_types'], Cell)
+            self.simulation.strand_types = decode_json_dict(header['strand_types'], Strand)
+            self.simulation.instructions = header['instructions']
+            tag, payload = self._read_chunk()
+            if tag != b'R':
+                raise ValueError('Trace file has no register: ' + filename)
+            register = Register(self.simulation.cell_types, self.simulation.strand_types)
+            cell_count, position = _read_varint(payload, 0)
+            for _ in range(cell_count):
+                cell_id, position = _read_varint(payload, position)
+                register.cells.append(header['cell_names'][cell_id])
+            register.top_strands, _ = self._read_strands(payload, position)
+            self.simulation.registers[self.register_name] = register
+
+            # The file offset and record offsets of each block, and the position of each block's first record
+            blocks = self._read_index()
+            if blocks is None:
+                self.complete = False
+                blocks = self._scan_blocks()
+            else:
+                self.complete = True
+            self._blocks = blocks
+            self._first_records = []
+            total = 0
+            for _, record_offsets in self._blocks:
+                self._first_records.append(total)
+                total += len(record_offsets)
+            self._length = total
+            self._cached_block: Tuple[Optional[int], bytes] = (None, b'')
+        except BaseException:
+            self._file.close()
+            raise
+
+    def __enter__(self) -> 'TraceReader':
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, position: int) -> InstructionDiff:
+        if position < 0:
+            position += self._length
+        if position < 0 or position >= self._length:
+            raise IndexError('Trace position out of range')
+
+        block_number = self._find_block(position)
+        record_offsets = self._blocks[block_number][1]
+        return self._read_record(self._get_block(block_number),
+                                 record_offsets[position - self._first_records[block_number]])[0]
+
+    def __iter__(self) -> Iterator[InstructionDiff]:
+        for block_number, (_, record_offsets) in enumerate(self._blocks):
+            block = self._get_block(block_number)
+            for record_offset in record_offsets:
+                yield self._read_record(block, record_offset)[0]
+
+    def get_initial_register(self) -> Register:
+        """Returns a copy of the traced register before the first instruction, which each diff in the trace can be
+        applied to in turn with :func:`simd_dna.simulation.InstructionDiff.apply`.
+
+        :return: A :class:`simd_dna.classes.Register`
+        """
+        return self.simulation.registers[self.register_name].copy()
+
+    def close(self) -> None:
+        """Closes the file."""
+        self._file.close()
+
+    def _find_block(self, position: int) -> int:
+        # Binary search for the block holding the record at the given position
+        low = 0
+        high = len(self._first_records)
+        while high - low > 1:
+            middle = (low + high) // 2
+            if self._first_records[middle] <= position:
+                low = middle
+            else:
+                high = middle
+        return low
+
+    def _get_block(self, block_number: int) -> bytes:
+        # Reads a block, keeping the latest one so that consecutive records don't decompress it again
+        if self._cached_block[0] != block_number:
+            self._file.seek(self._blocks[block_number][0])
+            self._cached_block = (block_number, self._read_chunk()[1])
+        return self._cached_block[1]
+
+    def _read_chunk(self) -> Tuple[Optional[bytes], bytes]:
+        # Reads the chunk at the current file offset, returning a tag of None and an empty payload if it's incomplete
+        chunk_header = self._file.read(_CHUNK_HEADER.size)
+        if len(chunk_header) < _CHUNK_HEADER.size:
+            return None, b''
+        tag, length = _CHUNK_HEADER.unpack(chunk_header)
+        payload = self._file.read(length)
+        if len(payload) < length:
+            return None, b''
+        if self._compressed:
+            try:
+                payload = zlib.decompress(payload)
+            except zlib.error:
+                return None, b''
+        return tag, payload
+
+    def _read_index(self) -> Optional[List[Tuple[int, List[int]]]]:
+        # Reads the index written when the trace was closed, or returns None if there's none
+        end = self._file.seek(0, os.SEEK_END)
+        if end < _TRAILER.size:
+            return None
+        self._file.seek(end - _TRAILER.size)
+        index_offset, trailer_magic = _TRAILER.unpack(self._file.read(_TRAILER.size))
+        if trailer_magic != _TRAILER_MAGIC or index_offset >= end:
+            return None
+        self._file.seek(index_offset)
+        tag, index = self._read_chunk()
+        if tag != b'I':
+            return None
+
+        blocks = []
+        block_count, position = _read_varint(index, 0)
+        offset = 0
+        for _ in range(block_count):
+            offset_step, position = _read_varint(index, position)
+            offset += offset_step
+            record_count, position = _read_varint(index, position)
+            record_offsets = []
+            record_offset = 0
+            for _ in range(record_count):
+                record_offset_step, position = _read_varint(index, position)
+                record_offset += record_offset_step
+                record_offsets.append(record_offset)
+            blocks.append((offset, record_offsets))
+        return blocks
+
+    def _scan_blocks(self) -> List[Tuple[int, List[int]]]:
+        # Finds the complete blocks of a trace without an index by reading the whole file
+        blocks: List[Tuple[int, List[int]]] = []
+        self._file.seek(len(_MAGIC) + 2)
+        self._read_chunk()
+        self._read_chunk()
+        while True:
+            offset = self._file.tell()
+            tag, payload = self._read_chunk()
+            if tag is None:
+                return blocks
+            if tag != b'B':
+                continue
+
+            record_offsets = []
+            position = 0
+            while position < len(payload):
+                record_offsets.append(position)
+                position = self._read_record(payload, position)[1]
+            blocks.append((offset, record_offsets))
+
+    def _read_record(self, block: bytes, position: int) -> Tuple[InstructionDiff, int]:
+        inst_num, position = _read_varint(block, position)
+        attached_strands, position = self._read_strands(block, position)
+        displaced_strands, position = self._read_strands(block, position)
+        removed_strands, position = self._read_strands(block, position)
+        new_strands, position = self._read_strands(block, position)
+        inert_matches: Optional[Tuple[TopStrand, ...]] = None
+        position += 1
+        if block[position - 1]:
+            inert_strands, position = self._read_strands(block, position)
+            inert_matches = tuple(inert_strands)
+        return InstructionDiff(inst_num, tuple(attached_strands), tuple(displaced_strands), tuple(removed_strands),
+                               tuple(new_strands), inert_matches), position
+
+    def _read_strands(self, data: bytes, position: int) -> Tuple[List[TopStrand], int]:
+        # The inverse of _write_strands
+        count, position = _read_varint(data, position)
+        top_strands = []
+        start_index = 0
+        for _ in range(count):
+            start_step, position = _read_varint(data, position)
+            strand_id, position = _read_varint(data, position)
+            start_index += start_step >> 1 if start_step & 1 == 0 else -((start_step + 1) >> 1)
+            key = (start_index, strand_id)
+            top_strand = self._decoded_strands.get(key)
+            if top_strand is None:
+                top_strand = self._decoded_strands[key] = TopStrand(start_index, self._strand_names[strand_id])
+            top_strands.append(top_strand)
+        return top_strands, position
+
+
+class Replay:
+    """Reconstructs the contents of a register at any point of a recorded run, such as a trace read by a
+    :class:`simd_dna.trace.TraceReader`, without simulating the instructions again. A full copy of the register is
+    kept as a checkpoint every checkpoint_interval instructions, so getting the register after any instruction only
+    applies the diffs recorded since the closest checkpoint before it, however long the run is. Checkpoints are taken
+    the first time the replay goes past them, so opening a replay costs nothing, and the first seek to a point costs as
+    much as replaying the run up to there. Stepping forward from the last point sought only applies the diffs in
+    between.
+
+    The registers returned are ordinary :class:`simd_dna.classes.Register` instances, which can be printed with
+    :func:`simd_dna.classes.Register.print` or drawn with
+    :func:`simd_dna.register_svg.RegisterSVGDrawing.draw_contents`::
+
+        with TraceReader('tape.trace') as reader:
+            replay = Replay(reader.get_initial_register(), reader)
+            replay.get_register(100000).print()
+
+    :param initial_register: The register before the first recorded instruction, which isn't modified.
+    :param diffs: The :class:`simd_dna.simulation.InstructionDiff` of each instruction, in order. A sequence such as a
+        list or a :class:`simd_dna.trace.TraceReader` is read as needed. Any other iterable, such as the iterator
+        returned by :func:`simd_dna.simulation.Simulation.iter_run`, is consumed as needed, and the diffs it yields are
+        kept.
+    :param checkpoint_interval: The number of instructions between checkpoints. Shorter intervals make seeking faster,
+        at the cost of one copy of the register's top strands per checkpoint.
+    """
+
+    def __init__(self, initial_register: Register, diffs: Iterable[InstructionDiff],
+                 checkpoint_interval: int = 256) -> None:
+        if checkpoint_interval < 1:
+            raise ValueError('Checkpoint interval must be at least 1')
+
+        self.checkpoint_interval = checkpoint_interval
+        # The diffs consumed so far from an iterable that isn't a sequence
+        self._read_diffs: List[InstructionDiff] = []
+        self._pending_diffs: Optional[Iterator[InstructionDiff]] = None
+        if hasattr(diffs, '__getitem__') and hasattr(diffs, '__len__'):
+            self._diffs = cast(Sequence[InstructionDiff], diffs)
+        else:
+            self._diffs = self._read_diffs
+            self._pending_diffs = iter(diffs)
+        # The register after each multiple of checkpoint_interval instructions reached so far
+        self._checkpoints = [initial_register.copy()]
+        # The register after the instructions applied by the latest seek, and their number
+        self._cursor: Optional[Register] = None
+        self._cursor_position = 0
+
+    def __len__(self) -> int:
+        while self._pending_diffs is not None:
+            self._read_diff()
+        return len(self._diffs)
+
+    def get_diff(self, position: int) -> InstructionDiff:
+        """Returns the diff of an instruction of the run.
+
+        :param position: The position of the instruction in the run, starting from 0.
+        :return: The :class:`simd_dna.simulation.InstructionDiff` of the instruction
+        """
+        if position < 0:
+            raise IndexError('Replay position out of range')
+        while position >= len(self._diffs) and self._pending_diffs is not None:
+            self._read_diff()
+        if position >= len(self._diffs):
+            raise IndexError('Replay position out of range')
+        return self._diffs[position]
+
+    def get_register(self, position: int) -> Register:
+        """Returns the contents of the register after a number of instructions of the run.
+
+        :param position: The number of instructions applied, from 0 for the register before the first instruction to
+            the length of the run for the register after the last one.
+        :return: A copy of the :class:`simd_dna.classes.Register` at that point, whose changes don't affect the replay
+        """
+        if position < 0:
+            raise IndexError('Replay position out of range')
+
+        interval = self.checkpoint_interval
+        checkpoint_number = min(position // interval, len(self._checkpoints) - 1)
+        if self._cursor is not None and checkpoint_number * interval <= self._cursor_position <= position:
+            register = self._cursor
+            current_position = self._cursor_position
+        else:
+            register = self._checkpoints[checkpoint_number].copy()
+            current_position = checkpoint_number * interval
+
+        try:
+            while current_position < position:
+                self.get_diff(current_position).apply(register)
+                current_position += 1
+                if current_position == len(self._checkpoints) * interval:
+                    self._checkpoints.append(register.copy())
+        finally:
+            self._cursor = register
+            self._cursor_position = current_position
+        return register.copy()
+
+    def get_instruction_results(self, position: int) \
+            -> Tuple[Register, Register, List[TopStrand], Optional[List[TopStrand]]]:
+        """Returns the results of an instruction of the run in the same form as
+        :func:`simd_dna.simulation.Simulation.run_instruction`, so that they can be printed or drawn in the same way.
+
+        :param position: The position of the instruction in the run, starting from 0.
+        :return: A tuple containing the :class:`simd_dna.classes.Register` after the instruction, the
+            :class:`simd_dna.classes.Register` before the instruction, the list of applicable instruction strands, and
+            the list of inert instruction strands, or None if they weren't recorded
+        """
+        diff = self.get_diff(position)
+        before_register = self.get_register(position)
+        register = before_register.copy()
+        diff.apply(register)
+        return (register, before_register, list(diff.new_strands),
+                None if diff.inert_matches is None else list(diff.inert_matches))
+
+    def _read_diff(self) -> None:
+        # Reads the next diff from an iterable of diffs
+        if self._pending_diffs is None:
+            return
+        try:
+            self._read_diffs.append(next(self._pending_diffs))
+        except StopIteration:
+            self._pending_diffs = None
+
+
+def write_trace(simulation: Simulation, register_name: str, filename: str, cycles: int = 1, compress: bool = True) \
+        -> int:
+    """Applies every instruction of a simulation to a register for a number of cycles with
+    :func:`simd_dna.simulation.Simulation.iter_run`, writing the changes to a trace file as they're made.
+
+    :param simulation: The :class:`simd_dna.simulation.Simulation` to run.
+    :param register_name: The name of the register to apply the instructions to.
+    :param filename: The name of the trace file to write.
+    :param cycles: The number of times the instructions are applied.
+    :param compress: Whether the trace file is compressed.
+    :return: The number of instructions written to the trace
+    """
+    with TraceWriter(filename, simulation, register_name, compress) as writer:
+        for _ in writer.record(simulation.iter_run(register_name, list(range(len(simulation.instructions))) * cycles)):
+            pass
+    return writer.instructions
+
+
+def _write_varint(buffer: bytearray, value: int) -> None:
+    # Appends a non-negative integer in 7-bit groups, least significant first, with the high bit set on all but the last
+    while value > 0x7f:
+        buffer.append(value & 0x7f | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def _read_varint(data: bytes, position: int) -> Tuple[int, int]:
+    value = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+def _write_strands(buffer: bytearray, top_strands: Iterable[TopStrand], strand_ids: Dict[str, int]) -> None:
+    # Appends the number of strands, then the difference between the start index of each strand and the previous one,
+    # zigzag encoded as strands can start before the previous one or at negative indices, and the strand's number
+    top_strands = list(top_strands)
+    _write_varint(buffer, len(top_strands))
+    previous_start_index = 0
+    for top_strand in top_strands:
+        start_step = top_strand.start_index - previous_start_index
+        _write_varint(buffer, start_step << 1 if start_step >= 0 else (-start_step << 1) - 1)
+        _write_varint(buffer, strand_ids[top_strand.strand_name])
+        previous_start_index = top_strand.start_index
@@ -0,0 +1,503 @@
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from operator import attrgetter, sub
+from typing import TYPE_CHECKING, Dict, List, Optional, Set, Tuple
+
+from simd_dna.classes import Cell, MatchTable, Register, Strand, TopStrand
+
+if TYPE_CHECKING:
+    from simd_dna.simulation import Simulation
+
+# The key of a window, as built by _get_windows: the ids of the cell and strand types, the instruction, the cells of the
+# window and its halo, the start and end of the window's own domains, the start of the first strand in the halo, the
+# distances between the starts of consecutive strands and the strand names
+_WindowKey = Tuple[int, int, Tuple[str, ...], Tuple[str, ...], Optional[int], Optional[int], Optional[int],
+                   Tuple[int, ...], Tuple[str, ...]]
+# The result of simulating a window, as returned by _simulate_window
+_WindowResult = Tuple[int, Tuple[bool, ...], Tuple[Tuple[int, str], ...], Tuple[Tuple[int, str], ...],
+                      Tuple[Tuple[int, str], ...]]
+
+# Maps the slots of a worker process started by ShardPool to the register of the shard held in each slot, and the
+# start and end of the shard's own domains relative to it
+_worker_shards: Dict[int, Tuple[Register, Optional[int], Optional[int]]] = {}
+
+
+class WindowMemo:
+    """Memoizes the effect of instructions on windows of cells, so that in long registers made of repeated patterns,
+    such as binary counters, Rule 110 tapes and mostly blank Turing machine tapes, each distinct window is only
+    simulated once. The rest of the register is looked up, which still takes time proportional to its length, but
+    avoids attempting attachments and displacements. Used by :class:`simd_dna.simulation.Simulation` when its
+    window_size is greater than 0.
+
+    The register is split into windows of window_size cells. Each window is simulated on its own, together with a halo
+    of neighboring cells on both sides that covers twice the length of the longest strand type, and the result for the
+    window's own cells is memoized by the contents of the window and its halo. A window's result is only used if none of
+    the strands attached or displaced while simulating it, including those in the halo, cover a window boundary or
+    overlap a strand that does, and if the window settles within the rounds of attachment and displacement that the
+    whole register is guaranteed to go through. Otherwise, for instance when a cascade crosses a window boundary, the
+    whole register is simulated by the full engine instead.
+
+    :param window_size: The number of cells in each window.
+
+    :ivar int hits: The number of windows whose result was memoized.
+    :ivar int misses: The number of windows that had to be simulated.
+    :ivar int fallbacks: The number of instructions that were applied by the full engine because a window's result
+        couldn't be used.
+    """
+
+    max_windows = 65536
+
+    def __init__(self, window_size: int = 16) -> None:
+        self.window_size = window_size
+        self.hits = 0
+        self.misses = 0
+        self.fallbacks = 0
+        self._windows: OrderedDict[_WindowKey, Optional[_WindowResult]] = OrderedDict()
+        self._match_table: Optional[MatchTable] = None
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+    def clear(self) -> None:
+        """Removes every memoized window. The hit, miss and fallback counters are kept."""
+        self._windows.clear()
+
+    def apply_instruction(self, simulation: Simulation, register: Register,
+                          inst_num: int) -> Optional[List[TopStrand]]:
+        """Applies an instruction to a register in place, window by window.
+
+        :param simulation: The :class:`simd_dna.simulation.Simulation` that the instruction belongs to
+        :param register: The :class:`simd_dna.classes.Register` to apply the instruction to
+        :param inst_num: The integer index of the applicable instruction.
+        :return: The list of applicable instruction strands, as returned by
+            :func:`simd_dna.simulation.Simulation.apply_instruction`, or None if the register was left unchanged and
+            has to be simulated by the full engine, which is also the case if the register fits in a single window
+        """
+        match_table = simulation.compile_match_table()
+        if match_table is not self._match_table:
+            self.clear()
+            self._match_table = match_table
+
+        instruction = simulation.instructions[inst_num]
+        windows = _get_windows(register, instruction, self.window_size)
+        if windows is None:
+            return None
+
+        results = []
+        for key, window_start, window_end, _, _, _ in windows:
+            # Windows whose result can't be used are memoized as None
+            if key in self._windows:
+                self.hits += 1
+                self._windows.move_to_end(key)
+                result = self._windows[key]
+            else:
+                self.misses += 1
+                window_register = _build_window_register(register.cell_types, register.strand_types,
+                                                         register._get_match_table(), key)
+                result = _simulate_window(simulation, window_register, inst_num, window_start, window_end)
+                self._windows[key] = result
+                if len(self._windows) > self.max_windows:
+                    self._windows.popitem(last=False)
+
+            if result is None:
+                self.fallbacks += 1
+                return None
+            results.append(result)
+
+        changes = _apply_window_results(register, instruction, [window[3] for window in windows], results)
+        if changes is None:
+            self.fallbacks += 1
+            return None
+        return changes[0]
+
+
+class ShardPool:
+    """Applies instructions to long registers in worker processes, by splitting each register into shards of
+    consecutive cells that are simulated in parallel. Each shard is simulated together with a halo of neighboring cells
+    and checked in the same way as the windows of a :class:`simd_dna.windows.WindowMemo`, so the results are the same
+    as those of :func:`simd_dna.simulation.Simulation.run_instruction`. If a cascade crosses a shard boundary, the
+    instruction is simulated serially instead.
+
+    The worker processes keep their shards of the max_registers registers simulated most recently between
+    instructions, and are only sent the strands attached and removed near their shards, so the cost of each instruction
+    is shared between the workers. A register is sent to the workers again in full if it was modified by anything else
+    than the pool, for instance after an instruction that was simulated serially. The pool therefore pays off for
+    registers of many thousands of cells that keep being simulated, such as long Turing machine tapes, on machines with
+    at least as many processor cores as shards.
+
+    While the pool is used as a context manager, the simulation applies instructions through it, including in
+    :func:`simd_dna.simulation.Simulation.run_instruction`, :func:`simd_dna.simulation.Simulation.run_all` and
+    :func:`simd_dna.simulation.Simulation.run_cycles`. The worker processes receive the cell types and strand types
+    of the simulation when the pool is created, and registers are simulated serially if they change afterwards. As
+    with any process pool, the calling script must be guarded by ``if __name__ == '__main__':`` on platforms that
+    spawn new processes, such as Windows and macOS::
+
+        with ShardPool(simulation, 4):
+            simulation.run_cycles('Tape', 1000)
+
+    :param simulation: The :class:`simd_dna.simulation.Simulation` whose instructions are applied.
+    :param shards: The number of shards each register is split into, which is also the number of worker processes.
+        Registers are split into fewer shards if the shards would have fewer than min_shard_cells cells, and aren't
+        split at all if they'd have a single shard.
+
+    :ivar int sharded: The number of instructions that were applied shard by shard.
+    :ivar int fallbacks: The number of instructions that were simulated serially because a shard's result couldn't be
+        used.
+    :ivar int loads: The number of times a register was sent to the workers in full.
+    """
+
+    min_shard_cells = 32
+    max_registers = 16
+
+    def __init__(self, simulation: Simulation, shards: int) -> None:
+        from simd_dna.simulation import _initialize_worker
+
+        self.simulation = simulation
+        self.shards = shards
+        self.sharded = 0
+        self.fallbacks = 0
+        self.loads = 0
+        self._match_table = simulation.compile_match_table()
+        # One process per shard, so that each shard is always simulated by the worker that holds it
+        self._executors = [ProcessPoolExecutor(max_workers=1, initializer=_initialize_worker,
+                                               initargs=(simulation.cell_types, simulation.strand_types, [], False))
+                           for _ in range(shards)]
+        # Maps the id of each register held by the workers to a list of the register, its cells and number of
+        # modifications when the workers were last brought up to date, the slot the workers hold it in, the offset and
+        # strand start bounds of each shard, and the changes to send to each worker, least recently used first
+        self._registers: OrderedDict[int, list] = OrderedDict()
+
+    def __enter__(self) -> ShardPool:
+        self.simulation.shard_pool = self
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Stops the worker processes, and stops the simulation from applying instructions through the pool."""
+        if self.simulation.shard_pool is self:
+            self.simulation.shard_pool = None
+        for executor in self._executors:
+            executor.shutdown()
+        self._registers.clear()
+
+    def apply_instruction(self, register: Register, inst_num: int) -> Optional[List[TopStrand]]:
+        """Applies an instruction to a register in place, shard by shard.
+
+        :param register: The :class:`simd_dna.classes.Register` to apply the instruction to
+        :param inst_num: The integer index of the applicable instruction.
+        :return: The list of applicable instruction strands, as returned by
+            :func:`simd_dna.simulation.Simulation.apply_instruction`, or None if the register was left unchanged and
+            has to be simulated serially, which is also the case if it's too short to be split into shards
+        """
+        simulation = self.simulation
+        if simulation.compile_match_table() is not self._match_table:
+            return None
+
+        shards = min(self.shards, len(register.cells) // self.min_shard_cells)
+        if shards <= 1:
+            return None
+
+        instruction = simulation.instructions[inst_num]
+        register._ensure_strand_index()
+        held_register = self._registers.get(id(register))
+        if held_register is None or held_register[1] is not register.cells \
+                or held_register[2] != register._modifications or len(held_register[4]) != shards \
+                or not register._strand_index_is_current():
+            windows = _get_windows(register, instruction, -(-len(register.cells) // shards))
+            if windows is None:
+                return None
+
+            if held_register is not None:
+                slot = held_register[3]
+            elif len(self._registers) < self.max_registers:
+                slot = len(self._registers)
+            else:
+                slot = self._registers.popitem(last=False)[1][3]
+            self.loads += 1
+            shard_bounds = [(offset, lower_start, upper_start) for _, _, _, offset, lower_start, upper_start in windows]
+            updates = [('load', key, window_start, window_end) for key, window_start, window_end, _, _, _ in windows]
+            held_register = [register, register.cells, register._modifications, slot, shard_bounds, updates]
+            self._registers[id(register)] = held_register
+        self._registers.move_to_end(id(register))
+
+        _, _, _, slot, shard_bounds, updates = held_register
+        futures = [executor.submit(_simulate_shard, slot, update, instruction)
+                   for executor, update in zip(self._executors, updates)]
+        results = [future.result() for future in futures]
+        # The workers are up to date until the register changes
+        updates[:] = [None] * shards
+        shard_results = [result for result in results if result is not None]
+        changes = None
+        if len(shard_results) == len(results):
+            changes = _apply_window_results(register, instruction, [bounds[0] for bounds in shard_bounds],
+                                            shard_results)
+        if changes is None:
+            self.fallbacks += 1
+            return None
+
+        # Each worker is sent the changes to the strands of its shard and halo, which it applies in the same order as
+        # the register, so that strands that start at the same domain stay in the same order
+        new_strands, removed_strands, added_strands = changes
+        if len(removed_strands) > 0 or len(added_strands) > 0:
+            for shard_number, (offset, lower_start, upper_start) in enumerate(shard_bounds):
+                shard_removed_strands = tuple((x.start_index - offset, x.strand_name) for x in removed_strands
+                                              if (lower_start is None or x.start_index >= lower_start)
+                                              and (upper_start is None or x.start_index < upper_start))
+                shard_added_strands = tuple((x.start_index - offset, x.strand_name) for x in added_strands
+                                            if (lower_start is None or x.start_index >= lower_start)
+                                            and (upper_start is None or x.start_index < upper_start))
+                if len(shard_removed_strands) > 0 or len(shard_added_strands) > 0:
+                    updates[shard_number] = ('update', shard_removed_strands, shard_added_strands)
+        held_register[2] = register._modifications
+        self.sharded += 1
+        return new_strands
+
+
+def _get_windows(register: Register, instruction: List[str], window_size: int) \
+        -> Optional[List[Tuple[_WindowKey, Optional[int], Optional[int], int, Optional[int], Optional[int]]]]:
+    # Splits a register into windows of window_size cells, and returns the key, the start and end of the window's own
+    # domains relative to its halo (None at the ends of the register), the offset of the halo, and the bounds of the
+    # start indices of the strands in the halo (None at the ends of the register), for each window. Returns None if
+    # the register can't be split.
+    register._ensure_domain_index()
+    cells = register.cells
+    top_strands = register.top_strands
+    if len(cells) <= window_size or len(instruction) == 0:
+        return None
+
+    # Windows are keyed by the first strand's start relative to the window, the distances between the starts of
+    # consecutive strands and the strand names, so that equal windows at different offsets have equal keys
+    starts = list(map(attrgetter('start_index'), top_strands))
+    start_steps = tuple(map(sub, starts[1:], starts[:-1]))
+    if len(start_steps) > 0 and min(start_steps) < 0:
+        return None
+    strand_names = tuple(map(attrgetter('strand_name'), top_strands))
+
+    longest_strand = max((len(strand.domains) for strand in register.strand_types.values()), default=0)
+    if longest_strand == 0:
+        return None
+
+    # The halo holds every strand that overlaps a strand or an attachment position that covers a window boundary
+    halo = 2 * longest_strand
+    cell_offsets = register._cell_offsets + [register.total_domains]
+    key_prefix = (id(register.cell_types), id(register.strand_types), tuple(instruction))
+    windows = []
+    for first_cell in range(0, len(cells), window_size):
+        last_cell = min(first_cell + window_size, len(cells))
+        halo_first_cell = max(bisect_right(cell_offsets, cell_offsets[first_cell] - halo) - 1, 0)
+        halo_last_cell = min(bisect_left(cell_offsets, cell_offsets[last_cell] + halo), len(cells))
+
+        # The window owns the strands that start in its cells, and the first and last windows also own the strands
+        # that start beyond the ends of the register. The halo holds every strand that overlaps its cells.
+        offset = cell_offsets[halo_first_cell]
+        lower_start = None if halo_first_cell == 0 else offset - longest_strand + 1
+        upper_start = None if halo_last_cell == len(cells) else cell_offsets[halo_last_cell]
+        first_halo_strand = 0 if lower_start is None else bisect_left(starts, lower_start)
+        last_halo_strand = len(starts) if upper_start is None else bisect_left(starts, upper_start)
+        window_start = None if first_cell == 0 else cell_offsets[first_cell] - offset
+        window_end = None if last_cell == len(cells) else cell_offsets[last_cell] - offset
+
+        key = key_prefix + (tuple(cells[halo_first_cell:halo_last_cell]), window_start, window_end,
+                            starts[first_halo_strand] - offset if first_halo_strand < last_halo_strand else None,
+                            start_steps[first_halo_strand:last_halo_strand - 1],
+                            strand_names[first_halo_strand:last_halo_strand])
+        windows.append((key, window_start, window_end, offset, lower_start, upper_start))
+
+    return windows
+
+
+def _apply_window_results(register: Register, instruction: List[str], offsets: List[int],
+                          results: List[_WindowResult]) \
+        -> Optional[Tuple[List[TopStrand], List[TopStrand], List[TopStrand]]]:
+    # Applies the results of simulating the windows at the given offsets to the register, and returns the applicable
+    # instruction strands and the strands removed and added, or None if the register was left unchanged because the
+    # results can't be combined
+
+    # Each window went through its own rounds of attachment and displacement, but the number of rounds applied to the
+    # whole register depends on all of them. The rounds that end a repetition of the instruction for the whole
+    # register must end it for every window too, so the last window to settle is only covered if fewer rounds than the
+    # number of repetitions do so before it settles.
+    last_active_round = max(result[0] for result in results)
+    ending_rounds = 0
+    for round_number in range(1, last_active_round):
+        if all(round_number > active_rounds or ending_rounds_of_window[round_number - 1]
+               for active_rounds, ending_rounds_of_window, _, _, _ in results):
+            ending_rounds += 1
+    if ending_rounds >= len(instruction):
+        return None
+
+    # Only the strands of the windows that changed are replaced, so that the register's occupancy index is updated
+    # rather than rebuilt
+    removed_strands: List[TopStrand] = []
+    added_strands: List[TopStrand] = []
+    new_strands: List[TopStrand] = []
+    for (active_rounds, _, window_removed_strands, window_added_strands, window_new_strands), offset \
+            in zip(results, offsets):
+        if active_rounds == 0:
+            continue
+
+        removed_strands.extend(TopStrand(start_index + offset, strand_name)
+                               for start_index, strand_name in window_removed_strands)
+        added_strands.extend(TopStrand(start_index + offset, strand_name)
+                             for start_index, strand_name in window_added_strands)
+        new_strands.extend(TopStrand(start_index + offset, strand_name)
+                           for start_index, strand_name in window_new_strands)
+
+    if len(removed_strands) > 0:
+        register._remove_top_strands(removed_strands)
+    for top_strand in added_strands:
+        register._add_top_strand(top_strand)
+    return new_strands, removed_strands, added_strands
+
+
+def _build_window_register(cell_types: Dict[str, Cell], strand_types: Dict[str, Strand], match_table: MatchTable,
+                           key: _WindowKey) -> Register:
+    # Builds the register of a window and its halo from the window's key. The start of the first strand is None if the
+    # halo has no strands.
+    window_register = Register(cell_types, strand_types)
+    window_register.cells = list(key[3])
+    start_index = key[6]
+    if start_index is not None:
+        for i, strand_name in enumerate(key[8]):
+            if i > 0:
+                start_index += key[7][i - 1]
+            window_register.top_strands.append(TopStrand(start_index, strand_name))
+    window_register._match_table = match_table
+    window_register._ensure_domain_index()
+    return window_register
+
+
+def _simulate_window(simulation: Simulation, window_register: Register, inst_num: int, window_start: Optional[int],
+                     window_end: Optional[int]) -> Optional[_WindowResult]:
+    # Simulates a window with its halo in place, and returns the number of rounds in which the window's strands
+    # changed, whether each of those rounds would end a repetition of the instruction if the window was the whole
+    # register, and the strands removed from the window, added to it and applicable instruction strands in it. Returns
+    # None if the result can't be used because a change affected both sides of a window boundary, the window didn't
+    # settle, or the window's strands that start at the same domain can't be put back in the same order.
+    match_table = window_register._get_match_table()
+
+    def is_in_window(top_strand: TopStrand) -> bool:
+        return (window_start is None or top_strand.start_index >= window_start) \
+            and (window_end is None or top_strand.start_index < window_end)
+
+    def get_domain_range(top_strand: TopStrand) -> Tuple[int, int]:
+        start_index = top_strand.start_index
+        return start_index, start_index + len(match_table.get_strand_domain_ids(top_strand.strand_name))
+
+    def get_strands_at(top_strands: List[TopStrand], start_index: int) -> List[TopStrand]:
+        return top_strands[window_register._bisect_top_strands(start_index, False, top_strands):
+                           window_register._bisect_top_strands(start_index, True, top_strands)]
+
+    # A change affects both sides of a boundary if it covers the boundary, or if it overlaps a strand that does
+    window_register._ensure_strand_index()
+    top_strands = window_register.top_strands
+    boundaries = [boundary for boundary in (window_start, window_end) if boundary is not None]
+    coupled_ranges: List[Tuple[int, int]] = []
+    for boundary in boundaries:
+        position = window_register._bisect_top_strands(boundary - window_register._longest_strand + 1, False)
+        while position < len(top_strands) and top_strands[position].start_index < boundary:
+            domain_range = get_domain_range(top_strands[position])
+            if domain_range[1] > boundary:
+                coupled_ranges.append(domain_range)
+            position += 1
+
+    def is_coupled(top_strand: TopStrand) -> bool:
+        start_index, end_index = get_domain_range(top_strand)
+        return any(start_index < boundary < end_index for boundary in boundaries) \
+            or any(start_index < coupled_end and end_index > coupled_start
+                   for coupled_start, coupled_end in coupled_ranges)
+
+    # The halo may keep changing long after the window settled, so the simulation stops after the first round in which
+    # the window's strands didn't change, or as soon as the result can't be used. The halo can even keep the window
+    # attaching and displacing strands forever, so the window is given up on once it ends as many repetitions of the
+    # instruction as the whole register goes through, or once it's been active for more rounds than it could be in a
+    # cascade across its domains.
+    rounds = [0, 0, True]  # the number of rounds, the number of active rounds and whether the result can be used
+    ending_rounds: List[bool] = []
+    changed_start_indices: Set[int] = set()
+    old_register = window_register.copy()
+    repetitions = len(simulation.instructions[inst_num])
+    max_rounds = repetitions * (window_register.total_domains + 1)
+
+    def check_round(attached_strands: List[TopStrand], preserving_displaced_strands: List[TopStrand],
+                    displaced_strands: List[TopStrand]) -> bool:
+        rounds[0] += 1
+        for top_strand in attached_strands + preserving_displaced_strands + displaced_strands:
+            if is_coupled(top_strand):
+                rounds[2] = False
+                return False
+            if is_in_window(top_strand):
+                changed_start_indices.add(top_strand.start_index)
+
+        window_attached_strands = [x for x in attached_strands if is_in_window(x)]
+        window_displaced_strands = [x for x in displaced_strands if is_in_window(x)]
+        if len(window_attached_strands) > 0:
+            # The window only stays in step with the whole register while it attaches strands every round
+            if rounds[1] != rounds[0] - 1:
+                rounds[2] = False
+                return False
+            rounds[1] = rounds[0]
+            ending_rounds.append(window_displaced_strands == window_attached_strands)
+            if sum(ending_rounds) >= repetitions or rounds[0] >= max_rounds:
+                rounds[2] = False
+                return False
+            return True
+        elif len(window_displaced_strands) > 0 or any(is_in_window(x) for x in preserving_displaced_strands):
+            rounds[2] = False
+        return False
+
+    new_strands, _ = simulation._simulate_instruction(window_register, inst_num, check_round)
+    if not rounds[2] or (rounds[1] > 0 and rounds[1] == rounds[0]):
+        return None  # a change was coupled across a boundary, or the window may not have settled
+    if rounds[1] == 0:
+        return 0, (), (), (), ()
+
+    # Strands that start at the same domain are kept in the order they attached, which removing the old strands and
+    # inserting the new ones after them reproduces unless a strand was removed and attached again
+    removed_strands: List[Tuple[int, str]] = []
+    added_strands: List[Tuple[int, str]] = []
+    for start_index in sorted(changed_start_indices):
+        old_strands = get_strands_at(old_register.top_strands, start_index)
+        window_strands = get_strands_at(window_register.top_strands, start_index)
+        kept_strands = [x for x in old_strands if x in window_strands]
+        start_added_strands = [x for x in window_strands if x not in old_strands]
+        if kept_strands + start_added_strands != window_strands:
+            return None
+        removed_strands.extend((x.start_index, x.strand_name) for x in old_strands if x not in window_strands)
+        added_strands.extend((x.start_index, x.strand_name) for x in start_added_strands)
+
+    return (rounds[1], tuple(ending_rounds), tuple(removed_strands), tuple(added_strands),
+            tuple((x.start_index, x.strand_name) for x in new_strands if is_in_window(x)))
+
+
+def _simulate_shard(slot: int, update: Optional[tuple], instruction: List[str]) -> Optional[_WindowResult]:
+    # Simulates an instruction on a shard held by a worker process started by ShardPool, as _simulate_window does,
+    # after loading the shard from a window key or applying the strands removed and added by the previous instruction.
+    # The shard is left as it was before the instruction, since the pool sends the changes that were kept.
+    from simd_dna import simulation as simulation_module
+
+    simulation = simulation_module._worker_simulation
+    simulation.instructions = [instruction]
+    if update is not None and update[0] == 'load':
+        _, key, window_start, window_end = update
+        _worker_shards[slot] = (_build_window_register(simulation.cell_types, simulation.strand_types,
+                                                       simulation.compile_match_table(), key), window_start, window_end)
+
+    window_register, window_start, window_end = _worker_shards[slot]
+    if update is not None and update[0] == 'update':
+        _, removed_strands, added_strands = update
+        if len(removed_strands) > 0:
+            window_register._remove_top_strands([TopStrand(start_index, strand_name)
+                                                 for start_index, strand_name in removed_strands])
+        for start_index, strand_name in added_strands:
+            window_register._add_top_strand(TopStrand(start_index, strand_name))
+
+    snapshot = window_register.snapshot()
+    result = _simulate_window(simulation, window_register, 0, window_start, window_end)
+    window_register.restore(snapshot)
+    return result
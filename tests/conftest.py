@@ -0,0 +1,28 @@
+import os
+from typing import Any, Callable
+
+import pytest
+
+from simd_dna.simulation import Simulation
+
+REPOSITORY_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXAMPLES = ['increment.json', 'graycode.json', 'rule110.json', 'ternary-increment.json', 'increment_tm.json']
+
+
+@pytest.fixture(params=EXAMPLES)
+def example(request: pytest.FixtureRequest) -> str:
+    """The file name of each sample simulation in the repository."""
+    filename: str = request.param
+    return filename
+
+
+@pytest.fixture
+def load_example() -> Callable[..., Simulation]:
+    """A function that loads a sample simulation from its file name into a new
+    :class:`simd_dna.simulation.Simulation`, created with the given keyword arguments."""
+    def load(filename: str, **kwargs: Any) -> Simulation:
+        simulation = Simulation(**kwargs)
+        simulation.load_json(os.path.join(REPOSITORY_DIRECTORY, filename))
+        return simulation
+
+    return load
@@ -0,0 +1,63 @@
+from pathlib import Path
+from typing import Callable
+
+import pytest
+
+from simd_dna.checkpoint import Checkpointer
+from simd_dna.simulation import Simulation
+
+
+def _save_checkpoint(simulation: Simulation, filename: str) -> str:
+    # Saves a checkpoint of the first register of a simulation, and returns the name of the register
+    register_name = next(iter(simulation.registers))
+    Checkpointer(filename).save(simulation, register_name, simulation.registers[register_name], 1, 2)
+    return register_name
+
+
+def test_checkpoint_round_trip(load_example: Callable[..., Simulation], tmp_path: Path) -> None:
+    simulation = load_example('increment.json')
+    filename = str(tmp_path / 'checkpoint.json')
+    register_name = _save_checkpoint(simulation, filename)
+
+    checkpoint = Checkpointer(filename).get_progress(load_example('increment.json'), register_name)
+    assert checkpoint is not None
+    assert checkpoint.register.cells == simulation.registers[register_name].cells
+    assert checkpoint.register.top_strands == simulation.registers[register_name].top_strands
+    assert (checkpoint.cycles, checkpoint.position) == (1, 2)
+
+
+@pytest.mark.parametrize('types', ['cell_types', 'strand_types'])
+def test_checkpoint_with_unknown_types_is_rejected(load_example: Callable[..., Simulation], tmp_path: Path,
+                                                   types: str) -> None:
+    simulation = load_example('increment.json')
+    filename = str(tmp_path / 'checkpoint.json')
+    register_name = _save_checkpoint(simulation, filename)
+
+    other_simulation = load_example('increment.json')
+    register = simulation.registers[register_name]
+    name = register.cells[0] if types == 'cell_types' else register.top_strands[0].strand_name
+    del getattr(other_simulation, types)[name]
+    with pytest.raises(ValueError, match='unknown'):
+        Checkpointer(filename).get_progress(other_simulation, register_name)
+
+
+def test_iter_run_resumes_from_given_checkpoint(load_example: Callable[..., Simulation], tmp_path: Path,
+                                                monkeypatch: pytest.MonkeyPatch) -> None:
+    simulation = load_example('increment.json')
+    register_name = next(iter(simulation.registers))
+    expected = list(simulation.iter_run(register_name))
+
+    filename = str(tmp_path / 'checkpoint.json')
+    register = simulation.registers[register_name].copy()
+    for diff in expected[:2]:
+        diff.apply(register)
+    Checkpointer(filename).save(simulation, register_name, register, 0, 2)
+
+    checkpointer = Checkpointer(filename)
+    checkpoint = checkpointer.get_progress(simulation, register_name)
+
+    def get_progress(*args: object) -> None:
+        raise AssertionError('The checkpoint was loaded again')
+
+    monkeypatch.setattr(Checkpointer, 'get_progress', get_progress)
+    assert list(simulation.iter_run(register_name, checkpointer=checkpointer, checkpoint=checkpoint)) == expected[2:]
@@ -0,0 +1,31 @@
+import os
+from typing import List
+
+import pytest
+
+from simd_dna.cli import main
+from simd_dna.simulation import Simulation
+
+REPOSITORY_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INCREMENT_FILENAME = os.path.join(REPOSITORY_DIRECTORY, 'increment.json')
+
+
+@pytest.mark.parametrize('argv', [['run', INCREMENT_FILENAME, '--registers', 'Missing'],
+                                  ['run', INCREMENT_FILENAME, '--instructions', '1-100'],
+                                  ['run', os.path.join(REPOSITORY_DIRECTORY, 'README.md')],
+                                  ['run', INCREMENT_FILENAME, '--trace', 'traces', '--until-repeat'],
+                                  ['replay', INCREMENT_FILENAME]])
+def test_invalid_arguments_are_usage_errors(argv: List[str], capsys: pytest.CaptureFixture) -> None:
+    with pytest.raises(SystemExit) as exit_info:
+        main(argv)
+    assert exit_info.value.code == 2
+    assert 'error:' in capsys.readouterr().err
+
+
+def test_simulation_errors_propagate(monkeypatch: pytest.MonkeyPatch) -> None:
+    def run_all(*args: object) -> None:
+        raise ValueError('simulation error')
+
+    monkeypatch.setattr(Simulation, 'run_all', run_all)
+    with pytest.raises(ValueError, match='simulation error'):
+        main(['run', INCREMENT_FILENAME])
@@ -0,0 +1,63 @@
+import hashlib
+import json
+import os
+from typing import Callable, Dict, Iterable, List, Optional
+
+import pytest
+
+from simd_dna.classes import TopStrand
+from simd_dna.simulation import Simulation
+
+# The results of two instruction cycles of each register of the sample simulations, as computed by the original
+# instruction engine that rescanned the whole register for attachments and displacements: the top strands after the
+# last instruction, and digests of the top strands, applicable instruction strands and inert instruction strands after
+# each instruction, without and with show_inert_instruction_strands set
+EXPECTED_RESULTS_FILENAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'expected_results.json')
+CYCLES = 2
+
+
+def _encode_top_strands(top_strands: Optional[Iterable[TopStrand]]) -> Optional[List[list]]:
+    return None if top_strands is None else [[x.start_index, x.strand_name] for x in top_strands]
+
+
+def _get_digest(records: list) -> str:
+    return hashlib.blake2b(json.dumps(records, separators=(',', ':')).encode('utf-8'), digest_size=16).hexdigest()
+
+
+@pytest.fixture(scope='module')
+def expected_results() -> Dict[str, Dict[str, dict]]:
+    with open(EXPECTED_RESULTS_FILENAME) as file:
+        expected_results: Dict[str, Dict[str, dict]] = json.load(file)
+    return expected_results
+
+
+@pytest.mark.parametrize('show_inert_instruction_strands', [False, True])
+def test_run_instruction_matches_original_engine(example: str, load_example: Callable[..., Simulation],
+                                                 expected_results: Dict[str, Dict[str, dict]],
+                                                 show_inert_instruction_strands: bool) -> None:
+    simulation = load_example(example, keep_results=True,
+                              show_inert_instruction_strands=show_inert_instruction_strands)
+    for register_name, expected in expected_results[example].items():
+        records = []
+        for _ in range(CYCLES):
+            for inst_num in range(len(simulation.instructions)):
+                register, _, new_strands, inert_matches = simulation.run_instruction(register_name, inst_num)
+                records.append([_encode_top_strands(register.top_strands), _encode_top_strands(new_strands),
+                                _encode_top_strands(inert_matches)])
+
+        assert records[-1][0] == expected['top_strands']
+        assert _get_digest(records) == expected['inert_digest' if show_inert_instruction_strands else 'plain_digest']
+
+
+def test_run_instruction_keeps_registers_without_keep_results(example: str,
+                                                              load_example: Callable[..., Simulation]) -> None:
+    simulation = load_example(example)
+    initial_registers = {name: register.copy() for name, register in simulation.registers.items()}
+    for register_name in simulation.registers:
+        for inst_num in range(len(simulation.instructions)):
+            register, before_register, _, _ = simulation.run_instruction(register_name, inst_num)
+            assert before_register.top_strands == initial_registers[register_name].top_strands
+
+    for register_name, register in simulation.registers.items():
+        assert register.cells == initial_registers[register_name].cells
+        assert register.top_strands == initial_registers[register_name].top_strands
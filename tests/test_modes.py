@@ -0,0 +1,162 @@
+from typing import Any, Callable, List, Optional, Tuple
+
+import pytest
+
+from simd_dna.classes import Register, TopStrand
+from simd_dna.simulation import Simulation
+from simd_dna.windows import ShardPool
+
+# The name of a register, and the top strands of the register after an instruction, the applicable instruction
+# strands and the inert instruction strands, if any
+_Record = Tuple[str, List[TopStrand], List[TopStrand], Optional[List[TopStrand]]]
+CYCLES = 2
+
+
+def _get_record(register_name: str,
+                results: Tuple[Register, Register, List[TopStrand], Optional[List[TopStrand]]]) -> _Record:
+    register, _, new_strands, inert_matches = results
+    return (register_name, list(register.top_strands), list(new_strands),
+            None if inert_matches is None else list(inert_matches))
+
+
+def _run_plain(simulation: Simulation, cycles: int = CYCLES) -> List[_Record]:
+    # Applies every instruction to each register in turn with run_instruction, keeping the results, and returns the
+    # results of each instruction, cycle by cycle. Every other way of running a simulation is compared against it.
+    simulation.keep_results = True
+    records = []
+    for _ in range(cycles):
+        for inst_num in range(len(simulation.instructions)):
+            for register_name in simulation.registers:
+                records.append(_get_record(register_name, simulation.run_instruction(register_name, inst_num)))
+    return records
+
+
+def _repeat_cells(simulation: Simulation, min_cells: int) -> Simulation:
+    # Repeats the cells and top strands of every register side by side until it has at least min_cells cells, so that
+    # it's long enough to be split into windows or shards
+    for register in simulation.registers.values():
+        copies = -(-min_cells // len(register.cells))
+        register_domains = register.total_domains
+        register.top_strands = [TopStrand(top_strand.start_index + i * register_domains, top_strand.strand_name)
+                                for i in range(copies) for top_strand in register.top_strands]
+        register.cells = register.cells * copies
+        register._ensure_domain_index()
+    return simulation
+
+
+def _make_short_simulation(**kwargs: Any) -> Simulation:
+    # Creates a simulation whose registers are shorter than one of the instruction strands
+    simulation = Simulation(**kwargs)
+    simulation.add_cell_type('Cell', ['a', 'b'])
+    simulation.add_strand_type('Long', ['a', 'b', 'c', 'd'])
+    simulation.add_strand_type('Short', ['b'])
+    simulation.add_cells_to_register('One', 'Cell')
+    simulation.add_cells_to_register('Two', 'Cell', copies=2)
+    simulation.add_cells_to_register('OtherOne', 'Cell')
+    simulation.add_instruction(['Long'])
+    simulation.add_instruction(['Short', 'Long'])
+    return simulation
+
+
+@pytest.mark.parametrize('show_inert_instruction_strands', [False, True])
+def test_run_instruction_batch_matches_plain_run(example: str, load_example: Callable[..., Simulation],
+                                                 show_inert_instruction_strands: bool) -> None:
+    expected = _run_plain(load_example(example, show_inert_instruction_strands=show_inert_instruction_strands))
+    simulation = load_example(example, keep_results=True,
+                              show_inert_instruction_strands=show_inert_instruction_strands)
+    records: List[_Record] = []
+    for _ in range(CYCLES):
+        for inst_num in range(len(simulation.instructions)):
+            results = simulation.run_instruction_batch(inst_num)
+            records.extend(_get_record(register_name, results[register_name])
+                           for register_name in simulation.registers)
+    assert records == expected
+
+
+def test_run_instruction_batch_matches_plain_run_with_strands_longer_than_registers() -> None:
+    expected = _run_plain(_make_short_simulation())
+    simulation = _make_short_simulation(keep_results=True)
+    records: List[_Record] = []
+    for _ in range(CYCLES):
+        for inst_num in range(len(simulation.instructions)):
+            results = simulation.run_instruction_batch(inst_num)
+            records.extend(_get_record(register_name, results[register_name])
+                           for register_name in simulation.registers)
+    assert records == expected
+
+
+@pytest.mark.parametrize('parallel', [None, 2])
+def test_run_all_matches_plain_run(example: str, load_example: Callable[..., Simulation],
+                                   parallel: Optional[int]) -> None:
+    expected = _run_plain(load_example(example), 1)
+    simulation = load_example(example)
+    results = simulation.run_all(parallel)
+    records = [_get_record(register_name, results[register_name][inst_num])
+               for inst_num in range(len(simulation.instructions)) for register_name in simulation.registers]
+    assert records == expected
+
+
+@pytest.mark.parametrize('parallel', [None, 2])
+def test_run_all_matches_plain_run_with_strands_longer_than_registers(parallel: Optional[int]) -> None:
+    expected = _run_plain(_make_short_simulation(), 1)
+    simulation = _make_short_simulation()
+    results = simulation.run_all(parallel)
+    records = [_get_record(register_name, results[register_name][inst_num])
+               for inst_num in range(len(simulation.instructions)) for register_name in simulation.registers]
+    assert records == expected
+
+
+@pytest.mark.parametrize('show_inert_instruction_strands', [False, True])
+@pytest.mark.parametrize('cache_size', [50, 1000000])
+def test_instruction_cache_matches_plain_run(example: str, load_example: Callable[..., Simulation], cache_size: int,
+                                             show_inert_instruction_strands: bool) -> None:
+    expected = _run_plain(load_example(example, show_inert_instruction_strands=show_inert_instruction_strands))
+    simulation = load_example(example, cache_size=cache_size,
+                              show_inert_instruction_strands=show_inert_instruction_strands)
+    assert _run_plain(simulation) == expected
+
+
+def test_instruction_cache_returns_results_of_repeated_instructions(example: str,
+                                                                   load_example: Callable[..., Simulation]) -> None:
+    simulation = load_example(example, cache_size=1000000)
+    for inst_num in range(len(simulation.instructions)):
+        for register_name in simulation.registers:
+            first_record = _get_record(register_name, simulation.run_instruction(register_name, inst_num))
+            assert _get_record(register_name, simulation.run_instruction(register_name, inst_num)) == first_record
+
+    assert simulation.instruction_cache is not None
+    assert simulation.instruction_cache.hits >= len(simulation.instructions) * len(simulation.registers)
+
+
+@pytest.mark.parametrize('window_size', [1, 3, 8])
+def test_window_memo_matches_plain_run(example: str, load_example: Callable[..., Simulation],
+                                       window_size: int) -> None:
+    expected = _run_plain(_repeat_cells(load_example(example), 64))
+    simulation = _repeat_cells(load_example(example, window_size=window_size), 64)
+    assert _run_plain(simulation) == expected
+
+    assert simulation.window_memo is not None
+    assert simulation.window_memo.hits > 0
+
+
+def test_shard_pool_matches_plain_run(example: str, load_example: Callable[..., Simulation]) -> None:
+    expected = _run_plain(_repeat_cells(load_example(example), 128))
+    simulation = _repeat_cells(load_example(example), 128)
+    with ShardPool(simulation, 2) as shard_pool:
+        assert _run_plain(simulation) == expected
+    assert shard_pool.sharded > 0
+
+
+@pytest.mark.parametrize('show_inert_instruction_strands', [False, True])
+def test_iter_run_matches_plain_run(example: str, load_example: Callable[..., Simulation],
+                                    show_inert_instruction_strands: bool) -> None:
+    expected = _run_plain(load_example(example, show_inert_instruction_strands=show_inert_instruction_strands))
+    simulation = load_example(example, show_inert_instruction_strands=show_inert_instruction_strands)
+    for register_name in simulation.registers:
+        register = simulation.registers[register_name].copy()
+        records = []
+        for diff in simulation.iter_run(register_name, list(range(len(simulation.instructions))) * CYCLES):
+            diff.apply(register)
+            records.append((register_name, list(register.top_strands), list(diff.new_strands),
+                            None if diff.inert_matches is None else list(diff.inert_matches)))
+        assert records == [record for record in expected if record[0] == register_name]
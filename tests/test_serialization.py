@@ -0,0 +1,86 @@
+from pathlib import Path
+from typing import Callable
+
+import pytest
+
+from simd_dna.cli import load_simulation, save_simulation
+from simd_dna.simulation import Simulation
+
+
+def _run_cycle(simulation: Simulation) -> None:
+    # Applies every instruction to each register once, so that the saved registers differ from the sample's
+    simulation.keep_results = True
+    for inst_num in range(len(simulation.instructions)):
+        for register_name in simulation.registers:
+            simulation.run_instruction(register_name, inst_num)
+
+
+def _assert_same_simulation(simulation: Simulation, loaded_simulation: Simulation) -> None:
+    assert loaded_simulation.cell_types.keys() == simulation.cell_types.keys()
+    for cell_name, cell in simulation.cell_types.items():
+        assert loaded_simulation.cell_types[cell_name].domains == cell.domains
+        assert loaded_simulation.cell_types[cell_name].strand_labels == cell.strand_labels
+    assert loaded_simulation.strand_types.keys() == simulation.strand_types.keys()
+    for strand_name, strand in simulation.strand_types.items():
+        assert loaded_simulation.strand_types[strand_name].domains == strand.domains
+        assert loaded_simulation.strand_types[strand_name].is_complementary == strand.is_complementary
+        assert loaded_simulation.strand_types[strand_name].color == strand.color
+    assert loaded_simulation.instructions == simulation.instructions
+    assert list(loaded_simulation.registers.keys()) == list(simulation.registers.keys())
+    for register_name, register in simulation.registers.items():
+        assert loaded_simulation.registers[register_name].cells == register.cells
+        assert loaded_simulation.registers[register_name].top_strands == register.top_strands
+
+
+def test_json_round_trip(example: str, load_example: Callable[..., Simulation], tmp_path: Path) -> None:
+    simulation = load_example(example)
+    _run_cycle(simulation)
+    filename = str(tmp_path / 'simulation.json')
+    simulation.save_json(filename)
+
+    loaded_simulation = Simulation()
+    loaded_simulation.load_json(filename)
+    _assert_same_simulation(simulation, loaded_simulation)
+
+    loaded_filename = str(tmp_path / 'loaded_simulation.json')
+    loaded_simulation.save_json(loaded_filename)
+    assert Path(loaded_filename).read_bytes() == Path(filename).read_bytes()
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_binary_round_trip(example: str, load_example: Callable[..., Simulation], tmp_path: Path,
+                           compress: bool) -> None:
+    simulation = load_example(example)
+    _run_cycle(simulation)
+    filename = str(tmp_path / 'simulation.simd')
+    simulation.save_binary(filename, compress)
+
+    loaded_simulation = Simulation()
+    loaded_simulation.load_binary(filename)
+    _assert_same_simulation(simulation, loaded_simulation)
+
+    json_filename = str(tmp_path / 'simulation.json')
+    loaded_json_filename = str(tmp_path / 'loaded_simulation.json')
+    simulation.save_json(json_filename)
+    loaded_simulation.save_json(loaded_json_filename)
+    assert Path(loaded_json_filename).read_bytes() == Path(json_filename).read_bytes()
+
+
+def test_loaded_binary_simulation_runs_as_the_original(example: str, load_example: Callable[..., Simulation],
+                                                       tmp_path: Path) -> None:
+    simulation = load_example(example)
+    filename = str(tmp_path / 'simulation.simd')
+    save_simulation(simulation, filename)
+    loaded_simulation = Simulation()
+    load_simulation(loaded_simulation, filename)
+
+    _run_cycle(simulation)
+    _run_cycle(loaded_simulation)
+    _assert_same_simulation(simulation, loaded_simulation)
+
+
+def test_load_binary_rejects_other_files(tmp_path: Path) -> None:
+    filename = str(tmp_path / 'simulation.simd')
+    Path(filename).write_bytes(b'{"cell_types": {}}')
+    with pytest.raises(ValueError):
+        Simulation().load_binary(filename)
@@ -0,0 +1,58 @@
+from pathlib import Path
+from typing import Callable, List
+
+import pytest
+
+from simd_dna.simulation import InstructionDiff, Simulation
+from simd_dna.trace import TraceReader, TraceWriter
+
+CYCLES = 2
+
+
+def _write_trace(simulation: Simulation, register_name: str, filename: str, compress: bool,
+                 block_size: int) -> List[InstructionDiff]:
+    # Writes a trace of the instructions applied for CYCLES cycles to a register, and returns the diffs written
+    inst_nums = list(range(len(simulation.instructions))) * CYCLES
+    with TraceWriter(filename, simulation, register_name, compress, block_size) as writer:
+        return list(writer.record(simulation.iter_run(register_name, inst_nums)))
+
+
+@pytest.mark.parametrize('show_inert_instruction_strands', [False, True])
+@pytest.mark.parametrize('compress', [False, True])
+def test_trace_round_trip(example: str, load_example: Callable[..., Simulation], tmp_path: Path, compress: bool,
+                          show_inert_instruction_strands: bool) -> None:
+    simulation = load_example(example, show_inert_instruction_strands=show_inert_instruction_strands)
+    for register_name, initial_register in simulation.registers.items():
+        filename = str(tmp_path / (register_name + '.trace'))
+        diffs = _write_trace(simulation, register_name, filename, compress, 16)
+
+        with TraceReader(filename) as reader:
+            assert reader.complete
+            assert reader.register_name == register_name
+            assert reader.simulation.instructions == simulation.instructions
+            assert list(reader) == diffs
+            assert [reader[position] for position in range(len(diffs))] == diffs
+            assert reader[-1] == diffs[-1]
+
+            register = reader.get_initial_register()
+            assert register.cells == initial_register.cells
+            assert register.top_strands == initial_register.top_strands
+
+
+def test_truncated_trace_is_read_up_to_its_last_complete_block(example: str,
+                                                               load_example: Callable[..., Simulation],
+                                                               tmp_path: Path) -> None:
+    simulation = load_example(example)
+    register_name = next(iter(simulation.registers))
+    filename = str(tmp_path / 'register.trace')
+    diffs = _write_trace(simulation, register_name, filename, True, 4)
+
+    with open(filename, 'rb') as file:
+        data = file.read()
+    with open(filename, 'wb') as file:
+        file.write(data[:len(data) * 3 // 4])
+
+    with TraceReader(filename) as reader:
+        assert not reader.complete
+        assert 0 < len(reader) < len(diffs)
+        assert list(reader) == diffs[:len(reader)]